@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import hashlib
+from contextlib import closing
+from typing import List, Dict, Tuple, Callable
+
+from src.hexlib import Hex, Point, hex_neighbor, hex_rotate_left
+from src.player import Action
+from src.game import Game
+
+BOOK_FILE = os.path.join(os.path.dirname(__file__), "opening_book.sqlite")
+
+# -------------------------------- CANONICAL BOARD KEYS --------------------------------
+
+def reflect(h: Hex) -> Hex:
+    return Hex(h.q, h.s, h.r)
+
+def get_symmetries() -> List[Callable[[Hex], Hex]]:
+    "The 12 rotations and reflections of the hex grid about the origin"
+    symmetries: List[Callable[[Hex], Hex]] = []
+    for reflected in (False, True):
+        for rotations in range(6):
+            def symmetry(h: Hex, reflected=reflected, rotations=rotations) -> Hex:
+                if reflected:
+                    h = reflect(h)
+                for _ in range(rotations):
+                    h = hex_rotate_left(h)
+                return h
+            symmetries.append(symmetry)
+    return symmetries
+
+SYMMETRIES = get_symmetries()
+
+def get_vertex_hexes(game: Game) -> Dict[Point, Tuple[Hex, Hex, Hex]]:
+    "Names every vertex by the three hexes meeting at it, which unlike pixels survive symmetries"
+    vertex_hexes: Dict[Point, Tuple[Hex, Hex, Hex]] = {}
+    for coord, hextile in game.board.hexes.items():
+        if hextile.resource == "SEA":
+            continue
+        # corner i of a hex lies between its neighbors in directions i and i+1
+        for corner, point in enumerate(hextile.vertex_neighbors):
+            vertex_hexes[point] = (coord, hex_neighbor(coord, corner), hex_neighbor(coord, (corner + 1) % 6))
+    return vertex_hexes
+
+class CanonicalBoard():
+    """
+    Setup phase position expressed in the symmetry frame that sorts first, so
+    that rotated or mirrored boards share one key and one set of action names
+    """
+    def __init__(self, game: Game):
+        self.game = game
+        self.vertex_hexes = get_vertex_hexes(game)
+
+        best: Tuple[str, Callable[[Hex], Hex]] = None
+        for symmetry in SYMMETRIES:
+            description = repr(self.describe(symmetry))
+            if best is None or description < best[0]:
+                best = (description, symmetry)
+
+        self.symmetry = best[1]
+        self.key: str = hashlib.blake2b(best[0].encode(), digest_size=16).hexdigest()
+
+    def vertex_name(self, point: Point, symmetry: Callable[[Hex], Hex]) -> Tuple[Hex, ...]:
+        return tuple(sorted(symmetry(h) for h in self.vertex_hexes[point]))
+
+    def describe(self, symmetry: Callable[[Hex], Hex]) -> Tuple:
+        board = self.game.board
+        player_count = len(self.game.player_order)
+
+        land = sorted(
+            (symmetry(coord), hextile.resource, hextile.value or 0)
+            for coord, hextile in board.hexes.items() if hextile.resource != "SEA"
+        )
+        ports = sorted(
+            (self.vertex_name(point, symmetry), vertex.port_type)
+            for point, vertex in board.vertices.items() if vertex.port_type
+        )
+        # owners relative to the player to move, colours differ between games
+        settlements = sorted(
+            (self.vertex_name(point, symmetry),
+             (self.game.player_order.index(vertex.owner_colour) - self.game.current_player) % player_count)
+            for point, vertex in board.vertices.items() if vertex.owner_colour
+        )
+        last_settlement = None
+        if (self.game.turn % 2) == 0 and self.game.last_settlement_coord:
+            last_settlement = self.vertex_name(self.game.last_settlement_coord, symmetry)
+
+        return (self.game.turn, land, ports, settlements, last_settlement)
+
+    def action_name(self, action: Action) -> str:
+        "Name of a setup action in the canonical frame"
+        if action.type == "BUILD_SETTLEMENT":
+            return repr((action.type, self.vertex_name(action.value, self.symmetry)))
+        elif action.type == "BUILD_ROAD":
+            edge = self.game.board.edges[action.value]
+            return repr((action.type, sorted(self.vertex_name(point, self.symmetry) for point in edge.vertex_neighbors)))
+        else:
+            raise ValueError("Only setup actions are stored in the opening book")
+
+# ------------------------------------ OPENING BOOK ------------------------------------
+
+class OpeningBook():
+    """
+    Persistent root action statistics of past setup phase searches, shared by
+    every process through one sqlite file
+    """
+    def __init__(self, filepath: str=BOOK_FILE):
+        self.filepath = filepath
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS book ("
+                "key TEXT, action TEXT, visits INTEGER, value REAL, PRIMARY KEY (key, action))"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        # connections can't be pickled or deep copied with the players, so open one per use
+        return sqlite3.connect(self.filepath, timeout=60)
+
+    def lookup(self, key: str) -> Dict[str, Tuple[int, float]]:
+        "Returns action name : (visits, total value)"
+        with closing(self.connect()) as connection:
+            rows = connection.execute("SELECT action, visits, value FROM book WHERE key = ?", (key,)).fetchall()
+        return {action: (visits, value) for action, visits, value in rows}
+
+    def record(self, key: str, statistics: Dict[str, Tuple[int, float]]):
+        "Adds the statistics of one search to the book"
+        with closing(self.connect()) as connection, connection:
+            connection.executemany(
+                "INSERT INTO book (key, action, visits, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key, action) DO UPDATE SET "
+                "visits = visits + excluded.visits, value = value + excluded.value",
+                [(key, action, visits, value) for action, (visits, value) in statistics.items() if visits > 0]
+            )
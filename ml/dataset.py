@@ -0,0 +1,172 @@
+import os
+import json
+import glob
+import uuid
+from typing import List, Dict, Callable, Iterator
+from multiprocessing.util import Finalize
+
+import numpy as np
+
+from src.player import Action
+from src.game import Game
+from src.actions import ActionSpace
+from ml.value import get_value_features
+
+SHARD_ROWS = 65536 # rows per memory mapped shard
+BATCH_ROWS = 4096 # rows buffered in memory between writes
+FIELDS = ["features", "masks", "actions", "outcomes"]
+
+class ShardWriter():
+    """
+    Streams one worker's (state features, legal mask, chosen action, eventual
+    outcome) rows into fixed size memory mapped .npy shards, each worker
+    writes its own shards and index so no locks are needed
+    """
+    def __init__(
+            self, directory: str, worker_id: str, shard_rows: int=SHARD_ROWS, batch_rows: int=BATCH_ROWS,
+            get_features: Callable[[Game, str], np.ndarray]=get_value_features):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.worker_id = worker_id
+        self.shard_rows = shard_rows
+        self.get_features = get_features
+
+        self.action_space: ActionSpace = None
+        self.current_game: Game = None
+        self.shards: List[Dict] = []
+        self.shard: Dict[str, np.ndarray] = None
+        self.shard_row: int = 0
+
+        # in memory buffer, rows before game_start belong to finished games
+        self.batch_rows = batch_rows
+        self.buffer: Dict[str, np.ndarray] = None
+        self.buffered: int = 0
+        self.game_start: int = 0
+        self.game_colours: List[str] = []
+
+    def allocate_buffer(self, feature_size: int, action_count: int, rows: int):
+        old_buffer, self.buffer = self.buffer, {
+            "features": np.zeros((rows, feature_size), dtype=np.float32),
+            "masks": np.zeros((rows, action_count), dtype=bool),
+            "actions": np.zeros(rows, dtype=np.int32),
+            "outcomes": np.zeros(rows, dtype=np.float32),
+        }
+        if old_buffer is not None:
+            for field in FIELDS:
+                self.buffer[field][:self.buffered] = old_buffer[field][:self.buffered]
+
+    def record(self, game: Game, colour: str, possible_actions: List[Action], action: Action):
+        if game is not self.current_game:
+            self.current_game = game
+            self.action_space = ActionSpace(game.board)
+            self.game_start = self.buffered
+            self.game_colours.clear()
+
+        features = self.get_features(game, colour)
+        if self.buffer is None:
+            self.allocate_buffer(len(features), len(self.action_space), self.batch_rows)
+        if self.buffered == len(self.buffer["actions"]):
+            self.flush()
+            if self.buffered == len(self.buffer["actions"]):
+                # one game longer than the whole buffer
+                self.allocate_buffer(len(features), len(self.action_space), 2 * self.buffered)
+
+        row = self.buffered
+        self.buffer["features"][row] = features
+        self.action_space.mask(possible_actions, out=self.buffer["masks"][row])
+        self.buffer["actions"][row] = self.action_space.encode(action)
+        self.game_colours.append(colour)
+        self.buffered += 1
+
+    def end_game(self, game: Game):
+        "Fills in the outcome of the finished game's rows, +1 win, -1 loss, 0 draw"
+        if self.buffer is None:
+            return
+        winner = game.tracker.winner
+        outcomes = [0 if not winner else 1 if colour == winner else -1 for colour in self.game_colours]
+        self.buffer["outcomes"][self.game_start:self.buffered] = outcomes
+        self.game_start = self.buffered
+        self.game_colours.clear()
+        self.current_game = None
+        if self.buffered >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        "Writes the rows of finished games to the shards and keeps the unfinished game buffered"
+        finished = self.game_start
+        written = 0
+        while written < finished:
+            if self.shard is None:
+                self.open_shard()
+            rows = min(finished - written, self.shard_rows - self.shard_row)
+            for field in FIELDS:
+                self.shard[field][self.shard_row:self.shard_row + rows] = self.buffer[field][written:written + rows]
+            self.shard_row += rows
+            written += rows
+            self.shards[-1]["rows"] = self.shard_row
+            if self.shard_row == self.shard_rows:
+                self.close_shard()
+
+        unfinished = self.buffered - finished
+        for field in FIELDS:
+            self.buffer[field][:unfinished] = self.buffer[field][finished:self.buffered]
+        self.buffered = unfinished
+        self.game_start = 0
+
+    def open_shard(self):
+        name = f"{self.worker_id}_{len(self.shards):05d}"
+        self.shard = {
+            field: np.lib.format.open_memmap(
+                os.path.join(self.directory, f"{name}_{field}.npy"), mode="w+",
+                dtype=self.buffer[field].dtype, shape=(self.shard_rows,) + self.buffer[field].shape[1:])
+            for field in FIELDS
+        }
+        self.shard_row = 0
+        self.shards.append({"name": name, "rows": 0})
+
+    def close_shard(self):
+        for array in self.shard.values():
+            array.flush()
+        self.shard = None
+        self.write_index()
+
+    def write_index(self):
+        index = {"worker_id": self.worker_id, "shard_rows": self.shard_rows, "fields": FIELDS, "shards": self.shards}
+        with open(os.path.join(self.directory, f"index_{self.worker_id}.json"), "w") as file:
+            json.dump(index, file)
+
+    def close(self):
+        "Flushes everything buffered, an unfinished game is dropped"
+        if self.buffer is not None:
+            self.flush()
+        if self.shard is not None:
+            self.close_shard()
+        self.write_index()
+
+    def __deepcopy__(self, memo):
+        # searches copy the game, the writer stays shared as only play() records
+        return self
+
+_worker_writer: ShardWriter = None
+
+def get_worker_writer(directory: str) -> ShardWriter:
+    "One writer per process, closed when the process exits"
+    global _worker_writer
+    if _worker_writer is None:
+        _worker_writer = ShardWriter(directory, worker_id=f"{os.getpid()}_{uuid.uuid4().hex[:8]}")
+        Finalize(_worker_writer, _worker_writer.close, exitpriority=10)
+    return _worker_writer
+
+def iterate_batches(directory: str, batch_size: int=BATCH_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    "Yields field : array batches that are views into the memory mapped shards"
+    for index_path in sorted(glob.glob(os.path.join(directory, "index_*.json"))):
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        for shard in index["shards"]:
+            arrays = {
+                field: np.load(os.path.join(directory, f"{shard['name']}_{field}.npy"), mmap_mode="r")
+                for field in index["fields"]
+            }
+            for start in range(0, shard["rows"], batch_size):
+                end = min(start + batch_size, shard["rows"])
+                yield {field: array[start:end] for field, array in arrays.items()}
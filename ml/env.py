@@ -0,0 +1,298 @@
+import time
+import random
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import List, Dict, Tuple, Callable
+
+import numpy as np
+
+from src.player import Player, Action, RandomPlayer
+from src.game import Game
+from src.map import STANDARD_RADIUS
+from src.actions import ActionSpace
+from src.observation import ObservationEncoder, IncrementalObservation
+from src.policy import WeightedPolicy, DEFAULT_POLICY
+
+WINDOW_SIZE = (750, 910)
+COLOURS = ["RED", "WHITE", "ORANGE", "BLUE"]
+
+class EnvPlayer(Player):
+    "The agent's seat, its moves come from step(), decisions within a move from the fallback policy"
+    type = "EnvPlayer"
+
+    def __init__(self, Colour: str, policy: WeightedPolicy=DEFAULT_POLICY):
+        super().__init__(Colour)
+        self.policy = policy
+
+    def choose_action(self, possible_actions: List[Action]) -> Action:
+        return self.policy.choose(possible_actions)
+
+class CatanEnv():
+    """
+    Gym style environment, the agent plays one colour and the opponents move
+    between its turns. Observations are ObservationEncoder vectors and the
+    legal action mask over ActionSpace ids is in info["action_mask"]. The
+    reward is +1 for a win, -1 when another player wins and 0 otherwise, a
+    game cut off by the turn limit is truncated
+    """
+    def __init__(
+            self, colour: str="RED", opponent: Callable[[str], Player]=RandomPlayer, seed: int=None,
+            window_size: Tuple[int, int]=WINDOW_SIZE, board_radius: int=STANDARD_RADIUS, turn_limit: int=1000,
+            observation_out: np.ndarray=None, mask_out: np.ndarray=None):
+        self.colour = colour
+        self.opponent = opponent
+        self.window_size = window_size
+        self.board_radius = board_radius
+        self.turn_limit = turn_limit
+        # draws the seed of each game, so a seeded env plays the same sequence of games
+        self.rng = random.Random(seed)
+
+        self.game: Game = None
+        self.observation: IncrementalObservation = None
+        self.observation_out = observation_out
+        self.possible_actions: List[Action] = []
+
+        # boards of one size and radius share their topology, so one encoder and action space serve every game,
+        # built unseeded so creating an env does not reseed the global random module
+        board = self.new_game(seed=None).board
+        self.encoder = ObservationEncoder(board)
+        self.action_space = ActionSpace(board)
+        self.observation_size: int = self.encoder.size
+        self.action_count: int = len(self.action_space)
+        self.mask = mask_out if mask_out is not None else np.zeros(self.action_count, dtype=bool)
+
+    def new_game(self, seed: int) -> Game:
+        players = [EnvPlayer(colour) if colour == self.colour else self.opponent(colour) for colour in COLOURS]
+        game = Game(
+            self.window_size, players, gamelog=False, debug=False, savegame=False, seed=seed,
+            board_radius=self.board_radius)
+        game.turn_limit = self.turn_limit
+        return game
+
+    def reset(self, seed: int=None) -> Tuple[np.ndarray, Dict]:
+        if seed is None:
+            seed = self.rng.getrandbits(32)
+        self.game = self.new_game(seed)
+        self.advance()
+        self.observation = IncrementalObservation(self.encoder, self.game, out=self.observation_out)
+        return self.observation.flat, self.get_info()
+
+    def step(self, action_id: int) -> Tuple[np.ndarray, float, bool, bool, Dict]:
+        if not self.mask[action_id]:
+            raise ValueError(f"{self.action_space.decode(action_id)} is not legal for {self.colour}")
+        game = self.game
+        game.seed_chance()
+        game.step(self.colour, self.action_space.decode(action_id))
+        game.tracker.ticks += 1
+        self.advance()
+        self.observation.update()
+
+        winner = game.tracker.winner
+        terminated = winner is not None
+        truncated = not terminated and game.turn >= game.turn_limit
+        reward = 0.0 if not terminated else 1.0 if winner == self.colour else -1.0
+        return self.observation.flat, reward, terminated, truncated, self.get_info()
+
+    def advance(self):
+        "Plays the opponents until the agent is to move or the game is over"
+        game = self.game
+        while not game.game_over():
+            colour = game.player_order[game.current_player]
+            possible_actions: List[Action] = game.get_possible_actions(colour)
+            if colour == self.colour:
+                self.possible_actions = possible_actions
+                self.action_space.mask(possible_actions, out=self.mask)
+                return
+            action = game.players[colour].choose_action(possible_actions)
+            game.seed_chance()
+            game.step(colour, action)
+            game.tracker.ticks += 1
+        self.possible_actions = []
+        self.mask[:] = False
+
+    def get_info(self) -> Dict:
+        return {
+            "action_mask": self.mask, "turn": self.game.turn, "winner": self.game.tracker.winner,
+            "victory_points": self.game.players[self.colour].victory_points,
+        }
+
+# shared buffers, name : (dtype, shape after the env dimension)
+def get_buffer_layout(observation_size: int, action_count: int) -> Dict[str, Tuple[str, Tuple[int, ...]]]:
+    return {
+        "observations": ("float32", (observation_size,)),
+        "masks": ("bool", (action_count,)),
+        "rewards": ("float32", ()),
+        "terminated": ("bool", ()),
+        "truncated": ("bool", ()),
+        "actions": ("int64", ()),
+    }
+
+def attach_buffers(
+        names: Dict[str, str], layout: Dict[str, Tuple[str, Tuple[int, ...]]],
+        env_count: int) -> Tuple[List[shared_memory.SharedMemory], Dict[str, np.ndarray]]:
+    blocks = [shared_memory.SharedMemory(name=names[field]) for field in layout]
+    arrays = {
+        field: np.ndarray((env_count,) + shape, dtype=dtype, buffer=block.buf)
+        for block, (field, (dtype, shape)) in zip(blocks, layout.items())
+    }
+    return blocks, arrays
+
+def worker(
+        connection, names: Dict[str, str], layout: Dict, env_count: int, indexes: List[int], seed: int,
+        env_kwargs: Dict):
+    """
+    Runs the envs at the given indexes, reading actions from and writing
+    observations, masks and rewards to the shared buffers. Only the command,
+    and the results of finished games, go through the pipe
+    """
+    blocks, arrays = attach_buffers(names, layout, env_count)
+    envs: Dict[int, CatanEnv] = {
+        i: CatanEnv(
+            observation_out=arrays["observations"][i], mask_out=arrays["masks"][i],
+            seed=None if seed is None else seed + i, **env_kwargs)
+        for i in indexes
+    }
+    try:
+        while True:
+            command, argument = connection.recv()
+            if command == "step":
+                finished: List[Dict] = []
+                for i, env in envs.items():
+                    _, reward, terminated, truncated, info = env.step(int(arrays["actions"][i]))
+                    arrays["rewards"][i] = reward
+                    arrays["terminated"][i] = terminated
+                    arrays["truncated"][i] = truncated
+                    if terminated or truncated:
+                        finished.append({"env": i, "reward": reward, "turn": info["turn"], "winner": info["winner"]})
+                        env.reset()
+                connection.send(finished)
+            elif command == "reset":
+                for i, env in envs.items():
+                    env.reset(seed=None if argument is None else argument[i])
+                connection.send(None)
+            elif command == "close":
+                break
+    finally:
+        for block in blocks:
+            block.close()
+
+class VectorCatanEnv():
+    """
+    N CatanEnvs split across worker processes, stepped together. Observations,
+    masks, rewards and actions live in preallocated shared memory, so nothing
+    is pickled per step, and finished games reset themselves. The arrays
+    returned are the shared buffers, overwritten by the next step
+    """
+    def __init__(self, env_count: int, workers: int=None, seed: int=None, **env_kwargs):
+        "Env i is seeded with seed + i, keyword arguments go to every CatanEnv"
+        self.env_count = env_count
+        workers = min(workers or multiprocessing.cpu_count(), env_count)
+
+        # one env in this process to learn the sizes
+        probe = CatanEnv(**env_kwargs)
+        self.observation_size = probe.observation_size
+        self.action_count = probe.action_count
+        self.action_space = probe.action_space
+        self.layout = get_buffer_layout(self.observation_size, self.action_count)
+
+        self.blocks: List[shared_memory.SharedMemory] = []
+        for dtype, shape in self.layout.values():
+            size = max(1, env_count * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+            self.blocks.append(shared_memory.SharedMemory(create=True, size=size))
+        names = {field: block.name for field, block in zip(self.layout, self.blocks)}
+        self.arrays = {
+            field: np.ndarray((env_count,) + shape, dtype=dtype, buffer=block.buf)
+            for block, (field, (dtype, shape)) in zip(self.blocks, self.layout.items())
+        }
+
+        self.connections = []
+        self.processes = []
+        for indexes in np.array_split(np.arange(env_count), workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=worker, args=(child, names, self.layout, env_count, indexes.tolist(), seed, env_kwargs),
+                daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        self.steps: int = 0
+        self.episodes: List[Dict] = []
+        self.start_time: float = None
+        self.closed = False
+
+    def reset(self, seeds: List[int]=None) -> Tuple[np.ndarray, np.ndarray]:
+        "Starts a new game in every env, returning the observations and masks"
+        for connection in self.connections:
+            connection.send(("reset", seeds))
+        for connection in self.connections:
+            connection.recv()
+        self.start_time = time.perf_counter()
+        self.steps = 0
+        return self.arrays["observations"], self.arrays["masks"]
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Steps every env, returning observations, rewards, terminated, truncated
+        and masks, envs whose game ended already show the first position of the next
+        """
+        self.arrays["actions"][:] = actions
+        for connection in self.connections:
+            connection.send(("step", None))
+        for connection in self.connections:
+            self.episodes.extend(connection.recv())
+        self.steps += self.env_count
+        arrays = self.arrays
+        return arrays["observations"], arrays["rewards"], arrays["terminated"], arrays["truncated"], arrays["masks"]
+
+    def steps_per_second(self) -> float:
+        "Environment steps per second since the last reset"
+        return self.steps / (time.perf_counter() - self.start_time)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join()
+        self.arrays.clear()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def random_actions(masks: np.ndarray) -> np.ndarray:
+    "A uniformly random legal action id for every env"
+    return np.argmax(np.random.random(masks.shape) * masks, axis=1)
+
+def benchmark(env_count: int, workers: int, steps: int) -> float:
+    "Environment steps per second of random agents"
+    with VectorCatanEnv(env_count, workers=workers, seed=0) as env:
+        _, masks = env.reset()
+        for _ in range(steps):
+            masks = env.step(random_actions(masks))[4]
+        steps_per_second = env.steps_per_second()
+        print(
+            f"{env_count} envs on {workers} workers: {steps_per_second:.0f} env steps/s, "
+            f"{len(env.episodes)} games finished")
+    return steps_per_second
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the vectorised environment with random agents")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--steps", type=int, default=200, help="steps of every env")
+    args = parser.parse_args()
+    benchmark(args.envs, args.workers, args.steps)
@@ -0,0 +1,176 @@
+import os
+import json
+import math
+import random
+import time
+from typing import List, Dict, Tuple, Callable
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+from src.player import Player, RandomPlayer
+from src.game import Game
+
+FEATURE_NAMES = [
+    "VICTORY_POINTS",
+    "EXPECTED_INCOME", # resources per roll
+    "SETTLEMENTS_LEFT",
+    "CITIES_LEFT",
+    "DEV_CARDS",
+    "LONGEST_ROAD_LENGTH",
+    "HAS_LONGEST_ROAD",
+    "KNIGHTS_PLAYED",
+    "HAS_LARGEST_ARMY",
+    "HAND_SIZE",
+]
+
+DEFAULT_WEIGHTS = {
+    "VICTORY_POINTS": 0.6,
+    "EXPECTED_INCOME": 1.5,
+    "SETTLEMENTS_LEFT": -0.05,
+    "CITIES_LEFT": -0.05,
+    "DEV_CARDS": 0.15,
+    "LONGEST_ROAD_LENGTH": 0.05,
+    "HAS_LONGEST_ROAD": 0.3,
+    "KNIGHTS_PLAYED": 0.1,
+    "HAS_LARGEST_ARMY": 0.3,
+    "HAND_SIZE": 0.05,
+    "BIAS": -1.0986, # log odds of a 1 in 4 chance to win from an even position
+}
+
+WEIGHTS_FILE = os.path.join(os.path.dirname(__file__), "evaluator_weights.json")
+
+def get_expected_income(game: Game, colour: str) -> float:
+    "Expected resources the player collects per dice roll"
+    income: float = 0
+    player: Player = game.players[colour]
+    analytics = game.board.analytics
+    for coord in player.owned_vertices:
+        multiplier = 2 if game.board.vertices[coord].building == "CITY" else 1
+        income += multiplier * analytics.robbed_income[analytics.vertex_index[coord]].sum()
+    return float(income)
+
+def get_player_features(game: Game, colour: str) -> List[float]:
+    "Hand crafted features of one player's standing, ordered as FEATURE_NAMES"
+    player: Player = game.players[colour]
+    return [
+        player.victory_points,
+        get_expected_income(game, colour),
+        player.settlements_left,
+        player.cities_left,
+        sum(player.development_cards.values()),
+        player.longest_road_length,
+        game.longest_road_colour == colour,
+        player.knights_played,
+        game.largest_army_colour == colour,
+        sum(player.resources.values()),
+    ]
+
+def get_relative_features(game: Game, colour: str) -> np.ndarray:
+    "Player's features minus the mean of the opponents' features"
+    own = np.array(get_player_features(game, colour), dtype=np.float64)
+    others = np.array(
+        [get_player_features(game, other) for other in game.players if other != colour], dtype=np.float64)
+    return own - others.mean(axis=0)
+
+class StaticEvaluator():
+    """
+    Scores a position without playing it out, the logistic win probability of
+    the weighted feature lead over the opponents, mapped onto rollout rewards
+    (+1 win, -1 loss)
+    """
+    def __init__(self, weights: Dict[str, float]=None):
+        weights = weights or DEFAULT_WEIGHTS
+        self.weights: np.ndarray = np.array([weights[name] for name in FEATURE_NAMES], dtype=np.float64)
+        self.bias: float = weights["BIAS"]
+
+    def __call__(self, game: Game, colour: str) -> float:
+        score = float(self.weights @ get_relative_features(game, colour)) + self.bias
+        return math.tanh(score / 2) # 2 * sigmoid(score) - 1
+
+    def save(self, filepath: str=WEIGHTS_FILE):
+        weights = dict(zip(FEATURE_NAMES, self.weights.tolist()))
+        weights["BIAS"] = self.bias
+        with open(filepath, "w") as file:
+            json.dump(weights, file, indent=4)
+
+    @staticmethod
+    def load(filepath: str=WEIGHTS_FILE):
+        "Calibrated evaluator if the weights file exists, default weights otherwise"
+        if not os.path.exists(filepath):
+            return StaticEvaluator()
+        with open(filepath, "r") as file:
+            weights = json.load(file)
+        return StaticEvaluator(weights)
+
+# ------------------------------------ CALIBRATION ------------------------------------
+
+def collect_positions(
+        seed: int, samples_per_game: int=10, get_features: Callable[[Game, str], np.ndarray]=get_relative_features
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    "Plays one random game and returns sampled position features and whether that player won"
+    random.seed(seed)
+    players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+    game = Game(windowSize=(750, 910), players=players, gamelog=False, debug=False, savegame=False)
+
+    snapshots: List[Tuple[str, np.ndarray]] = []
+    while not game.game_over():
+        current_colour = game.player_order[game.current_player]
+        possible_actions = game.get_possible_actions(current_colour)
+        game.step(current_colour, game.players[current_colour].choose_action(possible_actions))
+        game.tracker.ticks += 1
+        if not game.starting_settlement_phase and random.random() < 0.02:
+            colour = random.choice(game.player_order)
+            snapshots.append((colour, get_features(game, colour)))
+
+    winner = game.tracker.winner
+    if not winner or not snapshots:
+        return np.empty((0, len(get_features(game, game.player_order[0])))), np.empty(0)
+    snapshots = random.sample(snapshots, min(samples_per_game, len(snapshots)))
+    features = np.stack([snapshot for _, snapshot in snapshots])
+    outcomes = np.array([colour == winner for colour, _ in snapshots], dtype=np.float64)
+    return features, outcomes
+
+def fit_logistic(
+        features: np.ndarray, outcomes: np.ndarray, epochs: int=2000, learning_rate: float=0.5
+        ) -> Tuple[np.ndarray, float]:
+    "Full batch gradient descent on the logistic loss, returns weights and bias"
+    scale = features.std(axis=0) + 1e-9
+    x = features / scale
+    weights = np.zeros(x.shape[1])
+    bias: float = 0
+    for _ in range(epochs):
+        predictions = 1 / (1 + np.exp(-(x @ weights + bias)))
+        error = predictions - outcomes
+        weights -= learning_rate * x.T @ error / len(outcomes)
+        bias -= learning_rate * error.mean()
+    return weights / scale, float(bias)
+
+def log_loss(evaluator: StaticEvaluator, features: np.ndarray, outcomes: np.ndarray) -> float:
+    predictions = 1 / (1 + np.exp(-(features @ evaluator.weights + evaluator.bias)))
+    predictions = np.clip(predictions, 1e-9, 1 - 1e-9)
+    return float(-np.mean(outcomes * np.log(predictions) + (1 - outcomes) * np.log(1 - predictions)))
+
+def calibrate(games: int=500, filepath: str=WEIGHTS_FILE) -> StaticEvaluator:
+    "Fits the evaluator weights to the outcomes of full random games and saves them"
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
+        results = list(executor.map(collect_positions, range(games), chunksize=8))
+    features = np.concatenate([features for features, _ in results])
+    outcomes = np.concatenate([outcomes for _, outcomes in results])
+    print(f"Collected {len(outcomes)} positions from {games} games in {time.time() - start:.2f} seconds")
+
+    evaluator = StaticEvaluator()
+    print(f"Default weights log loss: {log_loss(evaluator, features, outcomes):.4f}")
+    evaluator.weights, evaluator.bias = fit_logistic(features, outcomes)
+    print(f"Calibrated weights log loss: {log_loss(evaluator, features, outcomes):.4f}")
+    for name, weight in zip(FEATURE_NAMES, evaluator.weights):
+        print(f"{name}: {weight:.4f}")
+    print(f"BIAS: {evaluator.bias:.4f}")
+
+    evaluator.save(filepath)
+    return evaluator
+
+if __name__ == "__main__":
+    calibrate()
@@ -0,0 +1,166 @@
+import gc
+import math
+import time
+import random
+import tracemalloc
+from statistics import mean, stdev
+from typing import List, Dict, Callable
+
+from src.player import Player, RandomPlayer, Action
+from src.game import Game
+from ml.mcts import MCTSPlayer, Node
+
+WINDOW_SIZE = (750, 910)
+
+def play_match(make_players: Callable[[], List[Player]], seeds: List[int]) -> List[str]:
+    "Plays one seeded game per seed between fresh lineups and returns the winning colours, None for a draw"
+    winners: List[str] = []
+    for seed in seeds:
+        game = Game(windowSize=WINDOW_SIZE, players=make_players(), gamelog=False, debug=False, savegame=False, seed=seed)
+        winners.append(game.play().winner)
+    return winners
+
+def standard_error(values: List[float]) -> float:
+    return stdev(values) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+
+def determinization_experiment(games: int=50, iterations: int=400, fraction: int=4, rollout_depth: int=None, first_seed: int=0):
+    """
+    Head to head of closed loop MCTS against open loop determinized MCTS given
+    1/fraction of the iterations, equal win rates mean equal strength per
+    sample. Every seed is played twice with the two searches swapping colours,
+    so each sees the same boards, seats and dice
+    """
+    def make_lineup(closed_colour: str, open_colour: str) -> Callable[[], List[Player]]:
+        searches = {
+            closed_colour: lambda: MCTSPlayer(
+                Colour=closed_colour, Iterations=iterations, Pruning=True, Reward=False, RolloutDepth=rollout_depth),
+            open_colour: lambda: MCTSPlayer(
+                Colour=open_colour, Iterations=iterations // fraction, Pruning=True, Reward=False,
+                RolloutDepth=rollout_depth, Determinize=True),
+        }
+        # listed in one colour order, the seat order is drawn from the seed and the list
+        return lambda: [
+            searches[colour]() if colour in searches else RandomPlayer(Colour=colour)
+            for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+
+    start = time.time()
+    seeds = list(range(first_seed, first_seed + games // 2))
+    wins: Dict[str, List[float]] = {"closed": [], "open": [], "random": []}
+    for closed_colour, open_colour in (("RED", "WHITE"), ("WHITE", "RED")):
+        for winner in play_match(make_lineup(closed_colour, open_colour), seeds):
+            wins["closed"].append(float(winner == closed_colour))
+            wins["open"].append(float(winner == open_colour))
+            wins["random"].append(float(winner in ("ORANGE", "BLUE")) / 2)
+
+    played = len(wins["closed"])
+    win_rates = {name: mean(won) for name, won in wins.items()}
+    print(f"{played} games, seeds {seeds[0]} to {seeds[-1]} each played with the searches on either colour")
+    print(f"Closed loop MCTS ({iterations} iterations) win rate: {win_rates['closed']:.3f} ± {standard_error(wins['closed']):.3f}")
+    print(f"Open loop MCTS ({iterations // fraction} iterations) win rate: {win_rates['open']:.3f} ± {standard_error(wins['open']):.3f}")
+    print(f"Random players win rate: {win_rates['random']:.3f} ± {standard_error(wins['random']):.3f}")
+    print(f"Run time: {time.time() - start:.2f} seconds")
+    return win_rates
+
+def count_nodes(root: Node) -> int:
+    return 1 + sum(count_nodes(child) for child in root.children)
+
+def lean_memory_experiment(iterations: int=1000, rollout_depth: int=5, state_cache: int=16, ticks: int=200, seed: int=0):
+    """
+    Bytes held per node and iterations per second of the standard search, where
+    every node keeps its Game, against lean nodes rebuilt by replaying from the
+    root, with and without a cache of recent states. Searches start from a
+    position reached by random play
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    for name, lean, cache in (("standard", False, 0), ("lean", True, 0), (f"lean, {state_cache} cached", True, state_cache)):
+        player = MCTSPlayer(
+            Colour="RED", Iterations=iterations, Pruning=False, Reward=False, RolloutDepth=rollout_depth,
+            Lean=lean, StateCache=cache)
+        players = [player] + [RandomPlayer(Colour=colour) for colour in ["WHITE", "ORANGE", "BLUE"]]
+        game = Game(windowSize=WINDOW_SIZE, players=players, gamelog=False, debug=False, savegame=False, seed=seed)
+        for _ in range(ticks):
+            colour = game.player_order[game.current_player]
+            game.seed_chance()
+            game.step(colour, random.choice(game.get_possible_actions(colour)))
+            game.tracker.ticks += 1
+
+        random.seed(seed)
+        start = time.perf_counter()
+        player.run_closed_loop(game, {})
+        iterations_per_second = iterations / (time.perf_counter() - start)
+
+        # a second search under tracemalloc, the tree is what is still held once it returns
+        random.seed(seed)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        root = player.run_closed_loop(game, {})
+        # rollout states left in reference cycles are garbage, not tree
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        nodes = count_nodes(root)
+        results[name] = {"bytes_per_node": held / nodes, "iterations_per_second": iterations_per_second}
+        print(f"{name}: {nodes} nodes, {held / nodes:,.0f} bytes per node, {iterations_per_second:.1f} iterations/s")
+    return results
+
+def placement_values(game: Game, player: MCTSPlayer, rollouts: int) -> Dict[Action, float]:
+    "Mean reward of every legal placement over a fixed number of rollouts each"
+    root = Node(game, pruning=False)
+    values: Dict[Action, float] = {}
+    for action in list(root.untried_actions):
+        child = player.expand(root, action)
+        values[action] = mean(player.simulate(child.state) for _ in range(rollouts))
+    return values
+
+def rave_experiment(
+        positions: int=32, budgets: List[int]=(25, 50, 100, 200, 400), rave: float=300, rollout_depth: int=40,
+        reference_rollouts: int=100):
+    """
+    Quality of the first settlement placement chosen by plain UCT and by RAVE
+    at increasing iteration budgets. A placement is scored by its regret, how
+    far its reference value, from reference_rollouts rollouts of every legal
+    placement, falls short of the best one. RAVE needs fewer iterations when
+    its regret at a smaller budget is no worse than plain UCT's at a larger
+    one, judged by the per position differences and their standard error
+    """
+    start = time.time()
+    regrets: Dict[str, Dict[int, List[float]]] = {"uct": {budget: [] for budget in budgets}, "rave": {budget: [] for budget in budgets}}
+    for seed in range(positions):
+        reference_player = MCTSPlayer(Colour="RED", Pruning=False, Reward=False, RolloutDepth=rollout_depth)
+        players = [reference_player] + [RandomPlayer(Colour=colour) for colour in ["WHITE", "ORANGE", "BLUE"]]
+        game = Game(windowSize=WINDOW_SIZE, players=players, gamelog=False, debug=False, savegame=False, seed=seed)
+        random.seed(seed)
+        reference = placement_values(game, reference_player, reference_rollouts)
+        best = max(reference.values())
+
+        for name, rave_k in (("uct", 0), ("rave", rave)):
+            for budget in budgets:
+                player = MCTSPlayer(
+                    Colour="RED", Iterations=budget, Pruning=False, Reward=False, RolloutDepth=rollout_depth, Rave=rave_k)
+                game.players["RED"] = player
+                random.seed(seed)
+                root = player.run_closed_loop(game, {})
+                chosen = max(root.children, key=lambda child: root.score(child, rave_k)).action
+                regrets[name][budget].append(best - reference[chosen])
+
+    results: Dict[str, Dict[int, float]] = {name: {budget: mean(values) for budget, values in by_budget.items()} for name, by_budget in regrets.items()}
+    print(f"Regret of the chosen placement over {positions} positions, mean ± standard error")
+    for budget in budgets:
+        print(
+            f"{budget} iterations: UCT {results['uct'][budget]:.3f} ± {standard_error(regrets['uct'][budget]):.3f}, "
+            f"RAVE {results['rave'][budget]:.3f} ± {standard_error(regrets['rave'][budget]):.3f}")
+    for budget in budgets:
+        # smallest RAVE budget no worse than plain UCT at this one, differences are paired by position
+        for rave_budget in budgets:
+            differences = [r - u for r, u in zip(regrets["rave"][rave_budget], regrets["uct"][budget])]
+            if mean(differences) <= 0:
+                print(
+                    f"UCT at {budget} iterations is matched by RAVE at {rave_budget}, "
+                    f"regret difference {mean(differences):.3f} ± {standard_error(differences):.3f}")
+                break
+    print(f"Run time: {time.time() - start:.2f} seconds")
+    return results
+
+if __name__ == "__main__":
+    determinization_experiment()
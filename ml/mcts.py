@@ -1,33 +1,128 @@
 import numpy as np
+import os
 import random
 import time
-from typing import List
+from typing import List, Dict, Tuple, Set
 from copy import deepcopy
 from statistics import median
+from collections import OrderedDict
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from src.player import Player, Action
+from src.policy import WeightedPolicy, DEFAULT_POLICY
+from src.hexlib import Point
 from src.game import Game
+from ml.evaluator import StaticEvaluator
+from ml.book import OpeningBook, CanonicalBoard
 
 # BASE SETTINGS
 USE_ENSEMBLE = False
 EXPLORATION_PARAM = 0.75
+EVICTION_TARGET = 0.75 # fraction of the node budget a full tree is cut back to
+
+def get_rss() -> int:
+    "Resident set size of this process in bytes, the peak where /proc is not available"
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class TreeMemory():
+    "Nodes a search holds against its budget, 0 is unbounded, and how many it has evicted"
+    def __init__(self, budget: int=0):
+        self.budget: int = budget
+        self.nodes: int = 1
+        self.peak_nodes: int = 1
+        self.evicted: int = 0
+        self.evictions: int = 0
+        self.clock: int = 0 # iterations run, orders nodes by when they were last visited
+
+    def add(self):
+        self.nodes += 1
+        self.peak_nodes = max(self.peak_nodes, self.nodes)
+
+    def over_budget(self) -> bool:
+        return self.budget > 0 and self.nodes > self.budget
+
+    def report(self) -> str:
+        return (
+            f"{self.nodes} nodes (peak {self.peak_nodes}, {self.evicted} evicted in {self.evictions} passes), "
+            f"rss {get_rss() / 2**20:.0f} MB")
+
+class NodeStats():
+    "Visit and value statistics, shared by all nodes of the same position"
+    __slots__ = ("visits", "value")
+
+    def __init__(self):
+        self.visits: int = 0
+        self.value: int = 0
+
+class TranspositionTable():
+    "Bounded table of node statistics keyed by Zobrist hash, evicts least recently used"
+    def __init__(self, size: int):
+        self.size: int = size
+        self.entries: OrderedDict[int, NodeStats] = OrderedDict()
+
+    def lookup(self, key: int) -> NodeStats:
+        stats = self.entries.get(key)
+        if stats is None:
+            stats = NodeStats()
+            self.entries[key] = stats
+            if len(self.entries) > self.size:
+                # nodes still holding an evicted entry keep their statistics
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return stats
 
 class Node():
-    "Node for Monte Carlo Search Tree"
-    def __init__(self, state, parent=None, action=None, pruning=None):
+    """
+    Node for Monte Carlo Search Tree, lean nodes drop their state once created
+    and keep only the action and the seed of the chance outcome that led to it
+    """
+    collapsed: bool = False # subtree evicted, the node is a leaf keeping its statistics
+
+    def __init__(self, state, parent=None, action=None, pruning=None, table=None, chance: int=None, lean: bool=False):
         self.state: Game = state
         self.parent: Node = parent
         self.pruning: bool = pruning
+        self.table: TranspositionTable = table
         self.children: List[Node] = []
         self.action: Action = action
+        self.chance: int = chance # random seed the action was played with
+        self.lean: bool = lean
+        self.last_visit: int = 0
+        self.mover: str = state.player_order[state.current_player] # colour to play here
+        self.amaf: Dict[Action, NodeStats] = {} # all moves as first statistics of the mover's actions below
         self.untried_actions: List[Action] = self.get_untried_actions()
-        self.visits: int = 0
-        self.value: int = 0
+        self.terminal: bool = state.game_over()
+        if table is not None:
+            self.stats: NodeStats = table.lookup(state.zobrist_hash)
+        else:
+            self.stats: NodeStats = NodeStats()
+        if lean and parent is not None:
+            self.state = None
+
+    @property
+    def visits(self) -> int:
+        return self.stats.visits
+
+    @visits.setter
+    def visits(self, visits: int):
+        self.stats.visits = visits
+
+    @property
+    def value(self) -> int:
+        return self.stats.value
+
+    @value.setter
+    def value(self, value: int):
+        self.stats.value = value
 
     def get_untried_actions(self):
-        current_colour = self.state.player_order[self.state.current_player]
-        possible_actions = self.state.get_possible_actions(current_colour)
+        possible_actions = self.state.get_possible_actions(self.mover)
         if self.pruning:
             if self.parent is None and (self.state.turn % 2) == 1:
                 possible_actions = self.placement_prune_actions(possible_actions)
@@ -38,48 +133,100 @@ class Node():
         return len(self.untried_actions) == 0
     
     def is_terminal(self):
-        return self.state.game_over()
+        return self.terminal
 
-    def best_child(self, exploration_param=EXPLORATION_PARAM):
+    def best_child(self, exploration_param=EXPLORATION_PARAM, rave: float=0):
         choices_weights = [
-            (child.value / child.visits) + exploration_param * np.sqrt(np.log(self.visits) / child.visits)
+            self.score(child, rave) + exploration_param * np.sqrt(np.log(self.visits) / child.visits)
             for child in self.children
         ]
         return self.children[np.argmax(choices_weights)]
 
+    def score(self, child, rave: float=0) -> float:
+        """
+        Mean value of a child, blended with the AMAF value of its action when
+        rave is the equivalence parameter k. The AMAF weight
+        beta = sqrt(k / (3n + k)) is a half at k visits of the child and fades
+        as they grow, so the plentiful but biased AMAF statistics lead early on
+        """
+        value = child.value / child.visits
+        amaf = self.amaf.get(child.action) if rave else None
+        if amaf is None:
+            return value
+        beta = np.sqrt(rave / (3 * child.visits + rave))
+        return (1 - beta) * value + beta * amaf.value / amaf.visits
+
     def most_visited_child(self):
         return max(self.children, key=lambda child: child.visits)
 
-    def add_child(self, child_state, action):
-        child_node = Node(child_state, parent=self, action=action)
+    def add_child(self, child_state, action, chance: int=None):
+        child_node = Node(child_state, parent=self, action=action, table=self.table, chance=chance, lean=self.lean)
         self.children.append(child_node)
         return child_node
     
     def placement_prune_actions(self, possible_actions: List[Action]):
         "Removes unfavourable actions from possible actions"
-        PIP_NUMBER_DICT = {2:1, 3:2, 4:3, 5:4, 6:5, 8:5, 9:4, 10:3, 11:2, 12:1}
+        return placement_prune_actions(self.state, possible_actions)
 
-        pip_dict: List[int] = {}
-        for action in possible_actions:
-            point = action.value
-            vertex = self.state.board.vertices[point]
-
-            total_pips: int = 0
-            for coord in vertex.hex_neighbors:
-                hextile = self.state.board.hexes[coord]
-                if hextile.value:
-                    total_pips += PIP_NUMBER_DICT[hextile.value]
-            pip_dict[point] = total_pips
-        
-        med = median(pip_dict.values())
-        pruned_actions = [action for action in possible_actions if pip_dict[action.value] > med]
-        return pruned_actions
+def placement_prune_actions(state: Game, possible_actions: List[Action]) -> List[Action]:
+    "Keeps the settlement placements with above median pips"
+    analytics = state.board.analytics
+    pip_dict: Dict[Point, int] = {
+        action.value: analytics.pips[analytics.vertex_index[action.value]] for action in possible_actions
+    }
+    med = median(pip_dict.values())
+    pruned_actions = [action for action in possible_actions if pip_dict[action.value] > med]
+    return pruned_actions
 
-WEIGHTS_BY_ACTION_TYPE = {
-    "BUILD_CITY": 10000,
-    "BUILD_SETTLEMENT": 1000,
-    "BUY_DEVCARD": 100,
-}
+class StateCache():
+    "Least recently used states of lean nodes, so hot paths are not replayed from the root every time"
+    def __init__(self, size: int):
+        self.size: int = size
+        self.states: OrderedDict[Node, Game] = OrderedDict()
+
+    def get(self, node: Node) -> Game:
+        state = self.states.get(node)
+        if state is not None:
+            self.states.move_to_end(node)
+        return state
+
+    def put(self, node: Node, state: Game):
+        if self.size <= 0:
+            return
+        self.states[node] = state
+        self.states.move_to_end(node)
+        if len(self.states) > self.size:
+            self.states.popitem(last=False)
+
+class OpenLoopNode():
+    """
+    Node for open loop search, holds only the action leading to it so that dice
+    rolls and card draws are resampled on every iteration instead of frozen
+    """
+    def __init__(self, parent=None, action=None):
+        self.parent: OpenLoopNode = parent
+        self.action: Action = action
+        self.children: Dict[Action, OpenLoopNode] = {}
+        self.visits: int = 0
+        self.value: int = 0
+        self.availability: int = 0 # iterations in which this action was legal
+        self.last_visit: int = 0
+
+    def best_child(self, legal_actions: List[Action], exploration_param=EXPLORATION_PARAM):
+        "UCT over the children legal in the current determinization"
+        children = [self.children[action] for action in legal_actions]
+        for child in children:
+            child.availability += 1
+        choices_weights = [
+            (child.value / child.visits) + exploration_param * np.sqrt(np.log(child.availability) / child.visits)
+            for child in children
+        ]
+        return children[np.argmax(choices_weights)]
+
+    def add_child(self, action):
+        child_node = OpenLoopNode(parent=self, action=action)
+        self.children[action] = child_node
+        return child_node
 
 class MCTSPlayer(Player):
     """
@@ -87,12 +234,28 @@ class MCTSPlayer(Player):
     """
     type = "MCTSPlayer"
 
-    def __init__(self, Colour, Iterations: int=1000, Pruning: bool=True, Reward: bool=True):
+    def __init__(self, Colour, Iterations: int=1000, Pruning: bool=True, Reward: bool=True, TableSize: int=0, Determinize: bool=False,
+                 RolloutDepth: int=None, Evaluator=None, Book: str=None, RolloutPolicy: WeightedPolicy=DEFAULT_POLICY,
+                 Lean: bool=False, StateCache: int=0, NodeBudget: int=0, Eviction: str="visits", Rave: float=0):
         super().__init__(Colour)
         self.iterations = Iterations
         self.colour = Colour
         self.pruning = Pruning
         self.reward = Reward
+        self.table_size = TableSize # 0 disables the transposition table
+        self.determinize = Determinize # open loop search over resampled hidden information
+        self.rollout_depth = RolloutDepth # ticks before a rollout is cut off and scored, None plays to the end
+        self.evaluator = Evaluator or StaticEvaluator.load()
+        self.book = OpeningBook(Book) if Book else None # setup phase statistics shared between games
+        self.rollout_policy = RolloutPolicy # moves made in rollouts, where there is no game to search
+        self.lean = Lean # nodes below the root rebuild their state by replaying from the root
+        self.state_cache_size = StateCache # states of lean nodes kept for reuse
+        if Eviction not in ("visits", "recent"):
+            raise ValueError(f"Eviction must be visits or recent, not {Eviction}")
+        self.node_budget = NodeBudget # nodes held before subtrees are evicted, 0 is unbounded
+        self.eviction = Eviction # evicts the least visited or least recently visited subtrees first
+        self.memory = TreeMemory(NodeBudget) # of the last search
+        self.rave = Rave # RAVE equivalence parameter, child visits at which AMAF and UCT values weigh the same, 0 disables
         self.max_workers = 10
 
     def choose_action(self, possible_actions, game: Game=None):
@@ -104,23 +267,72 @@ class MCTSPlayer(Player):
         #     return random.choice(possible_actions)
         # If game was not passed play like WeightedPlayer
         if not game:
-            bloated_actions = []
-            for action in possible_actions:
-                weight = WEIGHTS_BY_ACTION_TYPE.get(action.type, 1)
-                bloated_actions.extend([action] * weight)
-            return random.choice(bloated_actions)
+            return self.rollout_policy.choose(possible_actions)
         
         # MCTS
         start = time.time()
 
-        root = Node(game, pruning=self.pruning)
+        canonical: CanonicalBoard = None
+        prior: Dict[Action, Tuple[int, float]] = {}
+        if self.book and game.starting_settlement_phase:
+            canonical = CanonicalBoard(game)
+            prior = self.get_book_prior(canonical, possible_actions)
+            if sum(visits for visits, _ in prior.values()) >= self.iterations:
+                # the book already holds a full search of this position
+                print(f"MCTS answered from opening book in {time.time() - start:.2f}")
+                return max(prior, key=lambda action: prior[action][1] / prior[action][0])
+
+        if self.determinize:
+            root = self.run_open_loop(game, prior)
+            children = list(root.children.values())
+            score = lambda child: child.value / child.visits
+        else:
+            root = self.run_closed_loop(game, prior)
+            children = root.children
+            score = lambda child: root.score(child, self.rave)
+
+        if canonical:
+            self.book.record(canonical.key, {
+                canonical.action_name(child.action): (
+                    child.visits - prior.get(child.action, (0, 0))[0],
+                    child.value - prior.get(child.action, (0, 0))[1])
+                for child in children
+            })
+
+        print(f"MCTS completed in {time.time() - start:.2f}, {self.memory.report()}")
+        return max(children, key=score).action
+
+    def get_book_prior(self, canonical: CanonicalBoard, possible_actions: List[Action]) -> Dict[Action, Tuple[int, float]]:
+        "Statistics the opening book holds for the legal actions"
+        statistics = self.book.lookup(canonical.key)
+        prior: Dict[Action, Tuple[int, float]] = {}
+        for action in possible_actions:
+            name = canonical.action_name(action)
+            if name in statistics:
+                prior[action] = statistics[name]
+        return prior
+
+    def run_closed_loop(self, game: Game, prior: Dict[Action, Tuple[int, float]]) -> Node:
+        "Standard search where every node keeps the state it was expanded into, or only the root when lean"
+        table = TranspositionTable(self.table_size) if self.table_size else None
+        root = Node(game, pruning=self.pruning, table=table, lean=self.lean)
+        self.memory = TreeMemory(self.node_budget)
+        # held here rather than on the player, search copies of the game would copy it with the player
+        state_cache = StateCache(self.state_cache_size)
+
+        iterations = self.iterations
+        for action, (visits, value) in prior.items():
+            if action in root.untried_actions:
+                child = self.expand_lean(root, state_cache, action)[0] if self.lean else self.expand(root, action)
+                self.memory.add()
+                child.visits += visits
+                child.value += value
+                root.visits += visits
+                iterations -= visits
+
         if not USE_ENSEMBLE:
-            for _ in range(self.iterations):
-                node = self.select(root)
-                if not node.is_terminal():
-                    node = self.expand(node)
-                reward = self.simulate(deepcopy(node.state))
-                self.backpropagate(node, reward)
+            for _ in range(max(iterations, 0)):
+                self.iterate(root, state_cache)
         else:
             with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
                 futures = [executor.submit(self.run_mcts, deepcopy(root)) for _ in range(self.max_workers)]
@@ -131,19 +343,128 @@ class MCTSPlayer(Player):
                     else:
                         self.merge_trees(root, result_node)
 
-        print(f"MCTS completed in {time.time() - start:.2f}")
-        return root.best_child(exploration_param=0).action
+        return root
     
     def run_mcts(self, root):
         "Runs a Monte Carlo Tree Search and returns the root"
+        state_cache = StateCache(self.state_cache_size)
         for _ in range(self.iterations):
-            node = self.select(root)
-            if not node.is_terminal():
+            self.iterate(root, state_cache)
+        return root
+
+    def iterate(self, root: Node, state_cache: StateCache):
+        "One select, expand, simulate and backpropagate cycle"
+        self.memory.clock += 1
+        node = self.select(root)
+        leaf = node.is_terminal() or node.collapsed
+        played: List[Tuple[str, Action]] = [] if self.rave else None # rollout moves, for the AMAF statistics
+        if not self.lean:
+            if not leaf:
                 node = self.expand(node)
-            reward = self.simulate(deepcopy(node.state))
+                self.memory.add()
+            reward = self.simulate(node.state, played=played)
+        else:
+            if not leaf:
+                node, state = self.expand_lean(node, state_cache)
+                self.memory.add()
+            else:
+                state = self.get_state(node, state_cache)
+            if state_cache.size > 0:
+                state_cache.put(node, state)
+                reward = self.simulate(state, played=played)
+            else:
+                # the rebuilt state is used once, so the rollout can play on it
+                reward = self.simulate(state, copy=False, played=played)
+        self.backpropagate(node, reward)
+        if self.rave:
+            self.update_amaf(node, played, reward)
+        if self.memory.over_budget():
+            self.evict(root)
+    
+    def run_open_loop(self, game: Game, prior: Dict[Action, Tuple[int, float]]) -> OpenLoopNode:
+        "Open loop search, every iteration replays the tree's actions on a fresh determinization"
+        root = OpenLoopNode()
+        self.memory = TreeMemory(self.node_budget)
+
+        iterations = self.iterations
+        for action, (visits, value) in prior.items():
+            child = root.add_child(action)
+            self.memory.add()
+            child.visits += visits
+            child.value += value
+            iterations -= visits
+
+        for _ in range(max(iterations, 0)):
+            self.memory.clock += 1
+            state = self.sample_determinization(game)
+            node = root
+            while not state.game_over():
+                current_colour = state.player_order[state.current_player]
+                legal_actions = state.get_possible_actions(current_colour)
+                if node is root and self.pruning and (state.turn % 2) == 1:
+                    legal_actions = placement_prune_actions(state, legal_actions)
+                untried_actions = [action for action in legal_actions if action not in node.children]
+                if untried_actions:
+                    action = random.choice(untried_actions)
+                    state.step(current_colour, action)
+                    node = node.add_child(action)
+                    self.memory.add()
+                    break
+                node = node.best_child(legal_actions)
+                state.step(current_colour, node.action)
+            reward = self.simulate(state, copy=False)
             self.backpropagate(node, reward)
+            if self.memory.over_budget():
+                self.evict(root)
+
         return root
-    
+
+    def sample_determinization(self, game: Game) -> Game:
+        "Copies the game and reshuffles the development cards hidden from this player"
+        state = deepcopy(game)
+        self.configure_state(state)
+
+        current_colour = state.player_order[state.current_player]
+        hidden_pool: List[str] = []
+        hidden_counts: Dict[str, int] = {}
+        for colour, player in state.players.items():
+            if colour == self.colour:
+                continue
+            held: List[str] = []
+            for devcard, amount in player.development_cards.items():
+                held.extend([devcard] * amount)
+            # cards bought this turn are known to be unplayable and stay put
+            if colour == current_colour:
+                for devcard in state.devs_just_purchased:
+                    held.remove(devcard)
+            for devcard in held:
+                player.development_cards[devcard] -= 1
+            hidden_pool.extend(held)
+            hidden_counts[colour] = len(held)
+
+        for devcard, amount in state.bank_devcards.items():
+            hidden_pool.extend([devcard] * amount)
+            state.bank_devcards[devcard] = 0
+
+        random.shuffle(hidden_pool)
+        for colour, count in hidden_counts.items():
+            for _ in range(count):
+                state.players[colour].development_cards[hidden_pool.pop()] += 1
+        for devcard in hidden_pool:
+            state.bank_devcards[devcard] += 1
+
+        state.update_zobrist_hash()
+        return state
+
+    def configure_state(self, state: Game):
+        "Silences a search copy of the game"
+        state.gamelog = False
+        state.debug = False
+        state.savegame = False
+        state.reward = self.reward
+        state.turn_limit = 1000
+        state.tracker.series = None
+
     def merge_trees(self, root: Node, other_root: Node):
         "Merger function which combines two search trees at the root"
         for other_child in other_root.children:
@@ -159,35 +480,150 @@ class MCTSPlayer(Player):
 
     def select(self, node: Node):
         "Select leaf of tree"
-        while not node.is_terminal():
+        while not node.is_terminal() and not node.collapsed:
             if not node.is_fully_expanded():
                 return node
             else:
-                node = node.best_child()
+                node = node.best_child(rave=self.rave)
         return node
 
-    def expand(self, node: Node):
+    def expand(self, node: Node, action: Action=None):
         "Choose an untried action from the node and create child"
-        action = node.untried_actions.pop()
+        if action is None:
+            action = self.pop_untried_action(node)
+        else:
+            node.untried_actions.remove(action)
         new_state = deepcopy(node.state)
-        # ------------ game settings --------------
-        new_state.gamelog = False
-        new_state.debug = False
-        new_state.savegame = False
-        new_state.reward = self.reward
-        new_state.turn_limit = 1000
-        # -----------------------------------------
+        self.configure_state(new_state)
         current_colour = new_state.player_order[new_state.current_player]
         new_state.step(current_colour, action)
         return node.add_child(new_state, action)
 
-    def simulate(self, state: Game):
-        "Rollout the rest of the game from this state and get result"
-        return state.evaluate(self.colour)
+    def expand_lean(self, node: Node, state_cache: StateCache, action: Action=None) -> Tuple[Node, Game]:
+        "Expands a lean node, playing the action with a fresh chance seed kept on the child"
+        if action is None:
+            action = self.pop_untried_action(node)
+        else:
+            node.untried_actions.remove(action)
+        state = self.get_state(node, state_cache)
+        chance = random.getrandbits(64)
+        random.seed(chance)
+        state.step(state.player_order[state.current_player], action)
+        return node.add_child(state, action, chance), state
+
+    def get_state(self, node: Node, state_cache: StateCache) -> Game:
+        "A fresh copy of a lean node's state, replayed from its nearest ancestor with a state"
+        path: List[Node] = []
+        base: Game = node.state if node.state is not None else state_cache.get(node)
+        while base is None:
+            path.append(node)
+            node = node.parent
+            base = node.state if node.state is not None else state_cache.get(node)
+        state = deepcopy(base)
+        self.configure_state(state)
+        # replaying reseeds chance, the search's own random stream carries on afterwards
+        random_state = random.getstate()
+        for step in reversed(path):
+            random.seed(step.chance)
+            state.step(state.player_order[state.current_player], step.action)
+        random.setstate(random_state)
+        return state
+
+    def pop_untried_action(self, node: Node) -> Action:
+        "Next action to expand, with RAVE the untried action with the best AMAF value"
+        if not self.rave or not node.amaf:
+            return node.untried_actions.pop()
+        # actions not yet seen in a rollout are valued as the node itself
+        default = node.value / node.visits if node.visits else 0
+        values = [
+            node.amaf[action].value / node.amaf[action].visits if action in node.amaf else default
+            for action in node.untried_actions
+        ]
+        return node.untried_actions.pop(int(np.argmax(values)))
+
+    def simulate(self, state: Game, copy: bool=True, played: List[Tuple[str, Action]]=None):
+        "Rollout the rest of the game from this state, or a copy of it, and get result"
+        # a depth of 0 goes straight to the evaluator, nothing is played so no copy is needed
+        if copy and self.rollout_depth != 0:
+            state = deepcopy(state)
+        return state.evaluate(self.colour, depth=self.rollout_depth, evaluator=self.evaluator, played=played)
+
+    def evict(self, root):
+        """
+        Collapses the least visited, or least recently visited, subtrees until
+        the tree is back to EVICTION_TARGET of the node budget. A collapsed node
+        keeps the statistics of everything below it, closed loop nodes become
+        leaves that are only rolled out from while open loop nodes grow again.
+        The root's children are never removed, a budget below the root's
+        branching factor is overshot
+        """
+        order = [root]
+        for node in order:
+            order.extend(node.children.values() if isinstance(node.children, dict) else node.children)
+        sizes: Dict[int, int] = {}
+        for node in reversed(order):
+            children = node.children.values() if isinstance(node.children, dict) else node.children
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in children)
+
+        depths: Dict[int, int] = {id(root): 0}
+        for node in order[1:]:
+            depths[id(node)] = depths[id(node.parent)] + 1
+        key = (lambda node: node.visits) if self.eviction == "visits" else (lambda node: node.last_visit)
+        # deeper nodes first among equals, so a subtree is evicted before whatever holds it
+        candidates = sorted((node for node in order[1:] if node.children), key=lambda node: (key(node), -depths[id(node)]))
+
+        target = int(self.memory.budget * EVICTION_TARGET)
+        evicted = set()
+        for node in candidates:
+            if self.memory.nodes <= target:
+                break
+            ancestors = []
+            parent = node.parent
+            while parent is not None and id(parent) not in evicted:
+                ancestors.append(parent)
+                parent = parent.parent
+            if parent is not None:
+                continue # went with an ancestor's subtree
+            evicted.add(id(node))
+            freed = sizes[id(node)] - 1
+            for ancestor in ancestors:
+                sizes[id(ancestor)] -= freed
+            if isinstance(node.children, dict):
+                node.children = {}
+            else:
+                node.children = []
+                node.untried_actions = []
+                node.collapsed = True
+            self.memory.nodes -= freed
+            self.memory.evicted += freed
+        self.memory.evictions += 1
 
     def backpropagate(self, node: Node, reward):
         "Move up the tree and increment vists and adjust reward"
         node.visits += 1
         node.value += reward
+        node.last_visit = self.memory.clock
         if node.parent:
-            self.backpropagate(node.parent, reward)
\ No newline at end of file
+            self.backpropagate(node.parent, reward)
+
+    def update_amaf(self, node: Node, played: List[Tuple[str, Action]], reward):
+        """
+        All moves as first, every node on the path back to the root credits
+        the reward to each action its mover played anywhere below it, in the
+        tree or the rollout, as if it had been played first. An action played
+        more than once counts once
+        """
+        moves = list(played)
+        while node is not None:
+            seen: Set[Action] = set()
+            for colour, action in moves:
+                if colour == node.mover and action not in seen:
+                    seen.add(action)
+                    stats = node.amaf.get(action)
+                    if stats is None:
+                        stats = node.amaf[action] = NodeStats()
+                    stats.visits += 1
+                    stats.value += reward
+            if node.parent is not None:
+                moves.append((node.parent.mover, node.action))
+            node = node.parent
\ No newline at end of file
@@ -0,0 +1,151 @@
+import os
+import time
+from functools import partial
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+from src.game import Game
+from ml.evaluator import FEATURE_NAMES, get_player_features, collect_positions
+
+VALUE_FILE = os.path.join(os.path.dirname(__file__), "value_weights.npz")
+VALUE_FORMAT = "socai-value"
+VALUE_VERSION = 1
+
+VALUE_FEATURE_NAMES = (
+    [f"OWN_{name}" for name in FEATURE_NAMES] +
+    [f"MEAN_OPPONENT_{name}" for name in FEATURE_NAMES] +
+    [f"BEST_OPPONENT_{name}" for name in FEATURE_NAMES] +
+    ["TURN"]
+)
+
+def get_value_features(game: Game, colour: str) -> np.ndarray:
+    "The player's features next to the mean and best of the opponents'"
+    own = np.array(get_player_features(game, colour), dtype=np.float64)
+    others = np.array(
+        [get_player_features(game, other) for other in game.players if other != colour], dtype=np.float64)
+    return np.concatenate([own, others.mean(axis=0), others.max(axis=0), [game.turn / 100]])
+
+class ValueFunction():
+    """
+    Linear (hidden=0) or one hidden layer tanh network predicting the rollout
+    reward of a position, +1 win and -1 loss, in microseconds
+    """
+    def __init__(self, hidden: int=0, feature_count: int=len(VALUE_FEATURE_NAMES), seed: int=0):
+        rng = np.random.default_rng(seed)
+        self.hidden: int = hidden
+        self.mean = np.zeros(feature_count)
+        self.scale = np.ones(feature_count)
+
+        sizes = [feature_count, hidden, 1] if hidden else [feature_count, 1]
+        self.weights: List[np.ndarray] = [
+            rng.normal(0, 1 / np.sqrt(n_in), (n_in, n_out)) for n_in, n_out in zip(sizes[:-1], sizes[1:])
+        ]
+        self.biases: List[np.ndarray] = [np.zeros(n_out) for n_out in sizes[1:]]
+
+    def forward(self, x: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+        "Values of a batch of standardised features and the activations for backpropagation"
+        activations = [x]
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = np.tanh(x @ weight + bias)
+            activations.append(x)
+        return x[:, 0], activations
+
+    def __call__(self, game: Game, colour: str) -> float:
+        x = (get_value_features(game, colour) - self.mean) / self.scale
+        return float(self.forward(x[np.newaxis])[0][0])
+
+    def train(
+            self, features: np.ndarray, targets: np.ndarray, epochs: int=50, batch_size: int=256,
+            learning_rate: float=1e-3, seed: int=0
+            ) -> List[float]:
+        "Adam on the squared error between predicted and observed rewards, returns loss per epoch"
+        rng = np.random.default_rng(seed)
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0) + 1e-9
+        x_all = (features - self.mean) / self.scale
+
+        parameters = self.weights + self.biases
+        first_moments = [np.zeros_like(p) for p in parameters]
+        second_moments = [np.zeros_like(p) for p in parameters]
+        beta1, beta2, step = 0.9, 0.999, 0
+
+        losses: List[float] = []
+        for _ in range(epochs):
+            order = rng.permutation(len(targets))
+            epoch_loss: float = 0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                values, activations = self.forward(x_all[batch])
+                error = values - targets[batch]
+                epoch_loss += float((error ** 2).sum())
+
+                # backpropagation through the tanh layers
+                delta = (2 * error / len(batch))[:, np.newaxis] * (1 - activations[-1] ** 2)
+                gradients_w: List[np.ndarray] = []
+                gradients_b: List[np.ndarray] = []
+                for layer in reversed(range(len(self.weights))):
+                    gradients_w.insert(0, activations[layer].T @ delta)
+                    gradients_b.insert(0, delta.sum(axis=0))
+                    if layer:
+                        delta = (delta @ self.weights[layer].T) * (1 - activations[layer] ** 2)
+
+                step += 1
+                for i, (parameter, gradient) in enumerate(zip(parameters, gradients_w + gradients_b)):
+                    first_moments[i] = beta1 * first_moments[i] + (1 - beta1) * gradient
+                    second_moments[i] = beta2 * second_moments[i] + (1 - beta2) * gradient ** 2
+                    corrected_first = first_moments[i] / (1 - beta1 ** step)
+                    corrected_second = second_moments[i] / (1 - beta2 ** step)
+                    parameter -= learning_rate * corrected_first / (np.sqrt(corrected_second) + 1e-8)
+            losses.append(epoch_loss / len(targets))
+        return losses
+
+    def save(self, filepath: str=VALUE_FILE):
+        arrays = {f"weight_{i}": weight for i, weight in enumerate(self.weights)}
+        arrays.update({f"bias_{i}": bias for i, bias in enumerate(self.biases)})
+        np.savez(
+            filepath, format=VALUE_FORMAT, version=VALUE_VERSION, hidden=self.hidden,
+            feature_names=np.array(VALUE_FEATURE_NAMES), mean=self.mean, scale=self.scale, **arrays)
+
+    @staticmethod
+    def load(filepath: str=VALUE_FILE):
+        with np.load(filepath) as data:
+            if str(data["format"]) != VALUE_FORMAT or int(data["version"]) != VALUE_VERSION:
+                raise ValueError(f"{filepath} is not a version {VALUE_VERSION} value function")
+            if list(data["feature_names"]) != VALUE_FEATURE_NAMES:
+                raise ValueError(f"{filepath} was trained on different features")
+            value_function = ValueFunction(hidden=int(data["hidden"]))
+            value_function.mean = data["mean"]
+            value_function.scale = data["scale"]
+            layers = len(value_function.weights)
+            value_function.weights = [data[f"weight_{i}"] for i in range(layers)]
+            value_function.biases = [data[f"bias_{i}"] for i in range(layers)]
+        return value_function
+
+def train_value_function(games: int=2000, hidden: int=32, epochs: int=50, filepath: str=VALUE_FILE) -> ValueFunction:
+    "Trains a value function on positions sampled from self-play games and saves it"
+    start = time.time()
+    collect = partial(collect_positions, get_features=get_value_features)
+    with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
+        results = list(executor.map(collect, range(games), chunksize=8))
+    features = np.concatenate([features for features, _ in results])
+    targets = np.concatenate([outcomes for _, outcomes in results]) * 2 - 1
+    print(f"Collected {len(targets)} positions from {games} games in {time.time() - start:.2f} seconds")
+
+    # hold out the last tenth to check for overfitting
+    split = len(targets) * 9 // 10
+    value_function = ValueFunction(hidden=hidden)
+    start = time.time()
+    losses = value_function.train(features[:split], targets[:split], epochs=epochs)
+    held_out = (features[split:] - value_function.mean) / value_function.scale
+    held_out_loss = float(np.mean((value_function.forward(held_out)[0] - targets[split:]) ** 2))
+    print(f"Trained in {time.time() - start:.2f} seconds")
+    print(f"Training loss: {losses[-1]:.4f}, held out loss: {held_out_loss:.4f}, baseline: {np.var(targets):.4f}")
+
+    value_function.save(filepath)
+    return value_function
+
+if __name__ == "__main__":
+    train_value_function()
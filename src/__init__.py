@@ -0,0 +1,35 @@
+"""
+The engine's modules import each other by bare name (from game import Game),
+so src.<module> is made an alias of the module loaded under its bare name.
+Otherwise importing src.game next to game, as ml and the tests do, loads a
+second copy of every module, with classes that are not the same classes
+"""
+import os
+import sys
+import importlib
+import importlib.abc
+import importlib.util
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SOURCE_DIRECTORY not in sys.path:
+    sys.path.append(SOURCE_DIRECTORY)
+
+class AliasFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    "Resolves src.<module> to the module imported as <module>"
+    def find_spec(self, fullname, path, target=None):
+        package, _, name = fullname.partition(".")
+        if package != __name__ or not name or "." in name:
+            return None
+        if not os.path.exists(os.path.join(SOURCE_DIRECTORY, name + ".py")):
+            return None
+        return importlib.util.spec_from_loader(fullname, self)
+
+    def create_module(self, spec):
+        return importlib.import_module(spec.name.partition(".")[2])
+
+    def exec_module(self, module):
+        # already executed under its bare name
+        pass
+
+if not any(isinstance(finder, AliasFinder) for finder in sys.meta_path):
+    sys.meta_path.insert(0, AliasFinder())
@@ -0,0 +1,65 @@
+from typing import List, Dict
+
+import numpy as np
+
+from player import Action
+
+COLOURS = ["RED", "WHITE", "ORANGE", "BLUE"]
+RESOURCES = ["WOOD", "BRICK", "SHEEP", "WHEAT", "ORE"]
+
+class ActionSpace():
+    """
+    Fixed numbering of every action possible on a board topology, boards of
+    the same window size share it so action ids and masks line up across games
+    """
+    def __init__(self, board, colours: List[str]=COLOURS):
+        self.actions: List[Action] = [
+            Action("END_TURN", None),
+            Action("OPEN_TRADE", None),
+            Action("BUY_DEVCARD", None),
+            Action("PLAY_ROAD_BUILDING", None),
+            Action("PLAY_KNIGHT", None),
+        ]
+        self.actions.extend(Action("BUILD_ROAD", edge_id) for edge_id in board.edges)
+        self.actions.extend(Action("BUILD_SETTLEMENT", coord) for coord in board.vertices)
+        self.actions.extend(Action("BUILD_CITY", coord) for coord in board.vertices)
+        self.actions.extend(Action("PLAY_MONOPOLY", resource) for resource in RESOURCES)
+
+        # same pairs, in the same order, as Game.get_year_of_plenty_combinations
+        options = [""] + RESOURCES
+        for i, first in enumerate(options):
+            for second in options[i:]:
+                if second != "":
+                    self.actions.append(Action("PLAY_YEAR_OF_PLENTY", (first, second)))
+
+        for give in RESOURCES:
+            for want in RESOURCES:
+                if want != give:
+                    for cost in (2, 3, 4):
+                        self.actions.append(Action("TRADE_WITH_BANK", (give, cost, want)))
+                    self.actions.append(Action("TRADE_WITH_PLAYER", (give, want)))
+
+        for coord, hextile in board.hexes.items():
+            if hextile.resource != "SEA":
+                for colour in colours + [None]:
+                    self.actions.append(Action("MOVE_ROBBER_AND_ROB", (coord, colour)))
+
+        self.action_ids: Dict[Action, int] = {action: i for i, action in enumerate(self.actions)}
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def encode(self, action: Action) -> int:
+        return self.action_ids[action]
+
+    def decode(self, action_id: int) -> Action:
+        return self.actions[action_id]
+
+    def mask(self, possible_actions: List[Action], out: np.ndarray=None) -> np.ndarray:
+        "Boolean vector of the legal actions, written into out if given"
+        if out is None:
+            out = np.zeros(len(self.actions), dtype=bool)
+        else:
+            out[:] = False
+        out[[self.action_ids[action] for action in possible_actions]] = True
+        return out
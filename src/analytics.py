@@ -0,0 +1,84 @@
+from typing import Dict, List, Tuple
+from collections import deque
+import copy
+
+import numpy as np
+
+from hexlib import Point, Hex
+
+PIP_NUMBER_DICT = {2:1, 3:2, 4:3, 5:4, 6:5, 8:5, 9:4, 10:3, 11:2, 12:1}
+RESOURCES = ["WOOD", "BRICK", "SHEEP", "WHEAT", "ORE"]
+PORT_TYPES = RESOURCES + ["3:1"]
+
+class BoardAnalytics():
+    """
+    Per vertex facts about a board computed once at map creation, NumPy arrays
+    indexed by vertex_index[coord] so agents look them up instead of walking hexes
+    """
+    def __init__(self, catan_map):
+        self.vertex_coords: List[Point] = list(catan_map.vertices.keys())
+        self.vertex_index: Dict[Point, int] = {coord: i for i, coord in enumerate(self.vertex_coords)}
+        vertex_count = len(self.vertex_coords)
+
+        self.pips = np.zeros(vertex_count, dtype=np.int64)
+        # expected resources per roll, ignoring the robber
+        self.income = np.zeros((vertex_count, len(RESOURCES)), dtype=np.float64)
+        self.ports = np.zeros((vertex_count, len(PORT_TYPES)), dtype=bool)
+        self.coast_distance = np.zeros(vertex_count, dtype=np.int64)
+
+        # hex : (vertex indexes, resource index, income per roll) for robber updates
+        self.hex_contributions: Dict[Hex, Tuple[List[int], int, float]] = {}
+        for coord, hextile in catan_map.hexes.items():
+            if hextile.resource in RESOURCES and hextile.value:
+                indexes = [self.vertex_index[vertex] for vertex in hextile.vertex_neighbors]
+                resource = RESOURCES.index(hextile.resource)
+                per_roll = PIP_NUMBER_DICT[hextile.value] / 36
+                self.hex_contributions[coord] = (indexes, resource, per_roll)
+                self.pips[indexes] += PIP_NUMBER_DICT[hextile.value]
+                self.income[indexes, resource] += per_roll
+
+        self.diversity = np.count_nonzero(self.income, axis=1)
+
+        for coord, vertex in catan_map.vertices.items():
+            if vertex.port_type:
+                self.ports[self.vertex_index[coord], PORT_TYPES.index(vertex.port_type)] = True
+
+        self.compute_coast_distance(catan_map)
+
+        # expected resources per roll with the robber's hex blocked
+        self.robbed_income = self.income.copy()
+        self.robber_coord: Hex = None
+        self.move_robber(catan_map.robber_coord)
+
+    def compute_coast_distance(self, catan_map):
+        "Breadth first search inwards from the vertices touching the sea"
+        self.coast_distance[:] = -1
+        queue = deque()
+        for coord, vertex in catan_map.vertices.items():
+            # coastal vertices have fewer than 3 land hexes around them
+            if len(vertex.hex_neighbors) < 3:
+                self.coast_distance[self.vertex_index[coord]] = 0
+                queue.append(coord)
+        while queue:
+            coord = queue.popleft()
+            distance = self.coast_distance[self.vertex_index[coord]]
+            for neighbor in catan_map.vertices[coord].vertex_neighbors:
+                index = self.vertex_index[neighbor]
+                if self.coast_distance[index] == -1:
+                    self.coast_distance[index] = distance + 1
+                    queue.append(neighbor)
+
+    def move_robber(self, coord: Hex):
+        "Restores the income of the hex the robber left and blocks the new one"
+        for blocked, restored in ((self.robber_coord, 1), (coord, -1)):
+            if blocked in self.hex_contributions:
+                indexes, resource, per_roll = self.hex_contributions[blocked]
+                self.robbed_income[indexes, resource] += restored * per_roll
+        self.robber_coord = coord
+
+    def __deepcopy__(self, memo):
+        # only robbed income changes during a game, the rest is shared between copies
+        new = copy.copy(self)
+        new.robbed_income = self.robbed_income.copy()
+        memo[id(self)] = new
+        return new
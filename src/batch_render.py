@@ -0,0 +1,123 @@
+import os
+import sys
+import glob
+import time
+import math
+import argparse
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+# SDL must pick its drivers before pygame is initialised
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import pygame
+
+from replay import Replay, REPLAY_DIRECTORY
+from renderer import Renderer
+
+THUMBNAIL_WIDTH = 250 # contact sheet column width in pixels
+SHEET_COLUMNS = 8
+
+# one renderer per worker process, its frame surfaces, fonts and glyphs are reused for every game
+_renderer: Renderer = None
+
+def get_renderer(window_size: Tuple[int, int], game) -> Renderer:
+    global _renderer
+    if _renderer is None or _renderer.WINDOW_SIZE != window_size:
+        pygame.init()
+        _renderer = Renderer(windowSize=window_size, game=game, headless=True)
+    _renderer.display_game = game
+    return _renderer
+
+def render_replay(filepath: str, output_directory: str, turns: List[int]=None) -> List[str]:
+    """
+    Renders the start of the given turns of a replay, every turn if none are
+    given, to numbered PNGs and returns their paths. Once the replay runs out
+    the finished game is saved as final.png
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    directory = os.path.join(output_directory, name)
+    os.makedirs(directory, exist_ok=True)
+
+    # stepping straight through needs no keyframes
+    replay = Replay(filepath, keyframe_interval=0)
+    game = replay.new_game()
+    renderer = get_renderer(tuple(replay.header["window_size"]), game)
+    wanted = sorted(set(turns)) if turns is not None else None
+
+    frames: List[str] = []
+    def save_frame(name: str):
+        renderer.display()
+        frame = os.path.join(directory, name)
+        pygame.image.save(renderer.window, frame)
+        frames.append(frame)
+
+    rendered_turn: int = None
+    while True:
+        if game.turn != rendered_turn and (wanted is None or game.turn in wanted):
+            save_frame(f"turn_{game.turn:04d}.png")
+            rendered_turn = game.turn
+        if wanted is not None and (not wanted or game.turn >= wanted[-1]):
+            break
+        if not replay.step(game):
+            # the winning step ends the game part way through its last turn
+            save_frame("final.png")
+            break
+    return frames
+
+def write_contact_sheet(frames: List[str], filepath: str, columns: int=SHEET_COLUMNS, width: int=THUMBNAIL_WIDTH):
+    "Tiles thumbnails of the frames, row by row, into one image"
+    images = [pygame.image.load(frame) for frame in frames]
+    height = round(images[0].get_height() * width / images[0].get_width())
+    rows = math.ceil(len(images) / columns)
+    sheet = pygame.Surface((width * min(columns, len(images)), height * rows))
+    sheet.fill((40, 40, 40))
+    for i, image in enumerate(images):
+        thumbnail = pygame.transform.smoothscale(image, (width, height))
+        sheet.blit(thumbnail, ((i % columns) * width, (i // columns) * height))
+    pygame.image.save(sheet, filepath)
+
+def render_replays(
+        filepaths: List[str], output_directory: str, turns: List[int]=None, workers: int=None,
+        contact_sheet: bool=True) -> List[List[str]]:
+    "Renders many replays in a process pool, with a contact sheet of each game's last frame"
+    start = time.time()
+    workers = workers or multiprocessing.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_replay, filepath, output_directory, turns) for filepath in filepaths]
+        results = [future.result() for future in futures]
+
+    frame_count = sum(len(frames) for frames in results)
+    run_time = time.time() - start
+    print(f"Rendered {frame_count} frames of {len(filepaths)} games in {run_time:.2f} seconds ({frame_count / run_time:.1f} frames/s)")
+
+    last_frames = [frames[-1] for frames in results if frames]
+    if contact_sheet and last_frames:
+        pygame.init()
+        write_contact_sheet(last_frames, os.path.join(output_directory, "contact_sheet.png"))
+    return results
+
+def parse_turns(text: str) -> List[int]:
+    "'all', a list like '1,17,40' or a step like 'every:5'"
+    if text == "all":
+        return None
+    if text.startswith("every:"):
+        return list(range(1, 10000, int(text.split(":")[1])))
+    return [int(turn) for turn in text.split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render replays to PNG frames without a display")
+    parser.add_argument("replays", nargs="*", help=f"replay files, defaults to every replay in {REPLAY_DIRECTORY}/")
+    parser.add_argument("--output", default="renders", help="directory to write frames to")
+    parser.add_argument("--turns", default="all", help="'all', turns like '1,17,40' or 'every:5'")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-contact-sheet", action="store_true")
+    args = parser.parse_args()
+
+    filepaths = args.replays or sorted(glob.glob(os.path.join(REPLAY_DIRECTORY, "*.replay")))
+    if not filepaths:
+        sys.exit(f"No replays found, record some with SAVEGAME = True in simulator.py")
+    render_replays(
+        filepaths, args.output, turns=parse_turns(args.turns), workers=args.workers,
+        contact_sheet=not args.no_contact_sheet)
@@ -0,0 +1,99 @@
+import time
+import random
+import argparse
+from collections import deque
+from typing import List, Dict, Callable
+
+from map import CatanMap
+from game import Game
+from player import RandomPlayer
+
+WINDOW_SIZE = (750, 910)
+RADII = [1, 2, 3, 5, 8, 12, 20]
+COLOURS = ["RED", "WHITE", "ORANGE", "BLUE"]
+
+def time_call(function: Callable, repeats: int) -> float:
+    "Mean seconds per call"
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+def new_game(radius: int, seed: int) -> Game:
+    players = [RandomPlayer(Colour=colour) for colour in COLOURS]
+    return Game(
+        windowSize=WINDOW_SIZE, players=players, gamelog=False, debug=False, savegame=False,
+        seed=seed, board_radius=radius)
+
+def play_until(game: Game, turn: int) -> Game:
+    "Plays random moves until the start of the turn or the end of the game"
+    while game.turn < turn and not game.game_over():
+        colour = game.player_order[game.current_player]
+        action = game.players[colour].choose_action(game.get_possible_actions(colour))
+        game.seed_chance()
+        game.step(colour, action)
+        game.tracker.ticks += 1
+    return game
+
+def build_road_network(game: Game, colour: str, roads: int):
+    """
+    Gives the colour a connected network of roads spreading out from the
+    centre, loops included, the worst case for the longest road search
+    """
+    board = game.board
+    start = board.hexes[next(iter(board.hexes))].vertex_neighbors[0]
+    owned: List[int] = []
+    visited = {start}
+    queue = deque([start])
+    while queue and len(owned) < roads:
+        vertex = queue.popleft()
+        for edge_id in board.vertices[vertex].edge_neighbors:
+            edge = board.edges[edge_id]
+            if edge.has_road or len(owned) >= roads:
+                continue
+            edge.has_road = True
+            edge.owner_colour = colour
+            owned.append(edge_id)
+            for neighbor in edge.vertex_neighbors:
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    queue.append(neighbor)
+    game.players[colour].owned_edges = owned
+
+def benchmark(radius: int, repeats: int=20, turn: int=30, roads: int=15, seed: int=0) -> Dict[str, float]:
+    "Milliseconds taken by map generation, action generation and the longest road search on one board size"
+    random.seed(seed)
+    generation = time_call(lambda: CatanMap(WINDOW_SIZE, radius=radius), repeats)
+    board = CatanMap(WINDOW_SIZE, radius=radius)
+
+    game = play_until(new_game(radius, seed), turn)
+    colour = game.player_order[game.current_player]
+    actions = time_call(lambda: game.get_possible_actions(colour), repeats)
+
+    game = new_game(radius, seed)
+    build_road_network(game, "RED", roads)
+    longest_road = time_call(lambda: game.board.get_longest_road("RED"), repeats)
+
+    return {
+        "radius": radius, "hexes": len(board.hexes), "vertices": len(board.vertices), "edges": len(board.edges),
+        "generation": generation * 1000, "actions": actions * 1000, "longest_road": longest_road * 1000,
+    }
+
+def print_results(results: List[Dict[str, float]]):
+    print(f"{'radius':>6} {'hexes':>6} {'vertices':>8} {'edges':>6} {'map ms':>9} {'actions ms':>10} {'longest ms':>10}")
+    for result in results:
+        print(
+            f"{result['radius']:>6} {result['hexes']:>6} {result['vertices']:>8} {result['edges']:>6} "
+            f"{result['generation']:>9.2f} {result['actions']:>10.3f} {result['longest_road']:>10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time board generation, action generation and longest road against board radius")
+    parser.add_argument("--radii", default=",".join(map(str, RADII)), help="board radii to time, like '1,2,3'")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--turn", type=int, default=30, help="turn of the random game whose actions are timed")
+    parser.add_argument("--roads", type=int, default=15, help="size of the road network searched for the longest road")
+    args = parser.parse_args()
+
+    print_results([
+        benchmark(int(radius), repeats=args.repeats, turn=args.turn, roads=args.roads)
+        for radius in args.radii.split(",")])
@@ -1,7 +1,7 @@
 from typing import Tuple, Set
 
 from hexlib import Point
-from map import CatanMap
+from map import CatanMap, STANDARD_RADIUS
 from player import Player
 from map import Edge
 
@@ -9,13 +9,14 @@ class Board(CatanMap):
     """
     Board implementation for Settlers of Catan
     """
-    def __init__(self, windowSize: Tuple[int, int], Game):
-        super().__init__(mapDimensions=windowSize)
+    def __init__(self, windowSize: Tuple[int, int], Game, radius: int=STANDARD_RADIUS):
+        super().__init__(mapDimensions=windowSize, radius=radius)
         self.game = Game
 
     def build_road(self, colour: str, edge_id: int) -> str:
         self.edges[edge_id].has_road = True
         self.edges[edge_id].owner_colour = colour
+        self.game.toggle_zobrist_feature(("ROAD", edge_id, colour))
 
         player: Player = self.game.players[colour]
         player.owned_edges.append(edge_id)
@@ -43,6 +44,7 @@ class Board(CatanMap):
 
         self.vertices[coord].building = "SETTLEMENT"
         self.vertices[coord].owner_colour = colour
+        self.game.toggle_zobrist_feature(("VERTEX", coord, colour, "SETTLEMENT"))
         port_type = self.vertices[coord].port_type
         if port_type:
             if port_type == "3:1":
@@ -60,6 +62,9 @@ class Board(CatanMap):
     
     def build_city(self, colour: str, coord: Point) -> str:
         self.vertices[coord].building = "CITY"
+        owner_colour = self.vertices[coord].owner_colour
+        self.game.toggle_zobrist_feature(("VERTEX", coord, owner_colour, "SETTLEMENT"))
+        self.game.toggle_zobrist_feature(("VERTEX", coord, owner_colour, "CITY"))
 
         player: Player = self.game.players[colour]
         player.cities_left -= 1
@@ -0,0 +1,260 @@
+import json
+import time
+import socket
+import asyncio
+import argparse
+import multiprocessing
+from collections import deque
+from statistics import mean
+from typing import List, Dict, Set, Tuple, Callable
+
+from game import Game
+from player import Player, RandomPlayer, WeightedRandomPlayer
+
+WINDOW_SIZE = (750, 910)
+TASK_TIMEOUT = 300 # seconds a worker has to return a task before it is handed to another
+GAMES_PER_TASK = 20
+CONNECT_WAIT = 60 # seconds a worker keeps trying to reach a coordinator that is not up yet
+MESSAGE_LIMIT = 2**24 # longest line the coordinator reads, a task's results come back on one line
+DEFAULT_PLAYERS = [{"type": "RandomPlayer", "Colour": colour} for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+
+def make_player(spec: Dict) -> Player:
+    "Player from a spec of its type and keyword arguments, such as {'type': 'MCTSPlayer', 'Colour': 'RED', 'Iterations': 200}"
+    options = {key: value for key, value in spec.items() if key != "type"}
+    if spec["type"] == "RandomPlayer":
+        return RandomPlayer(**options)
+    if spec["type"] == "WeightedRandomPlayer":
+        return WeightedRandomPlayer(**options)
+    if spec["type"] == "MCTSPlayer":
+        # only workers running search players import the ml package
+        from ml.mcts import MCTSPlayer
+        return MCTSPlayer(**options)
+    raise ValueError(f"unknown player type {spec['type']}")
+
+def play_game(players: List[Dict], seed: int, settings: Dict) -> Dict:
+    "Plays one seeded game and returns its compact result"
+    game = Game(
+        WINDOW_SIZE, [make_player(spec) for spec in players], gamelog=False, debug=False, savegame=False, seed=seed,
+        **settings)
+    tracker = game.play()
+    return {
+        "seed": seed, "winner": tracker.winner, "turns": game.turn, "ticks": tracker.ticks,
+        "victory_points": {colour: player.victory_points for colour, player in game.players.items()},
+    }
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+class Coordinator():
+    """
+    Splits games into tasks of consecutive seeds and hands them to workers
+    pulling over TCP, as newline delimited JSON. Results are merged by seed
+    as they arrive. A task not returned within task_timeout, or held by a
+    worker that disconnects, goes back on the queue and whichever copy
+    returns first counts
+    """
+    def __init__(
+            self, games: int, players: List[Dict]=DEFAULT_PLAYERS, first_seed: int=0, games_per_task: int=GAMES_PER_TASK,
+            task_timeout: float=TASK_TIMEOUT, settings: Dict=None, on_result: Callable[[Dict], None]=None):
+        self.players = players
+        self.settings = settings or {} # keyword arguments of every Game
+        self.task_timeout = task_timeout
+        self.on_result = on_result
+
+        # task id : (first seed, games)
+        self.tasks: Dict[int, Tuple[int, int]] = {}
+        for task_id, start in enumerate(range(first_seed, first_seed + games, games_per_task)):
+            self.tasks[task_id] = (start, min(games_per_task, first_seed + games - start))
+        self.queue: deque = deque(self.tasks)
+        self.in_flight: Dict[int, float] = {} # task id : deadline
+        self.finished: Set[int] = set()
+        self.results: Dict[int, Dict] = {} # seed : result
+
+        self.retries: int = 0
+        self.duplicates: int = 0
+        self.workers: int = 0
+        self.done: asyncio.Event = None
+        self.server: asyncio.AbstractServer = None
+        self.address: str = None
+
+    def next_task(self) -> int:
+        "Requeues expired tasks and takes the next unfinished one, None when all are out"
+        now = time.monotonic()
+        for task_id, deadline in list(self.in_flight.items()):
+            if deadline <= now:
+                del self.in_flight[task_id]
+                self.queue.append(task_id)
+                self.retries += 1
+        while self.queue:
+            task_id = self.queue.popleft()
+            if task_id not in self.finished and task_id not in self.in_flight:
+                self.in_flight[task_id] = now + self.task_timeout
+                return task_id
+        return None
+
+    async def assign(self) -> int:
+        "The next task for an idle worker, waiting while every task is out, None once all are finished"
+        while not self.done.is_set():
+            task_id = self.next_task()
+            if task_id is not None:
+                return task_id
+            # every task is out, wait for them to finish or the first to expire
+            timeout = max(0, min(self.in_flight.values()) - time.monotonic())
+            try:
+                await asyncio.wait_for(self.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    def complete(self, task_id: int, results: List[Dict]):
+        if task_id in self.finished:
+            self.duplicates += 1
+            return
+        self.finished.add(task_id)
+        self.in_flight.pop(task_id, None)
+        for result in results:
+            self.results[result["seed"]] = result
+            if self.on_result is not None:
+                self.on_result(result)
+        if len(self.finished) == len(self.tasks):
+            self.done.set()
+
+    async def on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.workers += 1
+        task_id: int = None
+        try:
+            await reader.readline() # the worker's hello
+            while (task_id := await self.assign()) is not None:
+                start, games = self.tasks[task_id]
+                message = {"type": "task", "id": task_id, "seeds": [start, games], "players": self.players, "settings": self.settings}
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                self.complete(reply["id"], reply["results"])
+            else:
+                writer.write(json.dumps({"type": "done"}).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if task_id is not None and task_id in self.in_flight:
+                # lost with its worker, retried straight away
+                del self.in_flight[task_id]
+                self.queue.appendleft(task_id)
+                self.retries += 1
+            self.workers -= 1
+            writer.close()
+
+    async def start(self, address: str) -> str:
+        "Listens on host:port, port 0 picks a free one, and returns the address workers should connect to"
+        self.done = asyncio.Event()
+        if not self.tasks:
+            self.done.set()
+        host, port = parse_address(address)
+        self.server = await asyncio.start_server(self.on_connect, host, port, limit=MESSAGE_LIMIT)
+        self.address = f"{host}:{self.server.sockets[0].getsockname()[1]}"
+        return self.address
+
+    async def wait(self) -> List[Dict]:
+        "Results of every game in seed order, once all tasks are finished"
+        await self.done.wait()
+        self.server.close()
+        return [self.results[seed] for seed in sorted(self.results)]
+
+def connect(address: str, wait: float=CONNECT_WAIT) -> socket.socket:
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return socket.create_connection(parse_address(address))
+        except ConnectionRefusedError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+def run_worker(address: str, wait: float=CONNECT_WAIT) -> int:
+    "Pulls tasks from a coordinator and plays them until it has none left, returns the games played"
+    games = 0
+    with connect(address, wait) as connection:
+        stream = connection.makefile("rwb")
+        stream.write(json.dumps({"type": "ready"}).encode() + b"\n")
+        stream.flush()
+        while line := stream.readline():
+            message = json.loads(line)
+            if message["type"] == "done":
+                break
+            start, count = message["seeds"]
+            results = [play_game(message["players"], seed, message["settings"]) for seed in range(start, start + count)]
+            stream.write(json.dumps({"type": "result", "id": message["id"], "results": results}).encode() + b"\n")
+            stream.flush()
+            games += count
+    return games
+
+def start_workers(address: str, processes: int) -> List[multiprocessing.Process]:
+    workers = [multiprocessing.Process(target=run_worker, args=(address,), daemon=True) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def summarise(results: List[Dict], run_time: float, coordinator: Coordinator):
+    wins_by_colour: Dict[str, int] = {}
+    for result in results:
+        if result["winner"] is not None:
+            wins_by_colour[result["winner"]] = wins_by_colour.get(result["winner"], 0) + 1
+    finished = [result["turns"] for result in results if result["winner"] is not None]
+    print(f"Played {len(results)} games in {run_time:.2f} seconds ({len(results) / run_time:.1f} games/s)")
+    print(f"WINS BY COLOUR: {wins_by_colour}")
+    if finished:
+        print(f"AVERAGE GAME LENGTH: {mean(finished):.2f} turns")
+    print(f"Tasks retried: {coordinator.retries}, duplicate results dropped: {coordinator.duplicates}")
+
+async def coordinate(
+        address: str, games: int, players: List[Dict], games_per_task: int, task_timeout: float, local_workers: int,
+        first_seed: int=0, settings: Dict=None) -> List[Dict]:
+    coordinator = Coordinator(
+        games, players, first_seed=first_seed, games_per_task=games_per_task, task_timeout=task_timeout, settings=settings)
+    address = await coordinator.start(address)
+    print(f"Coordinating {games} games in {len(coordinator.tasks)} tasks on {address}")
+    workers = start_workers(address, local_workers)
+
+    start = time.time()
+    results = await coordinator.wait()
+    summarise(results, time.time() - start, coordinator)
+    for worker in workers:
+        # joined off the loop, which still has to tell the other workers there is nothing left
+        await asyncio.to_thread(worker.join)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run games across machines, workers pull seed ranges from a coordinator over TCP")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator")
+    coordinator_parser.add_argument("--listen", default="0.0.0.0:5556", help="host:port workers connect to")
+    coordinator_parser.add_argument("--games", type=int, default=1000)
+    coordinator_parser.add_argument("--first-seed", type=int, default=0)
+    coordinator_parser.add_argument("--games-per-task", type=int, default=GAMES_PER_TASK)
+    coordinator_parser.add_argument("--task-timeout", type=float, default=TASK_TIMEOUT)
+    coordinator_parser.add_argument("--local-workers", type=int, default=0, help="worker processes to start on this machine")
+    coordinator_parser.add_argument("--players", type=json.loads, default=DEFAULT_PLAYERS, help="JSON list of player specs")
+    coordinator_parser.add_argument("--output", default=None, help="file to write every game's result to, one JSON line each")
+
+    worker_parser = subparsers.add_parser("worker")
+    worker_parser.add_argument("--connect", required=True, help="host:port of the coordinator")
+    worker_parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    if args.role == "coordinator":
+        results = asyncio.run(coordinate(
+            args.listen, args.games, args.players, args.games_per_task, args.task_timeout, args.local_workers,
+            first_seed=args.first_seed))
+        if args.output:
+            with open(args.output, "w") as file:
+                for result in results:
+                    file.write(json.dumps(result) + "\n")
+    else:
+        for worker in start_workers(args.connect, args.processes):
+            worker.join()
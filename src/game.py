@@ -1,28 +1,40 @@
-from typing import Tuple, Dict, List, Set
+from typing import Tuple, Dict, List, Set, Callable
 from collections import defaultdict
 import random
 from itertools import combinations
 import pickle
 
-from map import Vertex, Hextile
+from map import Vertex, Hextile, STANDARD_RADIUS
 from board import Board
 from player import Player, Action
 from hexlib import Point, Hex
 from tracker import Tracker
+from zobrist import zobrist_key
 
 class Game():
     """
     Settlers of Catan game logic from zero to hero
     """
-    def __init__(self, windowSize: Tuple[int, int], players: List[Player], gamelog: bool, debug :bool, savegame :bool):
+    def __init__(
+            self, windowSize: Tuple[int, int], players: List[Player], gamelog: bool, debug :bool, savegame :bool,
+            hierarchical_trades: bool=False, seed: int=None, board_radius: int=STANDARD_RADIUS, telemetry: bool=False):
         self.gamelog: bool = gamelog
         self.debug: bool = debug
         self.savegame: bool = savegame
         self.reward: bool = False
         self.turn_limit: int = 1000
         self.turn: int = 1
+        self.window_size: Tuple[int, int] = windowSize
 
-        self.board = Board(windowSize, self)
+        # a seeded game regenerates the same board and chance outcomes, which replays rely on
+        if seed is None and savegame:
+            seed = random.SystemRandom().getrandbits(32)
+        self.seed: int = seed
+        if seed is not None:
+            random.seed(seed)
+
+        self.board_radius: int = board_radius
+        self.board = Board(windowSize, self, radius=board_radius)
         self.starting_settlement_phase: bool = True
         self.last_settlement_coord: Point = None
 
@@ -41,15 +53,37 @@ class Game():
 
         self.player_trade_limit: int = 1
         self.current_trades: int = 0
+        # choose OPEN_TRADE first and the give/receive pair as a second decision
+        self.hierarchical_trades: bool = hierarchical_trades
+        self.trading: bool = False
 
         self.largest_army_colour: str = None
         self.longest_road_colour: str = None
 
         self.mcts_reward: int = 0
-        self.tracker: Tracker = Tracker()
+        # per turn columns of the tracker are recorded when telemetry is on
+        self.tracker: Tracker = Tracker([player.colour for player in players], telemetry=telemetry)
+        # observers of every top level decision made in play
+        self.recorders: List = []
 
         # player setup
         self.initialise_players(players)
+
+        # incremental 64 bit hash of the position
+        self.zobrist_hash: int = 0
+        self.zobrist_state: List[Tuple] = []
+        self.compute_zobrist_hash()
+
+        # append only log of every decision, replaces per turn snapshots
+        self.replay_writer = None
+        self.replay_path: str = None
+        if savegame:
+            from replay import ReplayWriter, get_replay_path
+            self.replay_path = get_replay_path(seed)
+            self.replay_writer = ReplayWriter(self, self.replay_path)
+
+        if self.tracker.series is not None:
+            self.tracker.series.append(self)
     
     def save_game(self, filepath: str):
         with open(filepath, 'wb') as file:
@@ -72,13 +106,72 @@ class Game():
         self.player_order = random.sample(self.player_order, NUMBER_OF_PLAYERS)
 
         return
+
+    def get_zobrist_state(self) -> List[Tuple]:
+        "Hashable features of the hands, bank, robber and turn"
+        state: List[Tuple] = []
+        for colour in self.player_order:
+            player: Player = self.players[colour]
+            for resource, amount in player.resources.items():
+                state.append(("HAND", colour, resource, amount))
+            for devcard, amount in player.development_cards.items():
+                state.append(("DEVCARD", colour, devcard, amount))
+            state.append(("KNIGHTS", colour, player.knights_played))
+        for resource, amount in self.bank_resources.items():
+            state.append(("BANK", resource, amount))
+        for devcard, amount in self.bank_devcards.items():
+            state.append(("BANK_DEVCARD", devcard, amount))
+        state.append(("ROBBER", self.board.robber_coord))
+        state.append(("TURN", self.turn, self.current_player))
+        state.append((
+            "PHASE", self.robber_active, bool(self.devcard_played),
+            self.current_trades, self.trading, tuple(self.devs_just_purchased)
+            ))
+        return state
+
+    def compute_zobrist_hash(self) -> int:
+        "Hashes the whole position from scratch"
+        zobrist_hash: int = 0
+        for coord, vertex in self.board.vertices.items():
+            if vertex.owner_colour:
+                zobrist_hash ^= zobrist_key(("VERTEX", coord, vertex.owner_colour, vertex.building))
+        for edge_id, edge in self.board.edges.items():
+            if edge.has_road:
+                zobrist_hash ^= zobrist_key(("ROAD", edge_id, edge.owner_colour))
+
+        self.zobrist_state = self.get_zobrist_state()
+        for feature in self.zobrist_state:
+            zobrist_hash ^= zobrist_key(feature)
+
+        self.zobrist_hash = zobrist_hash
+        return zobrist_hash
+
+    def toggle_zobrist_feature(self, feature: Tuple):
+        "Adds or removes a building or road from the hash"
+        self.zobrist_hash ^= zobrist_key(feature)
+
+    def update_zobrist_hash(self):
+        "Rehashes only the hand, bank, robber and turn features that changed"
+        new_state = self.get_zobrist_state()
+        for old, new in zip(self.zobrist_state, new_state):
+            if old != new:
+                self.zobrist_hash ^= zobrist_key(old) ^ zobrist_key(new)
+        self.zobrist_state = new_state
     
-    def evaluate(self, runner_colour: str) -> int:
+    def evaluate(self, runner_colour: str, depth: int=None, evaluator: Callable[["Game", str], float]=None,
+                 played: List[Tuple[str, Action]]=None) -> float:
+        "Plays out the game, or scores it with the evaluator once depth ticks have been played, recording moves into played"
+        ticks: int = 0
         while not self.game_over():
+            if depth is not None and ticks >= depth:
+                return evaluator(self, runner_colour)
+            ticks += 1
             current_colour = self.player_order[self.current_player]
             current_player = self.players[current_colour]
             possible_actions = self.get_possible_actions(current_colour)
             chosen_action = current_player.choose_action(possible_actions)
+            if played is not None:
+                played.append((current_colour, chosen_action))
             self.step(current_colour, chosen_action)
         
         winner_colour = self.tracker.winner
@@ -109,9 +202,24 @@ class Game():
                 chosen_action: Action = player.choose_action(possible_actions, game=self)
             else:
                 chosen_action: Action = player.choose_action(possible_actions)
+            for recorder in self.recorders:
+                recorder.record(self, current_colour, possible_actions, chosen_action)
+            if self.replay_writer is not None:
+                self.replay_writer.record_action(chosen_action)
+            self.seed_chance()
             self.step(current_colour, chosen_action)
             self.tracker.ticks += 1
 
+        return self.finish()
+
+    def finish(self) -> Tracker:
+        "Closes the recorders and fills in the tracker once the game is over"
+        for recorder in self.recorders:
+            recorder.end_game(self)
+        if self.replay_writer is not None:
+            self.replay_writer.close()
+            self.replay_writer = None
+
         if self.gamelog:
             print("-"*55)
             print(f"Longest Road: {self.longest_road_colour}, Largest Army: {self.largest_army_colour}\n")
@@ -134,8 +242,23 @@ class Game():
                 self.tracker.settlements_built[colour] = settlements + cities
                 self.tracker.cities_built[colour] = cities
 
+        if self.tracker.series is not None:
+            self.tracker.series.append(self)
+
         return self.tracker
 
+    def choose_nested_action(self, player: Player, possible_actions: List[Action]) -> Action:
+        "Decisions taken within a step, answering trades and placing free roads"
+        chosen_action: Action = player.choose_action(possible_actions)
+        if self.replay_writer is not None:
+            self.replay_writer.record_choice(possible_actions.index(chosen_action))
+        return chosen_action
+
+    def seed_chance(self):
+        "Makes the dice, card draws and robberies of the next step depend only on the seed and tick"
+        if self.seed is not None:
+            random.seed((self.seed << 32) | self.tracker.ticks)
+
     def game_over(self) -> bool:
         for player in self.players.values():
             if player.victory_points >= 10:
@@ -157,7 +280,6 @@ class Game():
             print(f"TURN[{self.turn}]")
             print("-"*55)
         self.initial_builds(order_forward, distribute=False)
-        if self.savegame: self.save_game(f"saves/turn_{self.turn}")
         self.turn += 1
 
         if self.gamelog: 
@@ -165,7 +287,6 @@ class Game():
             print(f"TURN[{self.turn}]")
             print("-"*55)
         self.initial_builds(order_backward, distribute=True)
-        if self.savegame: self.save_game(f"saves/turn_{self.turn}")
         self.turn += 1
 
     def initial_builds(self, player_order: List[str], distribute: bool):
@@ -224,6 +345,7 @@ class Game():
         self.board.hexes[self.board.robber_coord].has_robber = False
         self.board.robber_coord = coord
         self.board.hexes[coord].has_robber = True
+        self.board.analytics.move_robber(coord)
         log += f"{colour} has moved ROBBER to {coord}\n"
 
         # selecting player to rob
@@ -295,7 +417,7 @@ class Game():
                 possible_trades.append(Action("CONFIRMED_TRADE", other.colour))
 
         if possible_trades:
-            selected_trade = player.choose_action(possible_trades)
+            selected_trade = self.choose_nested_action(player, possible_trades)
             acceptee: Player = self.players[selected_trade.value]
 
             # Update resources for the trade
@@ -311,15 +433,19 @@ class Game():
         return log
     
     def propose_trade(self, receiver: Player, trade: Tuple[str, str]) -> bool:
+        possible_actions: List[Action] = self.get_trade_responses(receiver, trade)
+        chosen = self.choose_nested_action(receiver, possible_actions)
+
+        return chosen.type
+
+    def get_trade_responses(self, receiver: Player, trade: Tuple[str, str]) -> List[Action]:
         possible_actions: List[Action] = [Action("DECLINE_TRADE", trade)]
 
         needed_resourcee: str = trade[1]
         if receiver.resources[needed_resourcee] >= 1:
             possible_actions.append(Action("ACCEPT_TRADE", trade))
 
-        chosen = receiver.choose_action(possible_actions)
-
-        return chosen.type
+        return possible_actions
 
     def discard_resources(self) -> str:
         log: str = ""
@@ -362,7 +488,7 @@ class Game():
         
         elif total_roll:
             assert total_roll != 7
-            rolled_hexcoords = self.board.values_dict[total_roll]
+            rolled_hexcoords = self.board.values_dict.get(total_roll, [])
 
             for hexcoord in rolled_hexcoords:
                 hextile: Hextile = self.board.hexes[hexcoord]
@@ -411,14 +537,14 @@ class Game():
         if self.robber_active:
             return self.get_robber_possibilities(colour)
 
-        possible_actions.extend(self.get_possible_bank_trades(colour))
-        if self.current_trades < self.player_trade_limit:
-            player_resources: List[str] = []
-            for resource, value in player.resources.items():
-                if value > 0:
-                    player_resources.extend([resource] * value)
-            if player_resources:
-                possible_actions.extend(self.get_possible_player_trades(player_resources))
+        trades: List[Action] = self.get_possible_trades(colour)
+        if self.trading:
+            return trades
+        if trades:
+            if self.hierarchical_trades:
+                possible_actions.append(Action("OPEN_TRADE", None))
+            else:
+                possible_actions.extend(trades)
 
         can_afford: bool = ( # ROAD
             player.resources["WOOD"] >= 1 and player.resources["BRICK"] >= 1
@@ -488,6 +614,18 @@ class Game():
             
         return possible_actions
     
+    def get_possible_roads_after(self, colour: str, edge_id: int) -> List[Action]:
+        "The roads open to the colour once it also owns the edge, in the order building it would give"
+        player: Player = self.players[colour]
+        edge = self.board.edges[edge_id]
+        player.owned_edges.append(edge_id)
+        edge.has_road = True
+        try:
+            return self.get_possible_roads(colour)
+        finally:
+            edge.has_road = False
+            player.owned_edges.pop()
+
     def get_possible_settlements(self, colour: str, initial: bool=False) -> List[Action]:
         action_type: str = "BUILD_SETTLEMENT"
         possible_actions: List[Action] = []
@@ -626,6 +764,21 @@ class Game():
 
         return possible_actions
     
+    def get_possible_trades(self, colour: str) -> List[Action]:
+        "Every distinct bank and player trade available to the player"
+        player: Player = self.players[colour]
+        possible_actions: List[Action] = self.get_possible_bank_trades(colour)
+
+        if self.current_trades < self.player_trade_limit:
+            # one entry per resource held, not per card
+            player_resources: List[str] = [
+                resource for resource, value in player.resources.items() if value > 0
+            ]
+            if player_resources:
+                possible_actions.extend(self.get_possible_player_trades(player_resources))
+
+        return possible_actions
+
     def get_possible_bank_trades(self, colour: str) -> List[Action]:
         action_type: str = "TRADE_WITH_BANK"
         possible_actions: List[Action] = []
@@ -662,7 +815,6 @@ class Game():
         return possible_actions
     
     def end_turn(self):
-        if self.savegame: self.save_game(f"saves/turn_{self.turn}")
         if self.turn <= 16:
             # on odd turns ie settlements, don't change player
             if (self.turn % 2) == 1:
@@ -695,16 +847,20 @@ class Game():
         if self.turn == 17:
             self.starting_settlement_phase = False
         
+        total_roll: int = 0
         if not self.starting_settlement_phase:
             dice_roll: Tuple[int, int] = self.roll_dice()
             if self.gamelog: print(f"{current_colour} has rolled {dice_roll}")
-            total_roll: int = dice_roll[0] + dice_roll[1]
+            total_roll = dice_roll[0] + dice_roll[1]
             if total_roll == 7:
                 self.robber_active = True
                 log = self.discard_resources()
             else:
                 log = self.distribute_resources(total_roll)
             if self.gamelog: print(log)
+
+        if self.tracker.series is not None:
+            self.tracker.series.append(self, total_roll)
     
     def step(self, colour: str, chosen_action: Action):
         player: Player = self.players[colour]
@@ -791,12 +947,12 @@ class Game():
             log = f"{colour} has played ROAD_BUILDING"
             locations = self.get_possible_roads(colour)
             if locations:
-                action = player.choose_action(locations)
+                action = self.choose_nested_action(player, locations)
                 log += self.board.build_road(colour, action.value)
                 log += "\n"
             locations = self.get_possible_roads(colour)
             if locations:
-                action = player.choose_action(locations)
+                action = self.choose_nested_action(player, locations)
                 log += self.board.build_road(colour, action.value)
             if self.gamelog: print(log)
 
@@ -833,15 +989,24 @@ class Game():
             player.development_cards["YEAR_OF_PLENTY"] -= 1
             if self.gamelog: print(log)
 
+        elif action_type == "OPEN_TRADE":
+            self.trading = True
+            log = f"{colour} is looking to trade"
+            if self.gamelog: print(log)
+
         elif action_type == "TRADE_WITH_BANK":
+            self.trading = False
             log = self.trade_with_bank(colour, value)
             if self.gamelog and log != "": print(log)
 
         elif action_type == "TRADE_WITH_PLAYER":
+            self.trading = False
             self.current_trades += 1
             log = self.trade_with_players(colour, value)
             if self.gamelog and log != "": print(log)
 
         else:
             print(action_type)
-            raise ValueError("Invalid action type")
\ No newline at end of file
+            raise ValueError("Invalid action type")
+
+        self.update_zobrist_hash()
\ No newline at end of file
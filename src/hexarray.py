@@ -0,0 +1,174 @@
+"""
+NumPy batch versions of the hexlib conversions, cube coordinates are (N, 3)
+int arrays of q, r, s and offset, doubled and pixel coordinates (N, 2) arrays
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple, Iterable
+
+import numpy as np
+
+from hexlib import Hex, Point, Layout, EVEN, ODD
+
+def hexes_to_array(hexes: Iterable[Hex]) -> np.ndarray:
+    return np.array([tuple(h) for h in hexes], dtype=np.int64).reshape(-1, 3)
+
+def array_to_hexes(cube: np.ndarray) -> List[Hex]:
+    return [Hex(int(q), int(r), int(s)) for q, r, s in cube]
+
+def check_offset(offset: int):
+    if offset != EVEN and offset != ODD:
+        raise ValueError("offset must be EVEN (+1) or ODD (-1)")
+
+def qoffset_from_cube(offset: int, cube: np.ndarray) -> np.ndarray:
+    check_offset(offset)
+    q, r = cube[:, 0], cube[:, 1]
+    return np.stack([q, r + (q + offset * (q & 1)) // 2], axis=1)
+
+def qoffset_to_cube(offset: int, offset_coords: np.ndarray) -> np.ndarray:
+    check_offset(offset)
+    col, row = offset_coords[:, 0], offset_coords[:, 1]
+    r = row - (col + offset * (col & 1)) // 2
+    return np.stack([col, r, -col - r], axis=1)
+
+def roffset_from_cube(offset: int, cube: np.ndarray) -> np.ndarray:
+    check_offset(offset)
+    q, r = cube[:, 0], cube[:, 1]
+    return np.stack([q + (r + offset * (r & 1)) // 2, r], axis=1)
+
+def roffset_to_cube(offset: int, offset_coords: np.ndarray) -> np.ndarray:
+    check_offset(offset)
+    col, row = offset_coords[:, 0], offset_coords[:, 1]
+    q = col - (row + offset * (row & 1)) // 2
+    return np.stack([q, row, -q - row], axis=1)
+
+def qdoubled_from_cube(cube: np.ndarray) -> np.ndarray:
+    return np.stack([cube[:, 0], 2 * cube[:, 1] + cube[:, 0]], axis=1)
+
+def qdoubled_to_cube(doubled: np.ndarray) -> np.ndarray:
+    q = doubled[:, 0]
+    r = (doubled[:, 1] - q) // 2
+    return np.stack([q, r, -q - r], axis=1)
+
+def rdoubled_from_cube(cube: np.ndarray) -> np.ndarray:
+    return np.stack([2 * cube[:, 0] + cube[:, 1], cube[:, 1]], axis=1)
+
+def rdoubled_to_cube(doubled: np.ndarray) -> np.ndarray:
+    r = doubled[:, 1]
+    q = (doubled[:, 0] - r) // 2
+    return np.stack([q, r, -q - r], axis=1)
+
+def hex_round(fractional: np.ndarray) -> np.ndarray:
+    "Rounds fractional cube coordinates to the hexes containing them"
+    rounded = np.rint(fractional)
+    diff = np.abs(rounded - fractional)
+    # the component with the largest rounding error is rebuilt from the other two
+    largest = np.argmax(diff, axis=1)
+    rows = np.arange(len(rounded))
+    rounded[rows, largest] = 0
+    rounded[rows, largest] = -rounded.sum(axis=1)
+    return rounded.astype(np.int64)
+
+def hex_to_pixel(layout: Layout, cube: np.ndarray) -> np.ndarray:
+    M = layout.orientation
+    q, r = cube[:, 0], cube[:, 1]
+    x = (M.f0 * q + M.f1 * r) * layout.size.x + layout.origin.x
+    y = (M.f2 * q + M.f3 * r) * layout.size.y + layout.origin.y
+    return np.stack([x, y], axis=1)
+
+def pixel_to_hex(layout: Layout, points: np.ndarray) -> np.ndarray:
+    "Fractional cube coordinates of pixels, hex_round gives the hexes they fall in"
+    M = layout.orientation
+    x = (points[:, 0] - layout.origin.x) / layout.size.x
+    y = (points[:, 1] - layout.origin.y) / layout.size.y
+    q = M.b0 * x + M.b1 * y
+    r = M.b2 * x + M.b3 * y
+    return np.stack([q, r, -q - r], axis=1)
+
+@lru_cache(maxsize=None)
+def corner_offsets(layout: Layout) -> np.ndarray:
+    "(6, 2) pixel offsets of the corners from a hex centre, computed once per layout"
+    M = layout.orientation
+    angles = 2.0 * np.pi * (M.start_angle - np.arange(6)) / 6.0
+    offsets = np.stack([layout.size.x * np.cos(angles), layout.size.y * np.sin(angles)], axis=1)
+    offsets.flags.writeable = False
+    return offsets
+
+def polygon_corners(layout: Layout, cube: np.ndarray) -> np.ndarray:
+    "(N, 6, 2) corner pixels of each hex, rounded to 3 decimals as hexlib does"
+    return np.round(hex_to_pixel(layout, cube)[:, np.newaxis, :] + corner_offsets(layout), 3)
+
+class HitTester():
+    """
+    Maps pixels to the hex, vertex or edge under them, vertices and edge
+    midpoints are bucketed in a grid of hex sized cells so a query only
+    looks at the 3x3 cells around the pixel
+    """
+    def __init__(self, board):
+        self.layout: Layout = board.layout
+        self.hexes = board.hexes
+        self.cell_size: float = max(self.layout.size.x, self.layout.size.y)
+
+        self.vertex_coords: List[Point] = list(board.vertices.keys())
+        self.vertex_pixels = np.array(self.vertex_coords, dtype=np.float64).reshape(-1, 2)
+        self.edge_ids: List[int] = list(board.edges.keys())
+        self.edge_ends = np.array(
+            [edge.vertex_neighbors for edge in board.edges.values()], dtype=np.float64).reshape(-1, 2, 2)
+
+        self.vertex_cells = self.build_index(self.vertex_pixels)
+        self.edge_cells = self.build_index(self.edge_ends.mean(axis=1))
+
+    def build_index(self, pixels: np.ndarray) -> Dict[Tuple[int, int], np.ndarray]:
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, cell in enumerate(map(tuple, np.floor(pixels / self.cell_size).astype(np.int64))):
+            cells.setdefault(cell, []).append(i)
+        return {cell: np.array(indexes) for cell, indexes in cells.items()}
+
+    def candidates(self, cells: Dict[Tuple[int, int], np.ndarray], x: float, y: float) -> np.ndarray:
+        i, j = int(np.floor(x / self.cell_size)), int(np.floor(y / self.cell_size))
+        found = [cells[(i + di, j + dj)] for di in (-1, 0, 1) for dj in (-1, 0, 1) if (i + di, j + dj) in cells]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def hex_at(self, x: float, y: float) -> Hex:
+        "The board hex containing the pixel, None off the board"
+        cube = hex_round(pixel_to_hex(self.layout, np.array([[x, y]], dtype=np.float64)))[0]
+        coord = Hex(int(cube[0]), int(cube[1]), int(cube[2]))
+        return coord if coord in self.hexes else None
+
+    def hexes_at(self, points: np.ndarray) -> np.ndarray:
+        "(N, 3) cube coordinates of the hexes under many pixels, whether on the board or not"
+        return hex_round(pixel_to_hex(self.layout, np.asarray(points, dtype=np.float64)))
+
+    def vertex_at(self, x: float, y: float, max_distance: float=15) -> Point:
+        "The nearest vertex within max_distance pixels, None if there is none"
+        indexes = self.candidates(self.vertex_cells, x, y)
+        if not len(indexes):
+            return None
+        distances = np.hypot(*(self.vertex_pixels[indexes] - (x, y)).T)
+        nearest = np.argmin(distances)
+        return self.vertex_coords[indexes[nearest]] if distances[nearest] <= max_distance else None
+
+    def edge_at(self, x: float, y: float, max_distance: float=8) -> int:
+        "The edge whose road passes nearest the pixel within max_distance, None if there is none"
+        indexes = self.candidates(self.edge_cells, x, y)
+        if not len(indexes):
+            return None
+        starts, ends = self.edge_ends[indexes, 0], self.edge_ends[indexes, 1]
+        direction = ends - starts
+        point = np.array([x, y]) - starts
+        t = np.clip((point * direction).sum(axis=1) / (direction ** 2).sum(axis=1), 0, 1)
+        distances = np.hypot(*(point - t[:, np.newaxis] * direction).T)
+        nearest = np.argmin(distances)
+        return self.edge_ids[indexes[nearest]] if distances[nearest] <= max_distance else None
+
+    def hit(self, x: float, y: float) -> Tuple[str, object]:
+        "What a click at the pixel selects, vertices over edges over hexes, (None, None) for nothing"
+        vertex = self.vertex_at(x, y)
+        if vertex is not None:
+            return ("VERTEX", vertex)
+        edge = self.edge_at(x, y)
+        if edge is not None:
+            return ("EDGE", edge)
+        coord = self.hex_at(x, y)
+        if coord is not None:
+            return ("HEX", coord)
+        return (None, None)
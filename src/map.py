@@ -1,10 +1,11 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Set
 import time
 import random
 import math
 
 from hexlib import *
+from analytics import BoardAnalytics
 
 @dataclass
 class Hextile():
@@ -37,11 +38,20 @@ class Edge():
     owner_colour: str = None
     has_road: bool = False
 
+STANDARD_RADIUS = 2 # rings of land around the centre hex on a standard board
+STANDARD_LAND_HEXES = 19
+RED_NUMBERS = (6, 8)
+# pixel offsets of the flat layout's corners in units of (size / 2, size * sqrt(3) / 2), so every vertex has integer coordinates
+CORNER_LATTICE_OFFSETS = [(2, 0), (1, -1), (-1, -1), (-2, 0), (-1, 1), (1, 1)]
+
 class CatanMap():
     "By default initialises a random Catan map"
 
-    def __init__(self, mapDimensions: Tuple[int, int], randomMap: bool=True):
+    def __init__(self, mapDimensions: Tuple[int, int], randomMap: bool=True, radius: int=STANDARD_RADIUS):
+        if radius < 1:
+            raise ValueError("board radius must be at least 1")
         self.gamelog = False
+        self.radius: int = radius
 
         self.hexes: Dict[Hex, Hextile] = {}
         self.vertices: Dict[Point, Vertex] = {}
@@ -51,14 +61,17 @@ class CatanMap():
         self.values_dict: Dict[int, List[Hex]] = {}
 
         self.robber_coord: Hex = None
+        self.analytics: BoardAnalytics = None
 
         width, height = mapDimensions
-        hex_size = 50
+        # larger boards shrink their hexes to fit the window, the land and one ring of sea span 2 * radius + 3 hexes
+        hex_size = min(50, width / (3 * radius + 5), height / (math.sqrt(3) * (2 * radius + 3)))
         self.layout = Layout(layout_flat, Point(hex_size, hex_size), Point(width/2, height/2))
 
         if randomMap: 
             if self.gamelog: start = time.time()
             self.generate_random_map()
+            self.analytics = BoardAnalytics(self)
             if self.gamelog: print(f"## MAP GENERATION TIME ##: {time.time() - start}")
     
     def generate_random_map(self):
@@ -91,24 +104,22 @@ class CatanMap():
 
     def generate_land_hexes(self) -> Dict[Hex, Hextile]:
         land_hexes: Dict[Hex, Hextile] = {}
-        added_hexcoords: List[Hex] = []
 
         # adding the first hex at the origin
         new_hextile = Hextile()
         land_hexes[Hex(0, 0, 0)] = new_hextile
-        added_hexcoords.append(Hex(0, 0, 0))
 
-        # building the remaining hexes around the origin
-        for _ in range(2):
-            new_land_hexes = {}
-            for coord, hextile in land_hexes.items():
+        # building the remaining rings around the origin, only the last ring has new neighbors
+        ring: List[Hex] = [Hex(0, 0, 0)]
+        for _ in range(self.radius):
+            new_ring: List[Hex] = []
+            for coord in ring:
                 for direction in range(6):
                     neighbor: Hex = hex_neighbor(coord, direction)
-                    if neighbor not in added_hexcoords:
-                        added_hexcoords.append(neighbor)
-                        new_hextile = Hextile()
-                        new_land_hexes[neighbor] = new_hextile
-            land_hexes.update(new_land_hexes)
+                    if neighbor not in land_hexes:
+                        land_hexes[neighbor] = Hextile()
+                        new_ring.append(neighbor)
+            ring = new_ring
             
         # adding hex neighbors
         for coord, hextile in land_hexes.items():
@@ -119,7 +130,10 @@ class CatanMap():
         # initialising hex resources and values
         while not self.is_valid_land_hex_placement(land_hexes):
             self.values_dict.clear()
-            resource_list = self.get_random_resource_list()
+            resource_list = self.get_random_resource_list(len(land_hexes))
+            if len(land_hexes) != STANDARD_LAND_HEXES:
+                # the standard board keeps plain rejection sampling so seeded boards stay the same
+                resource_list = self.separate_red_numbers(land_hexes, resource_list)
 
             for coord, hextile in land_hexes.items():
                 resource, value = resource_list.pop()
@@ -142,9 +156,9 @@ class CatanMap():
         if len(self.values_dict) == 0:
             return False
         
-        six_coords = self.values_dict[6]
-        eight_coords = self.values_dict[8]
-        coords = six_coords + eight_coords
+        six_coords = self.values_dict.get(6, [])
+        eight_coords = self.values_dict.get(8, [])
+        coords = set(six_coords + eight_coords)
 
         for coord in coords:
             hextile: Hextile = land_hexes[coord]
@@ -153,8 +167,8 @@ class CatanMap():
                     return False
         return True
 
-    def get_random_resource_list(self) -> List[Tuple[str, int]]:
-        "Returns a random list of tuples (resource type, value)"
+    def get_random_resource_list(self, land_count: int=STANDARD_LAND_HEXES) -> List[Tuple[str, int]]:
+        "Returns a random list of tuples (resource type, value), the standard tiles repeated to fill larger boards"
 
         resource_tiles = [
             "ORE", "ORE", "ORE", 
@@ -168,14 +182,54 @@ class CatanMap():
             2, 3, 3, 4, 4, 5, 5, 6, 6, 8, 8, 9, 9, 10, 10, 11, 11, 12
             ]
         
+        deserts = max(1, round(land_count / STANDARD_LAND_HEXES))
+        producing = land_count - deserts
+        repeats, remainder = divmod(producing, len(resource_tiles))
+        if repeats != 1 or remainder:
+            resource_tiles = resource_tiles * repeats + random.sample(resource_tiles, remainder)
+            tiles_values = tiles_values * repeats + random.sample(tiles_values, remainder)
+
         # random.sample is significantly faster than random.shuffle
         shuffled_resource_tiles = random.sample(resource_tiles, len(resource_tiles))
         shuffled_tiles_values = random.sample(tiles_values, len(tiles_values))
 
         resource_list = list(zip(shuffled_resource_tiles, shuffled_tiles_values))
-        resource_list.insert(random.randint(0, len(resource_list)), ("DESERT", None))
+        for _ in range(deserts):
+            resource_list.insert(random.randint(0, len(resource_list)), ("DESERT", None))
 
         return resource_list
+
+    def separate_red_numbers(self, land_hexes: Dict[Hex, Hextile], resource_list: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """
+        Moves the 6s and 8s of a resource list onto hexes that don't touch, as
+        rejection sampling almost never succeeds on large boards. Hexes with
+        equal (q - r) % 3 never touch, so one random class is tried first and
+        the rest greedily, leftovers fail validation and are redrawn
+        """
+        coords: List[Hex] = list(land_hexes.keys())
+        index: Dict[Hex, int] = {coord: i for i, coord in enumerate(coords)}
+        # the list is popped from the end, so slot i goes to coords[i]
+        slots = list(reversed(resource_list))
+        producing = [i for i, (_, value) in enumerate(slots) if value is not None]
+        reds = [value for _, value in slots if value in RED_NUMBERS]
+        others = [value for _, value in slots if value is not None and value not in RED_NUMBERS]
+
+        spaced = random.randrange(3)
+        order = random.sample(producing, len(producing))
+        order.sort(key=lambda i: (coords[i].q - coords[i].r) % 3 != spaced)
+
+        red_slots: Set[int] = set()
+        for i in order:
+            if len(red_slots) == len(reds):
+                break
+            if not any(index.get(neighbor) in red_slots for neighbor in land_hexes[coords[i]].hex_neighbors):
+                red_slots.add(i)
+        others.extend(reds[len(red_slots):])
+        reds = reds[:len(red_slots)]
+
+        for i in producing:
+            slots[i] = (slots[i][0], reds.pop() if i in red_slots else others.pop())
+        return list(reversed(slots))
     
     def generate_sea_hexes(self, land_hexes: Dict[Hex, Hextile]) -> Dict[Hex, Hextile]:
         # building the sea hexes surrounding the current land hexgrid
@@ -184,7 +238,7 @@ class CatanMap():
         for coord, hextile in land_hexes.items():
             for direction in  range(6):
                 neighbor: Hex = hex_neighbor(coord, direction)
-                if all(neighbor != coord for coord in land_hexes):
+                if neighbor not in land_hexes and neighbor not in sea_hexes:
                     new_hextile = Hextile()
                     new_hextile.resource = "SEA"
                     sea_hexes[neighbor] = new_hextile
@@ -198,47 +252,51 @@ class CatanMap():
 
         return sea_hexes
     
+    def get_corner_lattice(self, coord: Hex) -> List[Tuple[int, int]]:
+        "Integer coordinates of a hex's corners, equal for every hex sharing the corner"
+        x, y = 3 * coord.q, 2 * coord.r + coord.q
+        return [(x + dx, y + dy) for dx, dy in CORNER_LATTICE_OFFSETS]
+
     def generate_vertices(self, land_hexes, sea_hexes) -> Dict[Point, Vertex]:
         new_vertices: Dict[Point, Vertex] = {}
+        # lattice coordinates : vertex pixel, so shared corners are matched exactly instead of by rounded floats
+        lattice_points: Dict[Tuple[int, int], Point] = {}
+        lattice_neighbors: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
 
         # adding all vertices
         for coord, hextile in land_hexes.items():
             corners = polygon_corners(self.layout, coord)
-            for vertex in corners:
+            lattice = self.get_corner_lattice(coord)
+            for i, (vertex, key) in enumerate(zip(corners, lattice)):
+                if key not in lattice_points:
+                    lattice_points[key] = vertex
+                    lattice_neighbors[key] = set()
+                    new_vertices[vertex] = Vertex()
+                vertex = lattice_points[key]
                 # adding landhex vertex neighbors
                 hextile.vertex_neighbors.append(vertex)
-                if vertex not in new_vertices:
-                    new_vertex = Vertex()
-                    new_vertices[vertex] = new_vertex
-        
-        # adding land hex neighbors
-        for coord, hextile in land_hexes.items():
-            corners = polygon_corners(self.layout, coord)
-            for vertex in corners:
+                # adding land hex neighbors
                 new_vertices[vertex].hex_neighbors.append(coord)
-        
+                # consecutive corners are joined by a side of the hex
+                lattice_neighbors[key].update((lattice[i - 1], lattice[(i + 1) % 6]))
+
         # adding seahex vertex neighbors
         for coord, hextile in sea_hexes.items():
-            corners = polygon_corners(self.layout, coord)
-            for vertex in corners:
-                if vertex in new_vertices:
-                    hextile.vertex_neighbors.append(vertex)
-        
-        # computing vertex neighbors
-        keys = list(new_vertices.keys())
-        radius = math.sqrt((keys[1].x - keys[0].x)**2 + (keys[1].y - keys[0].y)**2) * 1.01
-        for current_vertex in new_vertices:
-            for other_vertex in new_vertices:
-                if other_vertex != current_vertex:
-                    distance = math.sqrt((other_vertex.x - current_vertex.x)**2 + (other_vertex.y - current_vertex.y)**2)
-                    if distance <= radius:
-                        new_vertices[current_vertex].vertex_neighbors.append(other_vertex)
-        
+            for key in self.get_corner_lattice(coord):
+                if key in lattice_points:
+                    hextile.vertex_neighbors.append(lattice_points[key])
+
+        # computing vertex neighbors, in vertex order
+        order: Dict[Point, int] = {vertex: i for i, vertex in enumerate(new_vertices)}
+        for key, neighbors in lattice_neighbors.items():
+            new_vertices[lattice_points[key]].vertex_neighbors.extend(
+                sorted((lattice_points[neighbor] for neighbor in neighbors), key=order.__getitem__))
+
         return new_vertices
     
     def generate_edges(self, vertices) -> Dict[int, Edge]:
         new_edges: Dict[int, Edge] = {}
-        traversed_vertices: List[Point] = []
+        traversed_vertices: Set[Point] = set()
 
         id = 0
         for coord, vertex in vertices.items():
@@ -249,7 +307,7 @@ class CatanMap():
                     new_edge.vertex_neighbors.append(neighbor)
                     new_edges[id] = new_edge
                     id += 1
-            traversed_vertices.append(coord)
+            traversed_vertices.add(coord)
         
         for id, edge in new_edges.items():
             for neighbor in edge.vertex_neighbors:
@@ -258,10 +316,12 @@ class CatanMap():
         return new_edges
     
     def assign_ports(self, sea_hexes, vertices):
-        "Randomly assigns 9 sea hexes as ports"
+        "Randomly assigns every other sea hex as a port, 9 on a standard board"
+        port_count = len(sea_hexes) // 2
         port_types = [
             "ORE", "WHEAT", "WOOD", "BRICK", "SHEEP", "3:1", "3:1", "3:1", "3:1" 
             ]
+        port_types = (port_types * (port_count // len(port_types) + 1))[:port_count]
         port_types = random.sample(port_types, len(port_types))
         sea_hexesList = list(sea_hexes.keys())
         coord = random.choice(sea_hexesList)
@@ -269,16 +329,18 @@ class CatanMap():
         sea_hexes[coord].port_type = port_types.pop()
         self.make_two_vertices_ports(sea_hexes[coord], vertices)
         ports = 1
-        traversed_sea_tiles = [coord]
-        while ports < 9:
+        traversed_sea_tiles: Set[Hex] = {coord}
+        steps = 1
+        while ports < port_count:
             for neighbor in sea_hexes[coord].hex_neighbors:
                 if neighbor in sea_hexes and neighbor not in traversed_sea_tiles:
-                    if len(traversed_sea_tiles) % 2 == 0:
+                    if steps % 2 == 0:
                         sea_hexes[neighbor].has_port = True
                         sea_hexes[neighbor].port_type = port_types.pop()
                         self.make_two_vertices_ports(sea_hexes[neighbor], vertices)
                         ports += 1
-                    traversed_sea_tiles.append(coord)
+                    traversed_sea_tiles.add(coord)
+                    steps += 1
                     coord = neighbor
                     break
     
@@ -0,0 +1,154 @@
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from actions import COLOURS, RESOURCES
+from analytics import PORT_TYPES
+
+HEX_TYPES = RESOURCES + ["DESERT"] # sea hexes are all zeros
+NUMBERS = [2, 3, 4, 5, 6, 8, 9, 10, 11, 12]
+DEVCARDS = ["KNIGHT", "YEAR_OF_PLENTY", "ROAD_BUILDING", "MONOPOLY", "VICTORY_POINT"]
+PLAYER_STATS = [
+    "VICTORY_POINTS", "KNIGHTS_PLAYED", "LONGEST_ROAD_LENGTH", "HAS_LONGEST_ROAD", "HAS_LARGEST_ARMY",
+    "ROADS_LEFT", "SETTLEMENTS_LEFT", "CITIES_LEFT",
+]
+TURN_INFO = ["TURN", "SETUP_PHASE", "ROBBER_ACTIVE", "DEVCARD_PLAYED", "CURRENT_TRADES", "TRADING"]
+
+class ObservationEncoder():
+    """
+    Encodes games on one board topology into fixed shape float32 planes laid
+    out in a single flat vector, so many games fit one preallocated array
+    """
+    def __init__(self, board, colours: List[str]=COLOURS):
+        self.colours = colours
+        self.hex_coords = list(board.hexes.keys())
+        self.hex_index = {coord: i for i, coord in enumerate(self.hex_coords)}
+        self.vertex_index = {coord: i for i, coord in enumerate(board.vertices.keys())}
+        self.colour_index = {colour: i for i, colour in enumerate(colours)}
+        hexes, vertices, edges, players = len(self.hex_coords), len(board.vertices), len(board.edges), len(colours)
+
+        self.shapes: Dict[str, Tuple[int, ...]] = {
+            "hex_resource": (hexes, len(HEX_TYPES)),
+            "hex_number": (hexes, len(NUMBERS)),
+            "robber": (hexes,),
+            "vertex_port": (vertices, len(PORT_TYPES)),
+            "vertex_owner": (vertices, players),
+            "vertex_city": (vertices,),
+            "edge_road": (edges, players),
+            "hands": (players, len(RESOURCES)),
+            "dev_cards": (players, len(DEVCARDS)),
+            "player_stats": (players, len(PLAYER_STATS)),
+            "bank": (len(RESOURCES),),
+            "bank_dev_cards": (len(DEVCARDS),),
+            "current_player": (players,),
+            "turn_info": (len(TURN_INFO),),
+        }
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self.size: int = 0
+        for name, shape in self.shapes.items():
+            length = int(np.prod(shape))
+            self.offsets[name] = (self.size, self.size + length)
+            self.size += length
+
+    def planes(self, flat: np.ndarray) -> Dict[str, np.ndarray]:
+        "Named views of the planes inside a flat observation"
+        return {name: flat[start:end].reshape(self.shapes[name]) for name, (start, end) in self.offsets.items()}
+
+    def encode(self, game, out: np.ndarray=None) -> np.ndarray:
+        "Full encoding of a game, written into out if given"
+        if out is None:
+            out = np.zeros(self.size, dtype=np.float32)
+        else:
+            out[:] = 0
+        planes = self.planes(out)
+        self.encode_board(game, planes)
+        for colour, player in game.players.items():
+            self.encode_buildings(game, planes, colour, player.owned_vertices, player.owned_edges)
+        planes["robber"][self.hex_index[game.board.robber_coord]] = 1
+        self.encode_state(game, planes)
+        return out
+
+    def encode_batch(self, games: List, out: np.ndarray=None) -> np.ndarray:
+        "Encodes many games into the rows of one (games, size) array"
+        if out is None:
+            out = np.zeros((len(games), self.size), dtype=np.float32)
+        for row, game in zip(out, games):
+            self.encode(game, out=row)
+        return out
+
+    def encode_board(self, game, planes: Dict[str, np.ndarray]):
+        "Hexes, numbers and ports, fixed for the whole game"
+        for coord, hextile in game.board.hexes.items():
+            index = self.hex_index[coord]
+            if hextile.resource in HEX_TYPES:
+                planes["hex_resource"][index, HEX_TYPES.index(hextile.resource)] = 1
+            if hextile.value:
+                planes["hex_number"][index, NUMBERS.index(hextile.value)] = 1
+        # analytics shares the board's vertex order
+        planes["vertex_port"][:] = game.board.analytics.ports
+
+    def encode_buildings(self, game, planes: Dict[str, np.ndarray], colour: str, vertices: List, edges: List[int]):
+        "Marks the given vertices and edges as owned by the colour"
+        player = self.colour_index[colour]
+        for coord in vertices:
+            index = self.vertex_index[coord]
+            planes["vertex_owner"][index, player] = 1
+            planes["vertex_city"][index] = game.board.vertices[coord].building == "CITY"
+        for edge_id in edges:
+            planes["edge_road"][edge_id, player] = 1
+
+    def encode_state(self, game, planes: Dict[str, np.ndarray]):
+        "Hands, bank, player standings and turn, small enough to rewrite every time"
+        for colour, player in game.players.items():
+            index = self.colour_index[colour]
+            planes["hands"][index] = list(player.resources.values())
+            planes["dev_cards"][index] = list(player.development_cards.values())
+            planes["player_stats"][index] = [
+                player.victory_points, player.knights_played, player.longest_road_length,
+                game.longest_road_colour == colour, game.largest_army_colour == colour,
+                player.roads_left, player.settlements_left, player.cities_left,
+            ]
+        planes["bank"][:] = list(game.bank_resources.values())
+        planes["bank_dev_cards"][:] = list(game.bank_devcards.values())
+        planes["current_player"][:] = 0
+        planes["current_player"][self.colour_index[game.player_order[game.current_player]]] = 1
+        planes["turn_info"][:] = [
+            game.turn, game.starting_settlement_phase, game.robber_active,
+            bool(game.devcard_played), game.current_trades, game.trading,
+        ]
+
+class IncrementalObservation():
+    """
+    Observation of one game kept current by re-encoding only what step()
+    touched, buildings and roads are read off the append only ownership lists
+    """
+    def __init__(self, encoder: ObservationEncoder, game, out: np.ndarray=None):
+        self.encoder = encoder
+        self.game = game
+        self.flat = encoder.encode(game, out=out)
+        self.planes = encoder.planes(self.flat)
+        self.robber_coord = game.board.robber_coord
+        # colour : (vertices encoded, edges encoded, cities left)
+        self.seen: Dict[str, Tuple[int, int, int]] = {
+            colour: (len(player.owned_vertices), len(player.owned_edges), player.cities_left)
+            for colour, player in game.players.items()
+        }
+
+    def update(self) -> np.ndarray:
+        game = self.game
+        for colour, player in game.players.items():
+            vertices_seen, edges_seen, cities_left = self.seen[colour]
+            new_vertices = player.owned_vertices[vertices_seen:]
+            if player.cities_left != cities_left:
+                # a settlement was upgraded, recheck this player's buildings
+                new_vertices = player.owned_vertices
+            self.encoder.encode_buildings(game, self.planes, colour, new_vertices, player.owned_edges[edges_seen:])
+            self.seen[colour] = (len(player.owned_vertices), len(player.owned_edges), player.cities_left)
+
+        if game.board.robber_coord != self.robber_coord:
+            self.planes["robber"][self.encoder.hex_index[self.robber_coord]] = 0
+            self.planes["robber"][self.encoder.hex_index[game.board.robber_coord]] = 1
+            self.robber_coord = game.board.robber_coord
+
+        self.encoder.encode_state(game, self.planes)
+        return self.flat
@@ -3,6 +3,7 @@ from typing import List
 from collections import namedtuple
 
 from hexlib import Point
+from policy import WeightedPolicy, DEFAULT_POLICY, WEIGHTS_BY_ACTION_TYPE
 
 Action = namedtuple("Action", ["type", "value"])
 
@@ -41,11 +42,6 @@ class RandomPlayer(Player):
     def choose_action(self, possible_actions: List[Action]) -> Action:
         return random.choice(possible_actions)
 
-WEIGHTS_BY_ACTION_TYPE = {
-    "BUILD_CITY": 10000,
-    "BUILD_SETTLEMENT": 1000,
-    "BUY_DEVCARD": 100,
-}
 class WeightedRandomPlayer(Player):
     """
     Player that decides at random, but skews distribution
@@ -53,9 +49,9 @@ class WeightedRandomPlayer(Player):
     """
     type = "WeightedRandomPlayer"
 
+    def __init__(self, Colour: str, Policy: WeightedPolicy=DEFAULT_POLICY):
+        super().__init__(Colour)
+        self.policy: WeightedPolicy = Policy
+
     def choose_action(self, possible_actions: List[Action]) -> Action:
-        bloated_actions = []
-        for action in possible_actions:
-            weight = WEIGHTS_BY_ACTION_TYPE.get(action.type, 1)
-            bloated_actions.extend([action] * weight)
-        return random.choice(bloated_actions)
\ No newline at end of file
+        return self.policy.choose(possible_actions)
@@ -0,0 +1,112 @@
+import random
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List, Dict, Tuple, Callable, Sequence
+
+WEIGHTS_BY_ACTION_TYPE = {
+    "BUILD_CITY": 10000,
+    "BUILD_SETTLEMENT": 1000,
+    "BUY_DEVCARD": 100,
+}
+
+class AliasTable():
+    """
+    Walker's alias method, O(n) to build and O(1) per draw, for sampling many
+    times from one fixed distribution
+    """
+    def __init__(self, weights: Sequence[float]):
+        count = len(weights)
+        total = sum(weights)
+        if count == 0 or total <= 0:
+            raise ValueError("alias table needs at least one positive weight")
+        self.count = count
+        # each column holds its own outcome with probability[i] and alias[i] otherwise
+        self.probability: List[float] = [1.0] * count
+        self.alias: List[int] = list(range(count))
+
+        scaled = [weight * count / total for weight in weights]
+        small = [i for i, weight in enumerate(scaled) if weight < 1]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # whatever is left is 1 up to rounding error
+
+    def sample(self) -> int:
+        column = random.randrange(self.count)
+        return column if random.random() < self.probability[column] else self.alias[column]
+
+class WeightedPolicy():
+    """
+    Samples Actions in proportion to a weight looked up by (type, value), then
+    by type, then the default, and scaled by an optional weight function such
+    as pip_settlement_weights. Draws walk the cumulative weights once, so no
+    list of copies is built per decision
+    """
+    def __init__(
+            self, weights: Dict[str, float]=WEIGHTS_BY_ACTION_TYPE, value_weights: Dict[Tuple[str, object], float]=None,
+            weight_function: Callable[[Tuple], float]=None, default: float=1):
+        self.weights = weights
+        self.value_weights = value_weights or {}
+        self.weight_function = weight_function
+        self.default = default
+
+    def weight(self, action: Tuple) -> float:
+        weight = self.value_weights.get(action)
+        if weight is None:
+            weight = self.weights.get(action.type, self.default)
+        if self.weight_function is not None:
+            weight *= self.weight_function(action)
+        return weight
+
+    def get_weights(self, possible_actions: List[Tuple]) -> List[float]:
+        if not self.value_weights and self.weight_function is None:
+            # plain lookups by type, the common case in rollouts
+            get, default = self.weights.get, self.default
+            return [get(action.type, default) for action in possible_actions]
+        return [self.weight(action) for action in possible_actions]
+
+    def choose(self, possible_actions: List[Tuple]) -> Tuple:
+        "One action drawn in proportion to its weight"
+        cumulative = list(accumulate(self.get_weights(possible_actions)))
+        total = cumulative[-1]
+        if total <= 0:
+            return random.choice(possible_actions)
+        if isinstance(total, int):
+            # same draw as picking from a list with weight copies of each action
+            return possible_actions[bisect_right(cumulative, random.randrange(total))]
+        return possible_actions[min(bisect_right(cumulative, random.random() * total), len(cumulative) - 1)]
+
+    def alias_table(self, possible_actions: List[Tuple]) -> AliasTable:
+        "Alias table of the actions, for drawing repeatedly from the same list"
+        return AliasTable(self.get_weights(possible_actions))
+
+    def choose_many(self, possible_actions: List[Tuple], k: int) -> List[Tuple]:
+        "k independent draws in O(n + k)"
+        table = self.alias_table(possible_actions)
+        return [possible_actions[table.sample()] for _ in range(k)]
+
+    def __deepcopy__(self, memo):
+        # the weights never change, search copies of players share them
+        return self
+
+def pip_settlement_weights(board, scale: float=1) -> Callable[[Tuple], float]:
+    """
+    Weight function making settlements on better producing vertices more
+    likely, in proportion to the pips around the vertex
+    """
+    pips = board.analytics.pips
+    mean = max(pips.mean(), 1)
+    multipliers = {
+        coord: scale * int(pips[index]) / mean for coord, index in board.analytics.vertex_index.items()}
+
+    def weight_function(action: Tuple) -> float:
+        if action.type == "BUILD_SETTLEMENT":
+            return multipliers.get(action.value, 1)
+        return 1
+    return weight_function
+
+DEFAULT_POLICY = WeightedPolicy()
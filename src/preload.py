@@ -0,0 +1,15 @@
+"""
+Imported once by the forkserver simulator workers are forked from, so every
+worker starts with the engine imported and its caches warm
+"""
+from game import Game
+from player import RandomPlayer
+
+WINDOW_SIZE = (750, 910)
+
+def warm_up():
+    "Builds a game, filling the board generation and hashing caches"
+    players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+    Game(WINDOW_SIZE, players, gamelog=False, debug=False, savegame=False, seed=0)
+
+warm_up()
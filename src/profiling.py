@@ -0,0 +1,135 @@
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+SAMPLE_INTERVAL = 0.005 # seconds between stack samples
+MCTS_FRAME = "mcts.MCTSPlayer.choose_action" # samples under this frame are search time
+TOP_FUNCTIONS = 25
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+class StackSampler():
+    "Counts the collapsed stacks of one thread below a root frame, sampled from a background thread"
+    def __init__(self, interval: float=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.thread_id: int = None
+        self.outside = None # frame above the root, where stacks are cut
+        self.stopped = threading.Event()
+        self.thread: threading.Thread = None
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[str] = []
+            while frame is not None and frame is not self.outside:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self, root):
+        self.thread_id = threading.get_ident()
+        self.outside = root.f_back
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+class Profiler():
+    """
+    cProfile and a stack sampler around one piece of work in a worker. The
+    results are plain dicts, so they pickle back to the parent to be merged
+    """
+    def __init__(self, interval: float=SAMPLE_INTERVAL):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.start_time: float = None
+        self.wall_time: float = 0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        # stacks start at the caller, frames above it were inherited from the parent of a forked worker
+        self.sampler.start(sys._getframe(1))
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.sampler.stop()
+        self.wall_time = time.perf_counter() - self.start_time
+
+    def results(self) -> Tuple[Dict, Counter, float]:
+        self.profile.create_stats()
+        return self.profile.stats, self.sampler.stacks, self.wall_time
+
+class StatsSource():
+    "Lets pstats.Stats load a stats dict that came back from another process"
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+class ProfileReport():
+    """
+    Merges the profiles of every worker into one pstats file, one collapsed
+    stack file for flame graph tools and a summary splitting sampled time
+    between MCTS decisions and the rest of the engine
+    """
+    def __init__(self):
+        self.stats: pstats.Stats = None
+        self.stacks: Counter = Counter()
+        self.wall_time: float = 0
+        self.profiles: int = 0
+
+    def add(self, results: Tuple[Dict, Counter, float]):
+        stats, stacks, wall_time = results
+        if self.stats is None:
+            self.stats = pstats.Stats(StatsSource(stats), stream=io.StringIO())
+        else:
+            self.stats.add(StatsSource(stats))
+        self.stacks.update(stacks)
+        self.wall_time += wall_time
+        self.profiles += 1
+
+    def mcts_breakdown(self) -> Tuple[int, int]:
+        "Samples inside MCTS decisions and samples in total"
+        total = sum(self.stacks.values())
+        search = sum(count for stack, count in self.stacks.items() if MCTS_FRAME in stack.split(";"))
+        return search, total
+
+    def summary(self) -> str:
+        search, total = self.mcts_breakdown()
+        stream = io.StringIO()
+        stream.write(f"Profiled {self.profiles} games, {self.wall_time:.2f} seconds across workers, {total} stack samples\n")
+        if total:
+            stream.write(
+                f"MCTS decisions: {search / total:.1%} of samples, engine ticks and everything else: {(total - search) / total:.1%}\n\n")
+        if self.stats is not None:
+            self.stats.stream = stream
+            self.stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        return stream.getvalue()
+
+    def write(self, directory: str) -> str:
+        "Writes simulator.pstats, simulator.collapsed and summary.txt, returning the summary"
+        os.makedirs(directory, exist_ok=True)
+        if self.stats is not None:
+            self.stats.dump_stats(os.path.join(directory, "simulator.pstats"))
+        with open(os.path.join(directory, "simulator.collapsed"), "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        summary = self.summary()
+        with open(os.path.join(directory, "summary.txt"), "w") as file:
+            file.write(summary)
+        return summary
@@ -1,28 +1,34 @@
 import pygame
-from typing import Tuple
+from typing import Tuple, Dict, List
 import os
 
 from hexlib import *
+from hexarray import HitTester
 from game import Game
 
 class Renderer():
     """
-    Renders the state of the game to the screen
+    Renders the state of the game to the screen, the board is drawn once into
+    a cached surface and only the regions whose pieces changed are redrawn
     """
-    def __init__(self, windowSize: Tuple[int, int], game: Game):
-        pygame.display.set_caption("Settlers of Catan Engine")
-
+    def __init__(self, windowSize: Tuple[int, int], game: Game, headless: bool=False):
         self.WINDOW_SIZE = windowSize
-        os.environ['SDL_VIDEO_WINDOW_POS'] = "%d, %d" %(760, 50)
-        self.window = pygame.display.set_mode(self.WINDOW_SIZE)
+        # headless renderers draw to an offscreen surface that is saved instead of shown
+        self.headless = headless
+        if headless:
+            self.window = pygame.Surface(self.WINDOW_SIZE)
+        else:
+            pygame.display.set_caption("Settlers of Catan Engine")
+            os.environ['SDL_VIDEO_WINDOW_POS'] = "%d, %d" %(760, 50)
+            self.window = pygame.display.set_mode(self.WINDOW_SIZE)
         self.display_game = game
 
         self.RESOURCE_COLOUR_DICT = {
-            "ORE":(160,160,160), 
-            "WHEAT":(255,255,0), 
-            "WOOD":(0,102,0), 
-            "BRICK":(153,0,0), 
-            "SHEEP":(204,255,153), 
+            "ORE":(160,160,160),
+            "WHEAT":(255,255,0),
+            "WOOD":(0,102,0),
+            "BRICK":(153,0,0),
+            "SHEEP":(204,255,153),
             "DESERT":(255,229,204),
             "SEA":(153,204,255),
             "3:1":(0,0,0)
@@ -34,114 +40,163 @@ class Renderer():
             "ORANGE":(255,128,0),
             "BLUE":(0,0,255)
         }
-        
+
         self.PIP_NUMBER_DICT = {2:1, 3:2, 4:3, 5:4, 6:5, 8:5, 9:4, 10:3, 11:2, 12:1}
-        
-        self.font = pygame.font.SysFont(None, 40)
+
+        # fonts are slow to create, so each size is made once
+        self.fonts: Dict[int, pygame.font.Font] = {size: pygame.font.SysFont(None, size) for size in (15, 30, 40)}
+        self.font = self.fonts[40]
+        # (size, text, colour) : rendered text
+        self.glyphs: Dict[Tuple[int, str, Tuple[int, int, int]], pygame.Surface] = {}
+
+        # static layer, rebuilt only when a different board is shown
+        self.board_key: Tuple = None
+        self.board_surface: pygame.Surface = None
+        # pieces are drawn here unclipped, clipping changes how thick lines rasterise
+        self.scratch = pygame.Surface(self.WINDOW_SIZE)
+        self.hex_centres: Dict[Hex, Point] = {}
+        self.hit_tester: HitTester = None
+        # dynamic pieces on screen last frame, key : bounding rect
+        self.drawn: Dict[Tuple, pygame.Rect] = {}
+
+    def get_glyph(self, size: int, text: str, colour: Tuple[int, int, int]) -> pygame.Surface:
+        key = (size, text, colour)
+        if key not in self.glyphs:
+            self.glyphs[key] = self.fonts[size].render(text, True, colour)
+        return self.glyphs[key]
+
+    def blit_centred(self, surface: pygame.Surface, glyph: pygame.Surface, centre: Tuple[float, float]):
+        text_rect = glyph.get_rect()
+        text_rect.center = centre
+        surface.blit(glyph, text_rect)
+
+    def circle_rect(self, centre: Point, radius: int) -> pygame.Rect:
+        "Bounding rect of a circle with a pixel of margin for rounding"
+        return pygame.Rect(int(centre.x) - radius - 2, int(centre.y) - radius - 2, 2 * radius + 5, 2 * radius + 5)
 
     def display(self):
-        "Displays the state of the board"
+        "Displays the state of the board, redrawing only what changed since the last call"
         self.board = self.display_game.board
+        board_key = tuple((hextile.resource, hextile.value, hextile.port_type) for hextile in self.board.hexes.values())
+        pieces = self.get_pieces()
+
+        if board_key != self.board_key:
+            self.board_key = board_key
+            self.board_surface = self.render_board()
+            self.hit_tester = HitTester(self.board)
+            self.scratch.blit(self.board_surface, (0, 0))
+            for key in pieces:
+                self.draw_piece(key)
+            self.window.blit(self.scratch, (0, 0))
+            self.drawn = pieces
+            if not self.headless:
+                pygame.display.update()
+            return
+
+        changed = pieces.keys() ^ self.drawn.keys()
+        dirty: List[pygame.Rect] = [pieces[key] if key in pieces else self.drawn[key] for key in changed]
+        for rect in dirty:
+            # restore the board under the region, redraw the pieces over it in layer order and copy it across
+            self.scratch.blit(self.board_surface, rect, rect)
+            for key, piece_rect in pieces.items():
+                if piece_rect.colliderect(rect):
+                    self.draw_piece(key)
+            self.window.blit(self.scratch, rect, rect)
+        self.drawn = pieces
+        if not self.headless:
+            pygame.display.update(dirty)
+
+    def hit_test(self, position: Tuple[int, int]) -> Tuple[str, object]:
+        "The (VERTEX, coord), (EDGE, edge id) or (HEX, coord) under a screen position, for click to play"
+        return self.hit_tester.hit(*position)
+
+    def render_board(self) -> pygame.Surface:
+        "Draws the sea, hexes, numbers, pips and ports, which are fixed for a board"
+        surface = pygame.Surface(self.WINDOW_SIZE)
         # background colour
-        self.window.fill((102, 178, 255))
+        surface.fill((102, 178, 255))
+        self.hex_centres.clear()
         # drawing hexes
         for coord, hextile in self.board.hexes.items():
             corners = polygon_corners(self.board.layout, coord)
             center = hex_to_pixel(self.board.layout, coord)
-            hextile_colour = self.RESOURCE_COLOUR_DICT[hextile.resource]
-            r = hextile_colour[0]
-            g = hextile_colour[1]
-            b = hextile_colour[2]
+            self.hex_centres[coord] = center
             # actual hexagon
-            pygame.draw.polygon(self.window, (r, g, b), corners, width=0)
+            pygame.draw.polygon(surface, self.RESOURCE_COLOUR_DICT[hextile.resource], corners, width=0)
             # number inside hexagon
             if hextile.resource != "DESERT" and hextile.resource != "SEA":
                 if hextile.value == 6 or hextile.value == 8:
                     colour = (255, 0, 0)
                 else:
                     colour = (0, 0, 0)
-                text_surface = self.font.render(str(hextile.value), True, colour)
-                text_rect = text_surface.get_rect()
-                text_rect.center = (center.x, center.y)
-                self.window.blit(text_surface, text_rect)
-
-                hextilePips = self.font.render(str(self.PIP_NUMBER_DICT[hextile.value] * "."), True, (0, 0, 0))
-                text_rect = hextilePips.get_rect()
-                text_rect.center = (center.x + 1, center.y + 8)
-                self.window.blit(hextilePips, text_rect)
-
-            if hextile.has_robber:
-                pygame.draw.circle(self.window, (70, 70, 70), center, 20)
-                text_surface = self.font.render(str("R"), True, (255, 255, 255))
-                text_rect = text_surface.get_rect()
-                text_rect.center = (center.x, center.y)
-                self.window.blit(text_surface, text_rect)
-
-        self.drawPorts()
-        self.drawPlayerRoads()
-        self.drawPlayerBuildings()
-        self.draw_turn()
-        self.drawPossibleSettles()
-        # self.drawVertexPoints()
-
-        pygame.display.update()     
-    
-    def drawVertexPoints(self):
+                self.blit_centred(surface, self.get_glyph(40, str(hextile.value), colour), (center.x, center.y))
+                pips = self.get_glyph(40, str(self.PIP_NUMBER_DICT[hextile.value] * "."), (0, 0, 0))
+                self.blit_centred(surface, pips, (center.x + 1, center.y + 8))
+
+        self.drawPorts(surface)
+        # self.drawVertexPoints(surface)
+        return surface
+
+    def get_pieces(self) -> Dict[Tuple, pygame.Rect]:
+        "Everything drawn over the board this frame, in layer order, with its bounding rect"
+        pieces: Dict[Tuple, pygame.Rect] = {}
+        robber = self.board.robber_coord
+        if robber is not None:
+            center = self.hex_centres.get(robber) or hex_to_pixel(self.board.layout, robber)
+            pieces[("ROBBER", center)] = self.circle_rect(center, 20)
+
+        for edge_id, edge in self.board.edges.items():
+            if edge.has_road:
+                start, end = edge.vertex_neighbors
+                pieces[("ROAD", edge_id, edge.owner_colour)] = pygame.Rect(
+                    int(min(start.x, end.x)) - 6, int(min(start.y, end.y)) - 6,
+                    int(abs(start.x - end.x)) + 13, int(abs(start.y - end.y)) + 13)
+
+        for coord, vertex in self.board.vertices.items():
+            if vertex.building:
+                pieces[("BUILDING", coord, vertex.owner_colour, vertex.building)] = self.circle_rect(coord, 13)
+
+        turn = self.get_glyph(30, f"TURN[{self.display_game.turn}]", (255, 255, 255))
+        pieces[("TURN", self.display_game.turn)] = turn.get_rect(topleft=(5, 5))
+
+        for colour in self.display_game.player_order:
+            for action in self.display_game.get_possible_settlements(colour):
+                coord = action.value
+                pieces[("POSSIBLE", coord, colour)] = self.circle_rect(coord, 10)
+        return pieces
+
+    def draw_piece(self, key: Tuple):
+        piece = key[0]
+        if piece == "ROBBER":
+            center = key[1]
+            pygame.draw.circle(self.scratch, (70, 70, 70), center, 20)
+            self.blit_centred(self.scratch, self.get_glyph(40, "R", (255, 255, 255)), (center.x, center.y))
+        elif piece == "ROAD":
+            start, end = self.board.edges[key[1]].vertex_neighbors
+            pygame.draw.line(self.scratch, self.PLAYER_COLOUR_DICT[key[2]], start, end, 8)
+        elif piece == "BUILDING":
+            coord, colour, building = key[1], key[2], key[3]
+            pygame.draw.circle(self.scratch, self.PLAYER_COLOUR_DICT[colour], coord, 13)
+            if building == "CITY":
+                pygame.draw.circle(self.scratch, (0, 0, 0), coord, 8)
+        elif piece == "TURN":
+            self.scratch.blit(self.get_glyph(30, f"TURN[{key[1]}]", (255, 255, 255)), (5, 5))
+        elif piece == "POSSIBLE":
+            coord, colour = key[1], key[2]
+            pygame.draw.circle(self.scratch, (150, 255, 255), coord, 10)
+            pygame.draw.circle(self.scratch, self.PLAYER_COLOUR_DICT[colour], coord, 6)
+
+    def drawVertexPoints(self, surface: pygame.Surface):
         for coord, vertex in self.board.vertices.items():
-            font = pygame.font.SysFont(None, 15)
-            text_surface = font.render(f"{round(coord.x)}, {round(coord.y)}", True, (0, 0, 0))
-            self.window.blit(text_surface, (coord.x-10, coord.y))
-    
-    def drawPorts(self):
-        "Draws ports to the screen"
+            text_surface = self.get_glyph(15, f"{round(coord.x)}, {round(coord.y)}", (0, 0, 0))
+            surface.blit(text_surface, (coord.x-10, coord.y))
+
+    def drawPorts(self, surface: pygame.Surface):
+        "Draws ports to the board surface"
         for coord, hextile in self.board.hexes.items():
-            center = hex_to_pixel(self.board.layout, coord)
+            center = self.hex_centres[coord]
             if hextile.port_type:
-                Colour = self.RESOURCE_COLOUR_DICT[hextile.port_type]
-                r = Colour[0]
-                g = Colour[1]
-                b = Colour[2]
                 for vertex in hextile.vertex_neighbors:
                     if self.board.vertices[vertex].port_type:
-                        pygame.draw.line(self.window, (102, 51, 0), center, vertex, 5)
-                pygame.draw.circle(self.window, (r, g, b), center, 10)
-    
-    def drawPlayerRoads(self):
-        "Draws player road to the screen"
-        for edge in self.board.edges.values():
-            if edge.has_road:
-                Colour = self.PLAYER_COLOUR_DICT[edge.owner_colour]
-                r = Colour[0]
-                g = Colour[1]
-                b = Colour[2]
-                pygame.draw.line(self.window, (r, g, b), edge.vertex_neighbors[0], edge.vertex_neighbors[1], 8)
-    
-    def drawPlayerBuildings(self):
-        "Draws player buildings to the screen"
-        for coord, vertex in self.board.vertices.items():
-            if vertex.building == "SETTLEMENT":
-                Colour = self.PLAYER_COLOUR_DICT[vertex.owner_colour]
-                r, g, b = Colour[0], Colour[1], Colour[2]
-                pygame.draw.circle(self.window, (r, g, b), coord, 13)
-            elif vertex.building == "CITY":
-                Colour = self.PLAYER_COLOUR_DICT[vertex.owner_colour]
-                r, g, b = Colour[0], Colour[1], Colour[2]
-                pygame.draw.circle(self.window, (r, g, b), coord, 13)
-                pygame.draw.circle(self.window, (0, 0, 0), coord, 8)
-    
-    def drawPossibleSettles(self):
-        for colour in self.display_game.player_order:
-            actions = self.display_game.get_possible_settlements(colour)
-            Colour = self.PLAYER_COLOUR_DICT[colour]
-            for action in actions:
-                coord = action.value
-                pygame.draw.circle(self.window, (150, 255, 255), coord, 10)
-                pygame.draw.circle(self.window, Colour, coord, 6)
-
-    
-    def draw_turn(self):
-        "Draws player score to the screen"
-        font = pygame.font.SysFont(None, 30)
-        position = [5, 5]
-        text_surface = font.render(f"TURN[{self.display_game.turn}]", True, (255, 255, 255))
-        self.window.blit(text_surface, position)
\ No newline at end of file
+                        pygame.draw.line(surface, (102, 51, 0), center, vertex, 5)
+                pygame.draw.circle(surface, self.RESOURCE_COLOUR_DICT[hextile.port_type], center, 10)
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import zlib
+import pickle
+import struct
+import threading
+from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import numpy as np
+
+from game import Game
+from player import Player, Action
+from actions import ActionSpace
+from map import STANDARD_RADIUS
+
+REPLAY_DIRECTORY = "saves"
+REPLAY_FORMAT = "socai-replay"
+REPLAY_VERSION = 1
+HEADER_LENGTH = struct.Struct("<I")
+ENTRY = struct.Struct("<H")
+KEYFRAME_FORMAT = "socai-keyframes"
+KEYFRAME_INTERVAL = 10 # turns between keyframes
+
+def get_board_layout(game: Game) -> Dict[str, List]:
+    "Resources, numbers and ports of the board, used to check a replay regenerates the same one"
+    return {
+        "hexes": [[hextile.resource, hextile.value] for hextile in game.board.hexes.values()],
+        "ports": [vertex.port_type for vertex in game.board.vertices.values()],
+    }
+
+def get_replay_path(seed: int) -> str:
+    return os.path.join(REPLAY_DIRECTORY, f"{time.strftime('%Y%m%d_%H%M%S')}_{seed:08x}.replay")
+
+class ReplayWriter():
+    """
+    Records a game as a JSON header (seed, settings, players and board) followed
+    by one uint16 per decision as it's made, the action id of each tick then the
+    option index of any decision taken within that tick's step
+    """
+    def __init__(self, game: Game, filepath: str):
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        self.filepath = filepath
+        self.action_space = ActionSpace(game.board)
+
+        header = json.dumps({
+            "format": REPLAY_FORMAT,
+            "version": REPLAY_VERSION,
+            "seed": game.seed,
+            "window_size": list(game.window_size),
+            "hierarchical_trades": game.hierarchical_trades,
+            "turn_limit": game.turn_limit,
+            "board_radius": game.board_radius,
+            "players": [[colour, player.type] for colour, player in game.players.items()],
+            "player_order": game.player_order,
+            "board": get_board_layout(game),
+        }).encode()
+        self.file = open(filepath, "wb")
+        self.file.write(HEADER_LENGTH.pack(len(header)) + header)
+
+    def record_action(self, action: Action):
+        self.file.write(ENTRY.pack(self.action_space.encode(action)))
+
+    def record_choice(self, index: int):
+        self.file.write(ENTRY.pack(index))
+
+    def close(self):
+        self.file.close()
+
+    def __deepcopy__(self, memo):
+        # search copies of the game play hypothetical moves, they must not record
+        return None
+
+class ReplayCursor():
+    "Position in a replay's decisions, shared by the game being rebuilt and its players"
+    def __init__(self, entries: np.ndarray):
+        self.entries = entries
+        self.position: int = 0
+
+    def next(self) -> int:
+        entry = int(self.entries[self.position])
+        self.position += 1
+        return entry
+
+    def done(self) -> bool:
+        return self.position >= len(self.entries)
+
+    def __getstate__(self):
+        # keyframes store the position only, the replay reattaches its entries
+        return {"position": self.position}
+
+    def __setstate__(self, state):
+        self.entries = None
+        self.position = state["position"]
+
+class ReplayPlayer(Player):
+    "Stands in for a recorded player, answering decisions taken within a step from the replay"
+    def __init__(self, Colour: str, type: str, cursor: ReplayCursor):
+        super().__init__(Colour)
+        self.type = type
+        self.cursor = cursor
+
+    def choose_action(self, possible_actions: List[Action]) -> Action:
+        return possible_actions[self.cursor.next()]
+
+class Replay():
+    """
+    A recorded game, any position is rebuilt by regenerating the board from
+    the seed and stepping through the recorded decisions with the same chance
+    """
+    def __init__(self, filepath: str, keyframe_interval: int=KEYFRAME_INTERVAL):
+        self.filepath = filepath
+        with open(filepath, "rb") as file:
+            data = file.read()
+        (length,) = HEADER_LENGTH.unpack_from(data)
+        self.header = json.loads(data[HEADER_LENGTH.size:HEADER_LENGTH.size + length])
+        if self.header.get("format") != REPLAY_FORMAT or self.header.get("version") != REPLAY_VERSION:
+            raise ValueError(f"{filepath} is not a version {REPLAY_VERSION} replay")
+
+        body = data[HEADER_LENGTH.size + length:]
+        # a torn final write from a crashed game is ignored
+        self.entries = np.frombuffer(body[:len(body) - len(body) % ENTRY.size], dtype="<u2")
+        self.action_space: ActionSpace = None
+
+        # turn : compressed pickle of the game at the start of that turn
+        self.keyframes: Dict[int, bytes] = {}
+        self.keyframe_interval = keyframe_interval
+        self.last_turn: int = None
+        # 0 skips keyframes for replays only played straight through
+        if keyframe_interval:
+            self.load_keyframes()
+
+    def new_game(self) -> Game:
+        "The game before its first decision"
+        cursor = ReplayCursor(self.entries)
+        players = [ReplayPlayer(colour, player_type, cursor) for colour, player_type in self.header["players"]]
+        game = Game(
+            tuple(self.header["window_size"]), players, gamelog=False, debug=False, savegame=False,
+            hierarchical_trades=self.header["hierarchical_trades"], seed=self.header["seed"],
+            board_radius=self.header.get("board_radius", STANDARD_RADIUS))
+        game.turn_limit = self.header["turn_limit"]
+        if game.player_order != self.header["player_order"] or get_board_layout(game) != self.header["board"]:
+            raise ValueError("Replay board does not match, it was recorded by a different version of the game")
+        if self.action_space is None:
+            self.action_space = ActionSpace(game.board)
+        return game
+
+    def step(self, game: Game) -> bool:
+        "Plays the next recorded tick, False once the replay has run out"
+        colour = game.player_order[game.current_player]
+        cursor: ReplayCursor = game.players[colour].cursor
+        if cursor.done():
+            return False
+        action = self.action_space.decode(cursor.next())
+        game.seed_chance()
+        game.step(colour, action)
+        game.tracker.ticks += 1
+        return True
+
+    def game_at_turn(self, turn: int) -> Game:
+        "The game at the start of the turn, or at its end if it finished sooner"
+        keyframe_turns = [keyframe_turn for keyframe_turn in self.keyframes if keyframe_turn <= turn]
+        game = self.load_keyframe(max(keyframe_turns)) if keyframe_turns else self.new_game()
+        while game.turn < turn and self.step(game):
+            pass
+        return game
+
+    def load_keyframe(self, turn: int) -> Game:
+        game: Game = pickle.loads(zlib.decompress(self.keyframes[turn]))
+        next(iter(game.players.values())).cursor.entries = self.entries
+        if self.action_space is None:
+            self.action_space = ActionSpace(game.board)
+        return game
+
+    def get_keyframe_path(self) -> str:
+        return self.filepath + ".keyframes"
+
+    def build_keyframes(self):
+        "Plays the replay through once, keeping the start of every interval'th turn"
+        self.keyframes.clear()
+        game = self.new_game()
+        while True:
+            if (game.turn - 1) % self.keyframe_interval == 0 and game.turn not in self.keyframes:
+                self.keyframes[game.turn] = zlib.compress(pickle.dumps(game, protocol=pickle.HIGHEST_PROTOCOL))
+            if not self.step(game):
+                break
+        self.last_turn = game.turn
+
+    def load_keyframes(self):
+        "Reads the keyframe index next to the replay, rebuilding it if missing or stale"
+        try:
+            with open(self.get_keyframe_path(), "rb") as file:
+                data = file.read()
+            (length,) = HEADER_LENGTH.unpack_from(data)
+            index = json.loads(data[HEADER_LENGTH.size:HEADER_LENGTH.size + length])
+        except (OSError, ValueError, struct.error):
+            index = None
+
+        if (index is None or index.get("format") != KEYFRAME_FORMAT or index["entries"] != len(self.entries)
+                or index["interval"] != self.keyframe_interval):
+            self.build_keyframes()
+            self.save_keyframes()
+            return
+
+        self.last_turn = index["last_turn"]
+        start = HEADER_LENGTH.size + length
+        for turn, offset, size in index["keyframes"]:
+            self.keyframes[turn] = data[start + offset:start + offset + size]
+
+    def save_keyframes(self):
+        "Writes the keyframes after a JSON index of (turn, offset, size)"
+        keyframes: List[Tuple[int, int, int]] = []
+        offset = 0
+        for turn, keyframe in self.keyframes.items():
+            keyframes.append((turn, offset, len(keyframe)))
+            offset += len(keyframe)
+        index = json.dumps({
+            "format": KEYFRAME_FORMAT, "entries": len(self.entries), "interval": self.keyframe_interval,
+            "last_turn": self.last_turn, "keyframes": keyframes,
+        }).encode()
+        with open(self.get_keyframe_path(), "wb") as file:
+            file.write(HEADER_LENGTH.pack(len(index)) + index)
+            for keyframe in self.keyframes.values():
+                file.write(keyframe)
+
+class ReplayPrefetcher():
+    """
+    Serves turns of a replay to the viewer, rebuilding the turns either side
+    of the one shown on a background thread so stepping never waits
+    """
+    def __init__(self, replay: Replay, radius: int=2):
+        self.replay = replay
+        self.radius = radius
+        # a single worker, replays reseed the global random module as they step
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.lock = threading.Lock()
+        self.games: Dict[int, Future] = {}
+
+    def request(self, turn: int) -> Future:
+        with self.lock:
+            if turn not in self.games:
+                self.games[turn] = self.executor.submit(self.replay.game_at_turn, turn)
+            return self.games[turn]
+
+    def get(self, turn: int) -> Game:
+        "The game at the start of the turn, prefetching its neighbours"
+        future = self.request(turn)
+        with self.lock:
+            for cached in list(self.games):
+                if abs(cached - turn) > self.radius:
+                    self.games.pop(cached).cancel()
+        for distance in range(1, self.radius + 1):
+            for neighbour in (turn + distance, turn - distance):
+                if 1 <= neighbour <= self.replay.last_turn:
+                    self.request(neighbour)
+        return future.result()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
@@ -0,0 +1,354 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+from typing import List, Dict, Tuple, Callable, Awaitable
+
+import numpy as np
+
+from game import Game
+from player import Player, Action, RandomPlayer
+from tracker import Tracker
+from actions import ActionSpace
+from observation import ObservationEncoder
+from policy import WeightedPolicy, DEFAULT_POLICY
+
+WINDOW_SIZE = (750, 910)
+COLOURS = ["RED", "WHITE", "ORANGE", "BLUE"]
+MOVE_TIMEOUT = 30 # seconds an agent has for a decision before the fallback policy decides for it
+
+class Agent():
+    """
+    Coroutine agent skeleton, nested is True for decisions taken within
+    another player's move (answering a trade) or within a development card
+    """
+    name = "Agent"
+    # in process agents answer without waiting on anything outside, so they are not timed
+    local = False
+
+    async def choose_action(self, game: Game, colour: str, possible_actions: List[Action], nested: bool) -> Action:
+        raise NotImplementedError("This method should be overridden in subclasses")
+
+class PlayerAgent(Agent):
+    "Runs an in process Player, CPU bound players such as MCTS hold up the other games while they think"
+    local = True
+
+    def __init__(self, player: Player):
+        self.player = player
+        self.name = player.type
+
+    async def choose_action(self, game: Game, colour: str, possible_actions: List[Action], nested: bool) -> Action:
+        if game.starting_settlement_phase and self.player.type == "MCTSPlayer":
+            return self.player.choose_action(possible_actions, game=game)
+        return self.player.choose_action(possible_actions)
+
+def random_evaluator(observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    "Uniformly random legal action ids for a batch, a stand in for a policy network"
+    return np.argmax(np.random.random(masks.shape) * masks, axis=1)
+
+class BatchEvaluator():
+    """
+    Gathers the pending decisions of every game waiting on it and answers them
+    with one call of evaluate(observations, legal masks) -> action ids
+    """
+    def __init__(self, evaluate: Callable[[np.ndarray, np.ndarray], np.ndarray], max_batch: int=1024, max_delay: float=0):
+        self.evaluate = evaluate
+        self.max_batch = max_batch
+        self.max_delay = max_delay # seconds the first decision of a batch waits for others
+        # built from the first board seen, all games must share its topology
+        self.encoder: ObservationEncoder = None
+        self.action_space: ActionSpace = None
+        self.pending: List[Tuple[np.ndarray, np.ndarray, asyncio.Future]] = []
+        self.flush_handle: asyncio.Handle = None
+        self.batch_sizes: List[int] = []
+
+    async def choose_action(self, game: Game, possible_actions: List[Action]) -> Action:
+        if self.encoder is None:
+            self.encoder = ObservationEncoder(game.board)
+            self.action_space = ActionSpace(game.board)
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((self.encoder.encode(game), self.action_space.mask(possible_actions), future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            # by the time this runs every game ready this loop iteration has queued its decision
+            self.flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return self.action_space.decode(await future)
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.batch_sizes.append(len(batch))
+        observations = np.stack([observation for observation, _, _ in batch])
+        masks = np.stack([mask for _, mask, _ in batch])
+        for (_, _, future), action_id in zip(batch, self.evaluate(observations, masks)):
+            if not future.done():
+                future.set_result(int(action_id))
+
+class BatchedAgent(Agent):
+    "Decides through a shared BatchEvaluator, nested decisions are outside the action space and use the fallback policy"
+    name = "BatchedAgent"
+    local = True
+
+    def __init__(self, evaluator: BatchEvaluator, fallback: WeightedPolicy=DEFAULT_POLICY):
+        self.evaluator = evaluator
+        self.fallback = fallback
+
+    async def choose_action(self, game: Game, colour: str, possible_actions: List[Action], nested: bool) -> Action:
+        if nested:
+            return self.fallback.choose(possible_actions)
+        return await self.evaluator.choose_action(game, possible_actions)
+
+class RemoteAgent(Agent):
+    """
+    Agent on the other end of a socket, speaking newline delimited JSON. The
+    server sends {"id", "game", "colour", "turn", "nested", "actions"} with
+    actions as [type, value] pairs and the agent replies {"id", "choice"} with
+    the index of its action. One connection can play in many games at once
+    """
+    name = "RemoteAgent"
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.requests: Dict[int, asyncio.Future] = {}
+        self.next_id: int = 0
+        self.listener = asyncio.get_running_loop().create_task(self.listen())
+
+    async def listen(self):
+        "Hands each reply to the decision waiting for it, late replies to timed out decisions are dropped"
+        try:
+            while line := await self.reader.readline():
+                reply = json.loads(line)
+                future = self.requests.pop(reply.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(reply["choice"])
+        except (ConnectionError, ValueError):
+            pass
+        for future in self.requests.values():
+            if not future.done():
+                future.set_exception(ConnectionError("remote agent disconnected"))
+        self.requests.clear()
+
+    async def send(self, message: Dict):
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def choose_action(self, game: Game, colour: str, possible_actions: List[Action], nested: bool) -> Action:
+        request_id = self.next_id
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.requests[request_id] = future
+        try:
+            await self.send({
+                "id": request_id, "game": id(game), "colour": colour, "turn": game.turn, "nested": nested,
+                "actions": [list(action) for action in possible_actions],
+            })
+            return possible_actions[await future]
+        finally:
+            self.requests.pop(request_id, None)
+
+    async def game_over(self, game: Game):
+        await self.send({"game": id(game), "winner": game.tracker.winner, "turns": game.turn})
+
+    def close(self):
+        self.listener.cancel()
+        self.writer.close()
+
+class Seat(Player):
+    """
+    Stands in for an agent inside the game, step() takes the decisions it makes
+    within a move from answers the server collected before calling it
+    """
+    def __init__(self, Colour: str, type: str, policy: WeightedPolicy=DEFAULT_POLICY):
+        super().__init__(Colour)
+        self.type = type
+        self.answers: deque = deque()
+        # search copies of the game ask the seats of the other players too
+        self.policy = policy
+
+    def choose_action(self, possible_actions: List[Action]) -> Action:
+        if self.answers:
+            return self.answers.popleft()
+        return self.policy.choose(possible_actions)
+
+def new_game(agents: Dict[str, Agent], seed: int=None, **kwargs) -> Game:
+    "A game seating the agents, by colour, keyword arguments go to Game"
+    settings = {"windowSize": WINDOW_SIZE, "gamelog": False, "debug": False, "savegame": False}
+    settings.update(kwargs)
+    players = [Seat(colour, agent.name) for colour, agent in agents.items()]
+    return Game(players=players, seed=seed, **settings)
+
+class GameServer():
+    """
+    Plays many games concurrently on one event loop, every decision is awaited
+    from the seat's agent so agents can wait on sockets, people or batches
+    without holding up the other games
+    """
+    def __init__(self, move_timeout: float=MOVE_TIMEOUT, fallback: WeightedPolicy=DEFAULT_POLICY):
+        self.move_timeout = move_timeout
+        self.fallback = fallback
+        self.timeouts: int = 0
+        self.decisions: int = 0
+        # remote agents that connected and are waiting for a game
+        self.lobby: asyncio.Queue = None
+
+    async def decide(
+            self, game: Game, agents: Dict[str, Agent], colour: str, possible_actions: List[Action],
+            nested: bool=False) -> Action:
+        self.decisions += 1
+        if len(possible_actions) == 1:
+            return possible_actions[0]
+        agent = agents[colour]
+        if agent.local or self.move_timeout is None:
+            return await agent.choose_action(game, colour, possible_actions, nested)
+        try:
+            return await asyncio.wait_for(agent.choose_action(game, colour, possible_actions, nested), self.move_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.timeouts += 1
+            return self.fallback.choose(possible_actions)
+
+    async def answer_nested(self, game: Game, agents: Dict[str, Agent], colour: str, action: Action):
+        """
+        Asks the decisions step() will take within the action before it runs,
+        in the order it takes them, and queues them on the seats
+        """
+        if action.type == "TRADE_WITH_PLAYER":
+            trader: Seat = game.players[colour]
+            accepted: List[Action] = []
+            for other in game.players.values():
+                if other is trader:
+                    continue
+                response = await self.decide(
+                    game, agents, other.colour, game.get_trade_responses(other, action.value), nested=True)
+                other.answers.append(response)
+                if response.type == "ACCEPT_TRADE":
+                    accepted.append(Action("CONFIRMED_TRADE", other.colour))
+            if accepted:
+                trader.answers.append(await self.decide(game, agents, colour, accepted, nested=True))
+
+        elif action.type == "PLAY_ROAD_BUILDING":
+            seat: Seat = game.players[colour]
+            locations = game.get_possible_roads(colour)
+            if locations:
+                first = await self.decide(game, agents, colour, locations, nested=True)
+                seat.answers.append(first)
+                locations = game.get_possible_roads_after(colour, first.value)
+                if locations:
+                    seat.answers.append(await self.decide(game, agents, colour, locations, nested=True))
+
+    async def play(self, game: Game, agents: Dict[str, Agent]) -> Tracker:
+        "Game.play with every decision awaited"
+        while not game.game_over():
+            colour = game.player_order[game.current_player]
+            possible_actions: List[Action] = game.get_possible_actions(colour)
+            chosen_action = await self.decide(game, agents, colour, possible_actions)
+            for recorder in game.recorders:
+                recorder.record(game, colour, possible_actions, chosen_action)
+            if game.replay_writer is not None:
+                game.replay_writer.record_action(chosen_action)
+            await self.answer_nested(game, agents, colour, chosen_action)
+            # nothing is awaited from here to the end of the step, so no other game reseeds chance in between
+            game.seed_chance()
+            game.step(colour, chosen_action)
+            game.tracker.ticks += 1
+
+        for agent in set(agents.values()):
+            if isinstance(agent, RemoteAgent):
+                await agent.game_over(game)
+        return game.finish()
+
+    async def play_many(
+            self, make_game: Callable[[int], Awaitable[Tuple[Game, Dict[str, Agent]]]], games: int,
+            concurrency: int=1000) -> List[Tracker]:
+        "Plays games made by make_game(i), at most concurrency at once"
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def play_one(i: int) -> Tracker:
+            async with semaphore:
+                game, agents = await make_game(i)
+                return await self.play(game, agents)
+
+        return await asyncio.gather(*(play_one(i) for i in range(games)))
+
+    async def listen(self, address: str) -> asyncio.AbstractServer:
+        "Accepts remote agents on 'host:port' or a unix socket path, each connection joins the lobby"
+        self.lobby = asyncio.Queue()
+
+        async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            await self.lobby.put(RemoteAgent(reader, writer))
+
+        if ":" in address:
+            host, port = address.rsplit(":", 1)
+            return await asyncio.start_server(on_connect, host, int(port))
+        return await asyncio.start_unix_server(on_connect, address)
+
+async def connect(address: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        return await asyncio.open_connection(host, int(port))
+    return await asyncio.open_unix_connection(address)
+
+async def run_remote_agent(address: str, choose: Callable[[Dict], int]=None):
+    "Client side of RemoteAgent, answers requests with choose(message) until the server hangs up"
+    choose = choose or (lambda message: random.randrange(len(message["actions"])))
+    reader, writer = await connect(address)
+    games = 0
+    while line := await reader.readline():
+        message = json.loads(line)
+        if "winner" in message:
+            games += 1
+            continue
+        writer.write(json.dumps({"id": message["id"], "choice": choose(message)}).encode() + b"\n")
+    writer.close()
+    return games
+
+async def main(games: int, concurrency: int, batched: bool, listen: str=None, move_timeout: float=MOVE_TIMEOUT):
+    server = GameServer(move_timeout=move_timeout)
+    evaluator = BatchEvaluator(random_evaluator)
+    remote: RemoteAgent = None
+    if listen:
+        await server.listen(listen)
+        print(f"Waiting for a remote agent on {listen}")
+        remote = await server.lobby.get()
+
+    async def make_game(i: int) -> Tuple[Game, Dict[str, Agent]]:
+        agents: Dict[str, Agent] = {}
+        for colour in COLOURS:
+            agents[colour] = BatchedAgent(evaluator) if batched else PlayerAgent(RandomPlayer(Colour=colour))
+        if remote is not None:
+            agents["RED"] = remote
+        return new_game(agents, seed=i), agents
+
+    start = time.time()
+    trackers = await server.play_many(make_game, games, concurrency)
+    run_time = time.time() - start
+    if remote is not None:
+        remote.close()
+
+    print(f"Played {len(trackers)} games, {server.decisions} decisions in {run_time:.2f} seconds ({len(trackers) / run_time:.1f} games/s)")
+    print(f"Decisions timed out: {server.timeouts}")
+    if evaluator.batch_sizes:
+        print(f"Evaluator batches: {len(evaluator.batch_sizes)}, mean size {np.mean(evaluator.batch_sizes):.1f}")
+    return trackers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many concurrent games on one event loop")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1000, help="games in progress at once")
+    parser.add_argument("--batched", action="store_true", help="decide through one batched evaluator instead of in process players")
+    parser.add_argument("--listen", default=None, help="seat a remote agent connecting to host:port or a unix socket path as RED")
+    parser.add_argument("--connect", default=None, help="run a random remote agent against a server at host:port or a socket path")
+    parser.add_argument("--move-timeout", type=float, default=MOVE_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.connect:
+        print(f"Remote agent played {asyncio.run(run_remote_agent(args.connect))} games")
+    else:
+        asyncio.run(main(args.games, args.concurrency, args.batched, listen=args.listen, move_timeout=args.move_timeout))
@@ -1,14 +1,11 @@
 import time
 from statistics import mean 
-from tqdm import tqdm
-from concurrent.futures import ProcessPoolExecutor, as_completed
 import multiprocessing
 
 from game import Game
 from player import RandomPlayer, WeightedRandomPlayer
-from tracker import Tracker
-
-from ml.mcts import MCTSPlayer
+from tracker import Tracker, TelemetryWriter
+from profiling import Profiler, ProfileReport
 
 # --------------------------------- SIMULATION SETTINGS -------------------------------
 WINDOW_SIZE = (750, 910) # pygame window size
@@ -16,9 +13,20 @@ USE_MULTIPROCESSING = True
 TOTAL_GAMES = 1000
 GAMELOG = False # print game events to console
 DEBUG = False # print additional game information not typical visible
-SAVEGAME = False # turn on to view games using pygame UI
+SAVEGAME = False # record replays to saves/ and view the last game using pygame UI
+HIERARCHICAL_TRADES = False # pick "trade" first and the give/receive pair second
+BOARD_RADIUS = 2 # rings of land around the centre hex, 2 is the standard board
+RECORD_DATASET = None # directory to stream (features, legal mask, action, outcome) training rows to
+TELEMETRY = None # directory to write per turn columns of every game to, in compressed batches
+START_METHOD = None # worker start method, None for the platform default, "forkserver" forks workers from one preloaded engine
+PROFILE = None # directory to write the merged profile of every worker to, or pass --profile DIRECTORY
+
+def MCTSPlayer(**options):
+    "Builds a search player, the ml package is only imported by lineups that use one"
+    from ml.mcts import MCTSPlayer
+    return MCTSPlayer(**options)
 
-def simulate_game(i):
+def simulate_game(i, profile: bool=False):
     players = [
         RandomPlayer(Colour="RED"), 
         RandomPlayer(Colour="WHITE"), 
@@ -36,8 +44,19 @@ def simulate_game(i):
         # MCTSPlayer(Colour="BLUE", Iterations=1000, Pruning=True, Reward=True),
     ]
 # -------------------------------------------------------------------------------------
-    game = Game(windowSize=WINDOW_SIZE, players=players, gamelog=GAMELOG, debug=DEBUG, savegame=SAVEGAME)
+    profiler = Profiler() if profile else None
+    if profiler:
+        profiler.start()
+    game = Game(
+        windowSize=WINDOW_SIZE, players=players, gamelog=GAMELOG, debug=DEBUG, savegame=SAVEGAME,
+        hierarchical_trades=HIERARCHICAL_TRADES, board_radius=BOARD_RADIUS, telemetry=bool(TELEMETRY))
+    if RECORD_DATASET:
+        from ml.dataset import get_worker_writer
+        game.recorders.append(get_worker_writer(RECORD_DATASET))
     tracker: Tracker = game.play()
+    game.recorders.clear()
+    if profiler:
+        profiler.stop()
     
     result = {
         'winner': tracker.winner,
@@ -52,11 +71,23 @@ def simulate_game(i):
         'losers_cities_built': {colour: built for colour, built in tracker.cities_built.items() if colour != tracker.winner},
         'losers_resources_collected': {colour: collected for colour, collected in tracker.resources_collected.items() if colour != tracker.winner},
         'losers_dev_cards_purchased': {colour: purchased for colour, purchased in tracker.dev_cards_purchased.items() if colour != tracker.winner},
+        'telemetry': (i, tracker.series.colours, tracker.series.to_columns()) if tracker.series else None,
+        'profile': profiler.results() if profiler else None,
     }
     
     return result, game
 
-def main(use_multiprocessing=False):
+def get_context(start_method: str=None):
+    "Multiprocessing context, a forkserver imports the engine and builds a board once and forks every worker from that"
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(["__main__", "preload"])
+    return context
+
+def main(use_multiprocessing=False, profile: str=None):
+    # only the main process draws progress bars
+    from tqdm import tqdm
+    from concurrent.futures import ProcessPoolExecutor, as_completed
 
     total_games = TOTAL_GAMES
 
@@ -73,16 +104,22 @@ def main(use_multiprocessing=False):
     losers_cities_built = []
     losers_resources_collected = []
     losers_dev_cards_purchased = []
+    telemetry = TelemetryWriter(TELEMETRY) if TELEMETRY else None
+    report = ProfileReport() if profile else None
 
     start = time.time()
     if use_multiprocessing:
         print(f"CPU cores in use: {multiprocessing.cpu_count()}")
-        with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-            futures = [executor.submit(simulate_game, i) for i in range(total_games)]
+        with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count(), mp_context=get_context(START_METHOD)) as executor:
+            futures = [executor.submit(simulate_game, i, bool(profile)) for i in range(total_games)]
 
             try:
                 for future in tqdm(as_completed(futures), total=total_games, desc=f"Simulating games:", bar_format="{desc} |{bar}| {n_fmt}/{total_fmt} {remaining}"):
                     result, game = future.result()
+                    if telemetry:
+                        telemetry.add(*result['telemetry'])
+                    if report:
+                        report.add(result['profile'])
 
                     if result['winner'] is None:
                         discarded += 1
@@ -113,7 +150,11 @@ def main(use_multiprocessing=False):
     else:
         # Run simulations sequentially
         for i in tqdm(range(total_games), total=total_games, desc=f"Simulating games:", bar_format="{desc} |{bar}| {n_fmt}/{total_fmt} {remaining}"):
-            result, game = simulate_game(i)
+            result, game = simulate_game(i, bool(profile))
+            if telemetry:
+                telemetry.add(*result['telemetry'])
+            if report:
+                report.add(result['profile'])
 
             if result['winner'] is None:
                 discarded += 1
@@ -135,6 +176,8 @@ def main(use_multiprocessing=False):
                 losers_dev_cards_purchased.extend(result['losers_dev_cards_purchased'].values())
 
     run_time = time.time() - start
+    if telemetry:
+        telemetry.close()
 
     print("\n")
 
@@ -159,21 +202,34 @@ def main(use_multiprocessing=False):
 
     print("\n")
 
+    if report:
+        print(report.write(profile))
+        print(f"Profiles written to {profile}\n")
+
     return game
 
 if __name__ == "__main__":
-    game = main(use_multiprocessing=USE_MULTIPROCESSING)
+    import argparse
+    parser = argparse.ArgumentParser(description="Simulate games with the settings at the top of this file")
+    parser.add_argument("--profile", default=PROFILE, metavar="DIRECTORY", help="profile every worker and write the merged profile here")
+    args = parser.parse_args()
+    game = main(use_multiprocessing=USE_MULTIPROCESSING, profile=args.profile)
     if SAVEGAME:
         import pygame
         from renderer import Renderer
+        from replay import Replay, ReplayPrefetcher
         
         # Render loop
         pygame.init()
         renderer = Renderer(windowSize=WINDOW_SIZE, game=game)
+        prefetcher = ReplayPrefetcher(Replay(game.replay_path))
 
         renderer.display()
         lower_limit = 1
-        upper_limit = game.turn-1
+        upper_limit = game.turn
+        # LEFT/RIGHT step a turn, PAGEUP/PAGEDOWN ten, HOME/END to either end, type a number and ENTER to jump
+        jumps = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_PAGEDOWN: -10, pygame.K_PAGEUP: 10}
+        typed_turn = ""
 
         running = True
         while running:
@@ -181,19 +237,36 @@ if __name__ == "__main__":
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    # describe what was clicked on
+                    piece, key = renderer.hit_test(event.pos)
+                    board = renderer.display_game.board
+                    if piece == "VERTEX":
+                        print(f"Vertex {key}: {board.vertices[key].building} {board.vertices[key].owner_colour}")
+                    elif piece == "EDGE":
+                        print(f"Edge {key}: road {board.edges[key].owner_colour}")
+                    elif piece == "HEX":
+                        print(f"Hex {key}: {board.hexes[key].resource} {board.hexes[key].value}")
                 if game.savegame:
                     if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_LEFT:
-                            if game.turn > lower_limit:
-                                game.turn -= 1
-                                new_game = Game.load_game(f"saves/turn_{game.turn}")
-                                renderer.display_game = new_game
-                                renderer.display()
-                        elif event.key == pygame.K_RIGHT:
-                            if game.turn < upper_limit:
-                                game.turn += 1
-                                new_game = Game.load_game(f"saves/turn_{game.turn}")
-                                renderer.display_game = new_game
-                                renderer.display()
+                        target = game.turn
+                        if event.key in jumps:
+                            target = game.turn + jumps[event.key]
+                        elif event.key == pygame.K_HOME:
+                            target = lower_limit
+                        elif event.key == pygame.K_END:
+                            target = upper_limit
+                        elif event.unicode.isdigit():
+                            typed_turn += event.unicode
+                        elif event.key == pygame.K_RETURN and typed_turn:
+                            target = int(typed_turn)
+                            typed_turn = ""
+
+                        target = min(max(target, lower_limit), upper_limit)
+                        if target != game.turn:
+                            game.turn = target
+                            renderer.display_game = prefetcher.get(game.turn)
+                            renderer.display()
     
+        prefetcher.close()
         pygame.quit()
\ No newline at end of file
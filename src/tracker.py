@@ -1,8 +1,75 @@
-from typing import Dict
+import os
+from typing import Dict, List, Tuple
 from collections import defaultdict
 
+import numpy as np
+
+# column : (dtype, per player)
+TURN_COLUMNS: Dict[str, Tuple[str, bool]] = {
+    "turn": ("int16", False),
+    "tick": ("int32", False),
+    "player": ("int8", False), # index into the colours, of the player whose turn it is
+    "dice": ("int8", False), # total rolled, 0 in the setup phase and on the final row
+    "robber_q": ("int8", False),
+    "robber_r": ("int8", False),
+    "victory_points": ("int8", True),
+    "hand_size": ("int16", True),
+    "settlements": ("int8", True),
+    "cities": ("int8", True),
+    "roads": ("int8", True),
+}
+
+class TurnSeries():
+    """
+    Per turn telemetry held as columns, one row at the start of every turn
+    once the dice are rolled and one when the game finishes. The columns are
+    rows of one preallocated int32 block that doubles when full, so adding a
+    turn is a single write, and are cut to their own dtypes on the way out
+    """
+    def __init__(self, colours: List[str], capacity: int=256):
+        self.colours: List[str] = list(colours)
+        self.rows: int = 0
+        # block rows of each column
+        self.slices: Dict[str, slice] = {}
+        width = 0
+        for name, (_, per_player) in TURN_COLUMNS.items():
+            span = len(colours) if per_player else 1
+            self.slices[name] = slice(width, width + span)
+            width += span
+        self.block: np.ndarray = np.zeros((width, capacity), dtype=np.int32)
+
+    def grow(self):
+        grown = np.zeros((len(self.block), 2 * self.block.shape[1]), dtype=np.int32)
+        grown[:, :self.rows] = self.block[:, :self.rows]
+        self.block = grown
+
+    def append(self, game, dice: int=0):
+        if self.rows == self.block.shape[1]:
+            self.grow()
+        robber = game.board.robber_coord
+        players = [game.players[colour] for colour in self.colours]
+        # in TURN_COLUMNS order
+        self.block[:, self.rows] = [
+            game.turn, game.tracker.ticks, self.colours.index(game.player_order[game.current_player]), dice,
+            robber.q, robber.r,
+            *[player.victory_points for player in players],
+            *[sum(player.resources.values()) for player in players],
+            *[5 - player.settlements_left for player in players],
+            *[4 - player.cities_left for player in players],
+            *[15 - player.roads_left for player in players],
+        ]
+        self.rows += 1
+
+    def to_columns(self) -> Dict[str, np.ndarray]:
+        "The filled rows of every column, per player columns are (turns, players)"
+        columns: Dict[str, np.ndarray] = {}
+        for name, (dtype, per_player) in TURN_COLUMNS.items():
+            column = self.block[self.slices[name], :self.rows].astype(dtype)
+            columns[name] = column.T.copy() if per_player else column[0]
+        return columns
+
 class Tracker():
-    def __init__(self):
+    def __init__(self, colours: List[str]=None, telemetry: bool=False):
         self.winner: str = None
         self.game_length: int = 0
         self.ticks: int = 0
@@ -15,3 +82,68 @@ class Tracker():
         self.dev_cards_purchased: Dict[int] = defaultdict(int)
 
         self.first_building_turn_built: int = None
+
+        # optional time series, None keeps only the totals above
+        self.series: TurnSeries = TurnSeries(colours) if telemetry else None
+
+class TelemetryWriter():
+    """
+    Collects the TurnSeries of a batch of games and writes them as one
+    compressed .npz of concatenated columns, plus a game column and the
+    colours of each game, or as Parquet when pyarrow is installed
+    """
+    def __init__(self, directory: str, games_per_file: int=100, format: str="npz"):
+        if format not in ("npz", "parquet"):
+            raise ValueError(f"format must be npz or parquet, not {format}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.games_per_file = games_per_file
+        self.format = format
+        self.pending: List[Tuple[int, List[str], Dict[str, np.ndarray]]] = []
+        self.files: List[str] = []
+
+    def add(self, game_id: int, colours: List[str], columns: Dict[str, np.ndarray]):
+        self.pending.append((game_id, colours, columns))
+        if len(self.pending) >= self.games_per_file:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch = {
+            name: np.concatenate([columns[name] for _, _, columns in self.pending]) for name in TURN_COLUMNS}
+        batch["game"] = np.concatenate([
+            np.full(len(columns["turn"]), game_id, dtype=np.int32) for game_id, _, columns in self.pending])
+        filepath = os.path.join(self.directory, f"telemetry-{len(self.files):05d}.{self.format}")
+        if self.format == "npz":
+            batch["game_ids"] = np.array([game_id for game_id, _, _ in self.pending], dtype=np.int32)
+            batch["colours"] = np.array([colours for _, colours, _ in self.pending])
+            np.savez_compressed(filepath, **batch)
+        else:
+            write_parquet(filepath, batch, [colours for _, colours, _ in self.pending])
+        self.files.append(filepath)
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+
+def write_parquet(filepath: str, batch: Dict[str, np.ndarray], colours: List[List[str]]):
+    "Per player columns become one column per seat, named by position since colour orders can differ"
+    import pyarrow
+    import pyarrow.parquet
+
+    table: Dict[str, np.ndarray] = {}
+    for name, column in batch.items():
+        if column.ndim == 2:
+            for seat in range(column.shape[1]):
+                table[f"{name}_{seat}"] = column[:, seat]
+        else:
+            table[name] = column
+    metadata = {"colours": ";".join(",".join(game_colours) for game_colours in colours)}
+    pyarrow.parquet.write_table(
+        pyarrow.table(table).replace_schema_metadata(metadata), filepath, compression="zstd")
+
+def load_telemetry(filepath: str) -> Dict[str, np.ndarray]:
+    "Columns of an .npz telemetry file"
+    with np.load(filepath) as data:
+        return {name: data[name] for name in data.files}
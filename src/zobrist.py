@@ -0,0 +1,9 @@
+from typing import Hashable
+from functools import lru_cache
+import hashlib
+
+@lru_cache(maxsize=None)
+def zobrist_key(feature: Hashable) -> int:
+    "Returns the random 64 bit key of a game feature, identical across processes"
+    digest = hashlib.blake2b(repr(feature).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
@@ -5,6 +5,7 @@ from src.board import Board
 from src.map import CatanMap, Vertex, Edge
 from src.player import Player
 from src.hexlib import Point, Hex
+from src.analytics import PIP_NUMBER_DICT, RESOURCES
 
 class TestBoard(unittest.TestCase):
 
@@ -125,5 +126,42 @@ class TestCatanMap(unittest.TestCase):
         ports = [hex for hex in sea_hexes.values() if hex.port_type]
         self.assertEqual(len(ports), 9)
 
+class TestBoardAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a random CatanMap and its analytics index"""
+        self.catan_map = CatanMap(mapDimensions=(750, 910))
+        self.analytics = self.catan_map.analytics
+
+    def test_pips_and_income_match_hex_walk(self):
+        """Test the per vertex arrays agree with walking the neighbouring hexes"""
+        for coord, vertex in self.catan_map.vertices.items():
+            index = self.analytics.vertex_index[coord]
+            values = [self.catan_map.hexes[h].value for h in vertex.hex_neighbors if self.catan_map.hexes[h].value]
+            self.assertEqual(self.analytics.pips[index], sum(PIP_NUMBER_DICT[value] for value in values))
+            self.assertAlmostEqual(self.analytics.income[index].sum() * 36, self.analytics.pips[index])
+            resources = {self.catan_map.hexes[h].resource for h in vertex.hex_neighbors} & set(RESOURCES)
+            self.assertEqual(self.analytics.diversity[index], len(resources))
+
+    def test_coast_distance(self):
+        """Test coastal vertices are at distance 0 and inland ones one further than their closest neighbour"""
+        index = self.analytics.vertex_index
+        for coord, vertex in self.catan_map.vertices.items():
+            distance = self.analytics.coast_distance[index[coord]]
+            self.assertEqual(distance == 0, len(vertex.hex_neighbors) < 3)
+            if distance > 0:
+                closest = min(self.analytics.coast_distance[index[n]] for n in vertex.vertex_neighbors)
+                self.assertEqual(distance, closest + 1)
+
+    def test_robber_blocks_income(self):
+        """Test moving the robber blocks the new hex and restores the old one"""
+        land = [coord for coord, hextile in self.catan_map.hexes.items() if hextile.value]
+        old_robber = self.analytics.robber_coord
+        self.analytics.move_robber(land[0])
+        blocked = [self.analytics.vertex_index[v] for v in self.catan_map.hexes[land[0]].vertex_neighbors]
+        self.assertTrue((self.analytics.robbed_income[blocked].sum(axis=1) < self.analytics.income[blocked].sum(axis=1)).all())
+        self.analytics.move_robber(old_robber)
+        self.assertTrue(abs(self.analytics.robbed_income - self.analytics.income).max() < 1e-9)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+import json
+import asyncio
+import unittest
+
+from src.cluster import Coordinator, play_game, start_workers, parse_address, DEFAULT_PLAYERS
+
+class TestCluster(unittest.TestCase):
+
+    def test_local_workers_play_every_seed(self):
+        """Test games split across local worker processes come back once per seed, as if played here"""
+        coordinator = Coordinator(games=10, first_seed=100, games_per_task=3)
+
+        async def run():
+            address = await coordinator.start("127.0.0.1:0")
+            workers = start_workers(address, 2)
+            results = await coordinator.wait()
+            for worker in workers:
+                await asyncio.to_thread(worker.join)
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual([result["seed"] for result in results], list(range(100, 110)))
+        self.assertEqual(len(coordinator.tasks), 4)
+        self.assertEqual(coordinator.retries, 0)
+        self.assertEqual(results[3], json.loads(json.dumps(play_game(DEFAULT_PLAYERS, 103, {}))))
+
+    def test_lost_tasks_are_retried(self):
+        """Test tasks held by a silent worker time out and one that disconnects is requeued at once"""
+        coordinator = Coordinator(games=6, games_per_task=2, task_timeout=0.5, settings={"board_radius": 1})
+
+        async def take_task(address, hang_up):
+            reader, writer = await asyncio.open_connection(*parse_address(address))
+            writer.write(b'{"type": "ready"}\n')
+            await reader.readline()
+            if hang_up:
+                writer.close()
+            return writer
+
+        async def run():
+            address = await coordinator.start("127.0.0.1:0")
+            silent = await take_task(address, hang_up=False)
+            await take_task(address, hang_up=True)
+            workers = start_workers(address, 1)
+            results = await coordinator.wait()
+            for worker in workers:
+                await asyncio.to_thread(worker.join)
+            silent.close()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual([result["seed"] for result in results], list(range(6)))
+        self.assertGreaterEqual(coordinator.retries, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.game import Game
+from src.player import RandomPlayer
+from ml.dataset import ShardWriter, iterate_batches
+
+class TestShardWriter(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a writer with small shards and buffer so games span both"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.writer = ShardWriter(self.directory.name, worker_id="test", shard_rows=500, batch_rows=128)
+
+    def play_game(self) -> Game:
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        game = Game((750, 910), players, gamelog=False, debug=False, savegame=False)
+        game.recorders.append(self.writer)
+        game.play()
+        return game
+
+    def test_rows_round_trip(self):
+        """Test every decision of every game is read back with a legal action and its outcome"""
+        games = [self.play_game() for _ in range(3)]
+        self.writer.close()
+
+        total = sum(game.tracker.ticks for game in games)
+        batches = list(iterate_batches(self.directory.name, batch_size=100))
+        self.assertEqual(sum(len(batch["actions"]) for batch in batches), total)
+        self.assertGreater(len(self.writer.shards), 1)
+
+        for batch in batches:
+            self.assertIsInstance(batch["features"], np.memmap)
+            rows = np.arange(len(batch["actions"]))
+            self.assertTrue(batch["masks"][rows, batch["actions"]].all())
+            self.assertTrue(np.isin(batch["outcomes"], [-1, 0, 1]).all())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
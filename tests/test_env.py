@@ -0,0 +1,72 @@
+import random
+import unittest
+
+import numpy as np
+
+from ml.env import CatanEnv, VectorCatanEnv, random_actions
+
+class TestEnv(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a seeded environment for RED against random opponents"""
+        self.env = CatanEnv(colour="RED", seed=3)
+
+    def test_reset_gives_observation_and_mask(self):
+        """Test reset starts a game on the agent's move with its legal actions masked"""
+        observation, info = self.env.reset()
+        self.assertEqual(observation.shape, (self.env.observation_size,))
+        self.assertEqual(info["action_mask"].shape, (self.env.action_count,))
+        self.assertEqual(self.env.game.player_order[self.env.game.current_player], "RED")
+        legal = {self.env.action_space.decode(i) for i in np.flatnonzero(info["action_mask"])}
+        self.assertEqual(legal, set(self.env.possible_actions))
+
+    def test_episode_runs_to_the_end(self):
+        """Test random legal actions play a game to a win, loss or truncation"""
+        observation, info = self.env.reset()
+        np.random.seed(0)
+        terminated = truncated = False
+        while not (terminated or truncated):
+            observation, reward, terminated, truncated, info = self.env.step(random_actions(info["action_mask"][None])[0])
+        np.testing.assert_array_equal(observation, self.env.encoder.encode(self.env.game))
+        if terminated:
+            self.assertEqual(reward, 1.0 if info["winner"] == "RED" else -1.0)
+        else:
+            self.assertEqual(reward, 0.0)
+
+    def test_creating_an_env_does_not_reseed_random(self):
+        """Test the global random stream after creating an env still follows the caller's seed"""
+        draws = []
+        for seed in (1, 2):
+            random.seed(seed)
+            CatanEnv(colour="RED", seed=3)
+            draws.append(random.random())
+        self.assertNotEqual(draws[0], draws[1])
+
+    def test_illegal_action_is_rejected(self):
+        """Test stepping with an action outside the mask raises"""
+        _, info = self.env.reset()
+        with self.assertRaises(ValueError):
+            self.env.step(int(np.flatnonzero(~info["action_mask"])[0]))
+
+    def test_vector_env_matches_single_envs(self):
+        """Test envs stepped in worker processes through shared memory match the same envs stepped here"""
+        singles = [CatanEnv(seed=10 + i) for i in range(3)]
+        expected = [env.reset()[0].copy() for env in singles]
+        with VectorCatanEnv(3, workers=2, seed=10) as vector:
+            observations, masks = vector.reset()
+            np.testing.assert_array_equal(observations, np.stack(expected))
+            np.random.seed(1)
+            for _ in range(30):
+                actions = random_actions(masks)
+                observations, rewards, terminated, truncated, masks = vector.step(actions)
+                for i, env in enumerate(singles):
+                    observation, reward, done, cut, info = env.step(actions[i])
+                    if done or cut:
+                        observation, info = env.reset()
+                    np.testing.assert_array_equal(observations[i], observation)
+                    np.testing.assert_array_equal(masks[i], info["action_mask"])
+                    self.assertEqual(rewards[i], reward)
+            self.assertGreater(vector.steps_per_second(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
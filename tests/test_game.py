@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import MagicMock
 
 from src.game import Game
-from src.player import Player
+from src.player import Player, RandomPlayer, Action
 from src.board import Board
 from src.tracker import Tracker
 from src.hexlib import Point
@@ -109,5 +109,43 @@ class TestGame(unittest.TestCase):
         if os.path.exists('test_save.pkl'):
             os.remove('test_save.pkl')
 
+class TestTrades(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a game past the settlement phase with a known hand"""
+        players = [
+            RandomPlayer(Colour="RED"),
+            RandomPlayer(Colour="WHITE"),
+            RandomPlayer(Colour="ORANGE"),
+            RandomPlayer(Colour="BLUE"),
+        ]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False)
+        self.game.starting_settlement_phase = False
+        self.colour = self.game.player_order[self.game.current_player]
+        self.game.players[self.colour].resources.update({"WOOD": 6, "SHEEP": 1})
+
+    def test_player_trades_deduplicated(self):
+        """Test a hand of 6 WOOD yields one set of player trades"""
+        actions = self.game.get_possible_actions(self.colour)
+        player_trades = [action for action in actions if action.type == "TRADE_WITH_PLAYER"]
+        self.assertEqual(len(player_trades), len(set(player_trades)))
+        self.assertEqual(len(player_trades), 8)
+
+    def test_hierarchical_trades(self):
+        """Test trades are chosen after OPEN_TRADE in hierarchical mode"""
+        self.game.hierarchical_trades = True
+        actions = self.game.get_possible_actions(self.colour)
+        self.assertIn(Action("OPEN_TRADE", None), actions)
+        self.assertFalse(any(action.type.startswith("TRADE_WITH") for action in actions))
+
+        self.game.step(self.colour, Action("OPEN_TRADE", None))
+        trades = self.game.get_possible_actions(self.colour)
+        self.assertTrue(all(action.type.startswith("TRADE_WITH") for action in trades))
+        self.assertIn(Action("TRADE_WITH_BANK", ("WOOD", 4, "ORE")), trades)
+
+        self.game.step(self.colour, Action("TRADE_WITH_BANK", ("WOOD", 4, "ORE")))
+        self.assertFalse(self.game.trading)
+        self.assertEqual(self.game.players[self.colour].resources["ORE"], 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from src import hexlib
+from src import hexarray
+from src.map import CatanMap
+
+class TestHexArray(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a random map and its hexes as a cube coordinate array"""
+        self.map = CatanMap((750, 910))
+        self.layout = self.map.layout
+        self.cube = hexarray.hexes_to_array(self.map.hexes)
+
+    def test_batch_conversions_match_hexlib(self):
+        """Test every batch conversion agrees with hexlib hex by hex and round trips"""
+        for offset in (hexlib.EVEN, hexlib.ODD):
+            qoffset = hexarray.qoffset_from_cube(offset, self.cube)
+            self.assertEqual(qoffset.tolist(), [list(hexlib.qoffset_from_cube(offset, h)) for h in self.map.hexes])
+            np.testing.assert_array_equal(hexarray.qoffset_to_cube(offset, qoffset), self.cube)
+            roffset = hexarray.roffset_from_cube(offset, self.cube)
+            self.assertEqual(roffset.tolist(), [list(hexlib.roffset_from_cube(offset, h)) for h in self.map.hexes])
+            np.testing.assert_array_equal(hexarray.roffset_to_cube(offset, roffset), self.cube)
+
+        doubled = hexarray.qdoubled_from_cube(self.cube)
+        self.assertEqual(doubled.tolist(), [list(hexlib.qdoubled_from_cube(h)) for h in self.map.hexes])
+        np.testing.assert_array_equal(hexarray.qdoubled_to_cube(doubled), self.cube)
+        doubled = hexarray.rdoubled_from_cube(self.cube)
+        np.testing.assert_array_equal(hexarray.rdoubled_to_cube(doubled), self.cube)
+
+    def test_corners_are_the_map_vertex_keys(self):
+        """Test batch corners equal hexlib's rounded corners, which key the map's vertices"""
+        corners = hexarray.polygon_corners(self.layout, self.cube)
+        for i, coord in enumerate(self.map.hexes):
+            self.assertEqual([hexlib.Point(*corner) for corner in corners[i]], hexlib.polygon_corners(self.layout, coord))
+
+    def test_pixel_rounding_matches_hexlib(self):
+        """Test batch pixel to hex rounding picks the same hex as hexlib for random pixels"""
+        points = np.random.default_rng(0).uniform(0, 900, (2000, 2))
+        expected = [
+            list(hexlib.hex_round(hexlib.pixel_to_hex(self.layout, hexlib.Point(x, y)))) for x, y in points]
+        self.assertEqual(hexarray.hex_round(hexarray.pixel_to_hex(self.layout, points)).tolist(), expected)
+
+    def test_hit_testing(self):
+        """Test pixels near a vertex, along an edge or inside a hex select it"""
+        tester = hexarray.HitTester(self.map)
+        for coord in self.map.vertices:
+            self.assertEqual(tester.hit(coord.x + 3, coord.y - 2), ("VERTEX", coord))
+        for edge_id, edge in self.map.edges.items():
+            start, end = edge.vertex_neighbors
+            self.assertEqual(tester.hit((start.x + end.x) / 2 + 1, (start.y + end.y) / 2), ("EDGE", edge_id))
+        centre = hexlib.hex_to_pixel(self.layout, hexlib.Hex(0, 0, 0))
+        self.assertEqual(tester.hit(centre.x, centre.y), ("HEX", hexlib.Hex(0, 0, 0)))
+        self.assertEqual(tester.hit(1, 1), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
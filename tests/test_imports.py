@@ -0,0 +1,39 @@
+import os
+import sys
+import subprocess
+import unittest
+
+import src.game
+import src.player
+
+class TestImports(unittest.TestCase):
+
+    def test_src_modules_alias_bare_modules(self):
+        """Test src.<module> is the module the engine imports by bare name, not a second copy"""
+        import game
+        import player
+        self.assertIs(src.game, game)
+        self.assertIs(src.player.Player, player.Player)
+        self.assertIs(src.game.Player, src.player.Player)
+
+    def test_headless_simulator_skips_heavy_imports(self):
+        """Test importing the simulator loads neither pygame, tqdm nor the ml package"""
+        code = (
+            "import sys; sys.path[:0] = ['src', '.']; import simulator; "
+            "print(' '.join(name for name in ('pygame', 'tqdm', 'ml', 'ml.mcts') if name in sys.modules))")
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        self.assertEqual(loaded.strip(), "")
+
+    def test_simulator_builds_search_players_on_demand(self):
+        """Test the simulator's search lineups build MCTS players without importing ml up front"""
+        code = (
+            "import sys; sys.path[:0] = ['src', '.']; import simulator; before = 'ml.mcts' in sys.modules; "
+            "player = simulator.MCTSPlayer(Colour='RED', Iterations=10); "
+            "print(before, type(player) is sys.modules['ml.mcts'].MCTSPlayer, player.iterations)")
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        self.assertEqual(output.strip(), "False True 10")
+
+if __name__ == "__main__":
+    unittest.main()
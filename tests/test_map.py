@@ -0,0 +1,75 @@
+import math
+import random
+import unittest
+
+from src.map import CatanMap, RED_NUMBERS
+from src.hexlib import hex_distance, Hex
+
+class TestMap(unittest.TestCase):
+
+    def assert_valid_board(self, catan_map: CatanMap, radius: int):
+        land = {coord: hextile for coord, hextile in catan_map.hexes.items() if hextile.resource != "SEA"}
+        sea = {coord: hextile for coord, hextile in catan_map.hexes.items() if hextile.resource == "SEA"}
+        # hexagonal board of the given radius ringed by one hex of sea
+        self.assertEqual(len(land), 3 * radius * (radius + 1) + 1)
+        self.assertEqual(len(sea), 6 * (radius + 1))
+        self.assertTrue(all(hex_distance(Hex(0, 0, 0), coord) <= radius for coord in land))
+        self.assertEqual(len(catan_map.vertices), 6 * (radius + 1) ** 2)
+        self.assertEqual(len(catan_map.edges), 3 * (radius + 1) * (3 * radius + 2))
+
+        for coord, hextile in land.items():
+            self.assertEqual(len(set(hextile.vertex_neighbors)), 6)
+            if hextile.value in RED_NUMBERS:
+                for neighbor in hextile.hex_neighbors:
+                    self.assertFalse(neighbor in land and land[neighbor].value in RED_NUMBERS)
+
+        side = catan_map.layout.size.x
+        for coord, vertex in catan_map.vertices.items():
+            self.assertIn(len(vertex.vertex_neighbors), (2, 3))
+            self.assertEqual(len(vertex.edge_neighbors), len(vertex.vertex_neighbors))
+            for neighbor in vertex.vertex_neighbors:
+                self.assertIn(coord, catan_map.vertices[neighbor].vertex_neighbors)
+                self.assertAlmostEqual(math.dist(coord, neighbor), side, delta=0.01)
+
+    def test_standard_board(self):
+        """Test the default board is the standard 19 hex board with 9 ports"""
+        catan_map = CatanMap((750, 910))
+        self.assert_valid_board(catan_map, radius=2)
+        self.assertEqual(sum(1 for hextile in catan_map.hexes.values() if hextile.port_type), 9)
+        self.assertEqual(sum(1 for vertex in catan_map.vertices.values() if vertex.port_type), 18)
+        self.assertEqual(sum(1 for hextile in catan_map.hexes.values() if hextile.resource == "DESERT"), 1)
+
+    def test_standard_board_is_unchanged_for_a_seed(self):
+        """Test seeded standard boards are laid out as before, so recorded replays still load"""
+        random.seed(0)
+        catan_map = CatanMap((750, 910))
+        land = [(hextile.resource, hextile.value) for hextile in catan_map.hexes.values() if hextile.resource != "SEA"]
+        self.assertEqual(land, [
+            ("BRICK", 5), ("SHEEP", 2), ("SHEEP", 10), ("BRICK", 6), ("WOOD", 9), ("DESERT", None), ("ORE", 8),
+            ("WHEAT", 8), ("SHEEP", 9), ("WOOD", 11), ("BRICK", 4), ("WOOD", 10), ("SHEEP", 12), ("WHEAT", 5),
+            ("WHEAT", 11), ("ORE", 4), ("ORE", 6), ("WOOD", 3), ("WHEAT", 3),
+        ])
+        ports = [hextile.port_type for hextile in catan_map.hexes.values() if hextile.port_type]
+        self.assertEqual(ports, ["3:1", "SHEEP", "3:1", "ORE", "WHEAT", "BRICK", "3:1", "WOOD", "3:1"])
+
+    def test_other_radii(self):
+        """Test smaller and larger boards are complete, with separated red numbers and every other sea hex a port"""
+        for radius in (1, 3, 6):
+            catan_map = CatanMap((750, 910), radius=radius)
+            self.assert_valid_board(catan_map, radius)
+            sea = sum(1 for hextile in catan_map.hexes.values() if hextile.resource == "SEA")
+            self.assertEqual(sum(1 for hextile in catan_map.hexes.values() if hextile.port_type), sea // 2)
+
+    def test_board_needs_land(self):
+        """Test a board without a ring of land is rejected"""
+        with self.assertRaises(ValueError):
+            CatanMap((750, 910), radius=0)
+
+    def test_large_boards_fit_the_window(self):
+        """Test every vertex of a large board is drawn inside the window"""
+        catan_map = CatanMap((750, 910), radius=10)
+        for coord in catan_map.vertices:
+            self.assertTrue(0 <= coord.x <= 750 and 0 <= coord.y <= 910)
+
+if __name__ == "__main__":
+    unittest.main()
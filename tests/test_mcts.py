@@ -0,0 +1,220 @@
+import os
+import tempfile
+import unittest
+from copy import deepcopy
+
+from src.game import Game
+from src.player import RandomPlayer
+from ml.mcts import MCTSPlayer, Node, StateCache
+from ml.book import CanonicalBoard, OpeningBook, SYMMETRIES, get_vertex_hexes
+from ml.evaluator import StaticEvaluator, FEATURE_NAMES, get_relative_features
+from ml.value import ValueFunction, VALUE_FEATURE_NAMES, get_value_features
+import numpy as np
+
+class TestMCTS(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a game between an MCTS player and random players"""
+        self.window_size = (750, 910)
+        self.mcts_player = MCTSPlayer(Colour="RED", Iterations=8, Pruning=True, Reward=False)
+        players = [
+            self.mcts_player,
+            RandomPlayer(Colour="WHITE"),
+            RandomPlayer(Colour="ORANGE"),
+            RandomPlayer(Colour="BLUE"),
+        ]
+        self.game = Game(self.window_size, players, gamelog=False, debug=False, savegame=False)
+
+    def test_determinization_keeps_card_counts(self):
+        """Test hidden development cards are reshuffled without changing how many each player holds"""
+        self.game.players["WHITE"].development_cards["KNIGHT"] = 2
+        self.game.players["BLUE"].development_cards["MONOPOLY"] = 1
+        self.game.players["RED"].development_cards["YEAR_OF_PLENTY"] = 1
+        total = sum(self.game.bank_devcards.values()) + 4
+
+        state = self.mcts_player.sample_determinization(self.game)
+        held = {colour: sum(p.development_cards.values()) for colour, p in state.players.items()}
+        self.assertEqual(held["WHITE"], 2)
+        self.assertEqual(held["BLUE"], 1)
+        self.assertEqual(state.players["RED"].development_cards, self.game.players["RED"].development_cards)
+        self.assertEqual(sum(held.values()) + sum(state.bank_devcards.values()), total)
+        self.assertEqual(state.zobrist_hash, state.compute_zobrist_hash())
+
+    def test_open_loop_search_returns_legal_action(self):
+        """Test the open loop search picks one of the legal placements"""
+        self.mcts_player.determinize = True
+        self.game.player_order = ["RED", "WHITE", "ORANGE", "BLUE"]
+        actions = self.game.get_possible_actions("RED")
+        action = self.mcts_player.choose_action(actions, game=self.game)
+        self.assertIn(action, actions)
+
+    def test_lean_nodes_rebuild_their_states(self):
+        """Test lean nodes hold no state and replaying from the root rebuilds the state they were expanded into"""
+        self.mcts_player.lean = True
+        self.mcts_player.rollout_depth = 20
+        root = Node(self.game, pruning=True, lean=True)
+        state_cache = StateCache(1000)
+        for _ in range(20):
+            self.mcts_player.iterate(root, state_cache)
+        self.assertEqual(root.visits, 20)
+
+        expanded = dict(state_cache.states)
+        self.assertEqual(len(expanded), 20)
+        state_cache.states.clear()
+        for node, state in expanded.items():
+            self.assertIsNone(node.state)
+            self.assertEqual(self.mcts_player.get_state(node, state_cache).zobrist_hash, state.zobrist_hash)
+
+    def test_node_budget_evicts_subtrees(self):
+        """Test the tree never outgrows its node budget and collapsed nodes keep their statistics"""
+        for eviction in ("visits", "recent"):
+            player = MCTSPlayer(
+                Colour="RED", Iterations=120, Pruning=False, Reward=False, RolloutDepth=5, NodeBudget=80,
+                Eviction=eviction)
+            self.game.players["RED"] = player
+            root = player.run_closed_loop(self.game, {})
+            nodes = [root]
+            for node in nodes:
+                nodes.extend(node.children)
+            self.assertEqual(len(nodes), player.memory.nodes)
+            self.assertLessEqual(player.memory.peak_nodes, 81)
+            self.assertGreater(player.memory.evicted, 0)
+            self.assertEqual(root.visits, 120)
+            collapsed = [node for node in nodes if node.collapsed]
+            self.assertTrue(collapsed)
+            self.assertTrue(all(node.visits > 1 for node in collapsed))
+        with self.assertRaises(ValueError):
+            MCTSPlayer(Colour="RED", Eviction="oldest")
+
+    def test_rave_credits_actions_played_below(self):
+        """Test RAVE credits every action the mover plays below a node, and scores blend back to UCT without it"""
+        player = MCTSPlayer(Colour="RED", Iterations=60, Pruning=False, Reward=False, RolloutDepth=20, Rave=300)
+        self.game.players["RED"] = player
+        root = player.run_closed_loop(self.game, {})
+        self.assertEqual(root.visits, 60)
+        # the tree only reaches some of the actions the rollouts play
+        self.assertGreater(len(root.amaf), len(root.children))
+        self.assertTrue(all(stats.visits <= root.visits for stats in root.amaf.values()))
+        for child in root.children:
+            self.assertGreaterEqual(root.amaf[child.action].visits, child.visits)
+            self.assertEqual(root.score(child), child.value / child.visits)
+
+class TestStaticEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a game of random players"""
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False)
+        self.evaluator = StaticEvaluator()
+
+    def test_truncated_rollout_uses_evaluator(self):
+        """Test evaluate stops after depth ticks and returns the evaluator's score"""
+        reward = self.game.evaluate("RED", depth=40, evaluator=self.evaluator)
+        self.assertFalse(self.game.game_over())
+        self.assertAlmostEqual(reward, self.evaluator(self.game, "RED"))
+        self.assertTrue(-1 < reward < 1)
+
+    def test_leading_player_scores_higher(self):
+        """Test more victory points raise the evaluation"""
+        before = self.evaluator(self.game, "RED")
+        self.game.players["RED"].victory_points += 3
+        self.assertGreater(self.evaluator(self.game, "RED"), before)
+        self.assertEqual(len(get_relative_features(self.game, "RED")), len(FEATURE_NAMES))
+
+class TestValueFunction(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a game and a small network"""
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False)
+        self.value_function = ValueFunction(hidden=8)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def test_training_reduces_loss(self):
+        """Test the network fits a learnable target"""
+        rng = np.random.default_rng(0)
+        features = rng.normal(size=(512, len(VALUE_FEATURE_NAMES)))
+        targets = np.tanh(features[:, 0] - features[:, 1])
+        losses = self.value_function.train(features, targets, epochs=40, learning_rate=1e-2)
+        self.assertLess(losses[-1], losses[0] / 4)
+
+    def test_save_and_load(self):
+        """Test a saved value function evaluates positions identically after loading"""
+        filepath = os.path.join(self.directory.name, "value.npz")
+        self.value_function.save(filepath)
+        loaded = ValueFunction.load(filepath)
+        self.assertEqual(loaded(self.game, "RED"), self.value_function(self.game, "RED"))
+        self.assertEqual(len(get_value_features(self.game, "RED")), len(VALUE_FEATURE_NAMES))
+
+    def test_mcts_leaf_evaluation(self):
+        """Test MCTS can score leaves with the value function instead of rollouts"""
+        player = MCTSPlayer(Colour="RED", Iterations=20, RolloutDepth=0, Evaluator=self.value_function)
+        self.game.players["RED"] = player
+        self.game.player_order = ["RED", "WHITE", "ORANGE", "BLUE"]
+        actions = self.game.get_possible_actions("RED")
+        self.assertIn(player.choose_action(actions, game=self.game), actions)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+class TestOpeningBook(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a game with one settlement placed and a temporary book"""
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False)
+        colour = self.game.player_order[0]
+        self.game.step(colour, self.game.get_possible_actions(colour)[10])
+        self.directory = tempfile.TemporaryDirectory()
+        self.book_file = os.path.join(self.directory.name, "book.sqlite")
+
+    def transformed_game(self, symmetry) -> Game:
+        """Copy of the game with the board and buildings moved by a symmetry"""
+        game = deepcopy(self.game)
+        old_names = get_vertex_hexes(self.game)
+        points = {tuple(sorted(hexes)): point for point, hexes in get_vertex_hexes(game).items()}
+        for point, vertex in game.board.vertices.items():
+            vertex.port_type, vertex.owner_colour, vertex.building = None, None, None
+        for coord, hextile in self.game.board.hexes.items():
+            if hextile.resource != "SEA":
+                game.board.hexes[symmetry(coord)].resource = hextile.resource
+                game.board.hexes[symmetry(coord)].value = hextile.value
+        for point, vertex in self.game.board.vertices.items():
+            new_vertex = game.board.vertices[points[tuple(sorted(symmetry(h) for h in old_names[point]))]]
+            new_vertex.port_type, new_vertex.owner_colour = vertex.port_type, vertex.owner_colour
+            new_vertex.building = vertex.building
+        last = self.game.last_settlement_coord
+        game.last_settlement_coord = points[tuple(sorted(symmetry(h) for h in old_names[last]))]
+        return game
+
+    def test_key_invariant_under_symmetries(self):
+        """Test all 12 rotations and reflections of a position share one key"""
+        key = CanonicalBoard(self.game).key
+        for symmetry in SYMMETRIES:
+            self.assertEqual(CanonicalBoard(self.transformed_game(symmetry)).key, key)
+
+    def test_key_changes_with_settlements(self):
+        """Test a different settlement gives a different key"""
+        game = deepcopy(self.game)
+        colour = game.player_order[game.current_player]
+        game.step(colour, game.get_possible_actions(colour)[0])
+        self.assertNotEqual(CanonicalBoard(game).key, CanonicalBoard(self.game).key)
+
+    def test_book_replaces_search(self):
+        """Test a position with a full search in the book is answered from it"""
+        book = OpeningBook(self.book_file)
+        canonical = CanonicalBoard(self.game)
+        colour = self.game.player_order[self.game.current_player]
+        actions = self.game.get_possible_actions(colour)
+        book.record(canonical.key, {canonical.action_name(actions[0]): (5, -5), canonical.action_name(actions[1]): (5, 3)})
+        book.record(canonical.key, {canonical.action_name(actions[1]): (2, 1)})
+        self.assertEqual(book.lookup(canonical.key)[canonical.action_name(actions[1])], (7, 4))
+
+        player = MCTSPlayer(Colour=colour, Iterations=10, Pruning=False, Book=self.book_file)
+        self.assertEqual(player.choose_action(actions, game=self.game), actions[1])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
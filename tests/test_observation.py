@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from src.game import Game
+from src.player import RandomPlayer
+from src.observation import ObservationEncoder, IncrementalObservation
+
+class TestObservationEncoder(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a silent game of random players and an encoder for its board"""
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False)
+        self.encoder = ObservationEncoder(self.game.board)
+
+    def test_incremental_matches_full_encoding(self):
+        """Test updating only what each step touched gives the same planes as encoding from scratch"""
+        observation = IncrementalObservation(self.encoder, self.game)
+        while not self.game.game_over():
+            colour = self.game.player_order[self.game.current_player]
+            action = self.game.players[colour].choose_action(self.game.get_possible_actions(colour))
+            self.game.step(colour, action)
+            np.testing.assert_array_equal(observation.update(), self.encoder.encode(self.game))
+
+        planes = self.encoder.planes(observation.flat)
+        buildings = sum(len(player.owned_vertices) for player in self.game.players.values())
+        self.assertEqual(planes["vertex_owner"].sum(), buildings)
+        self.assertEqual(planes["robber"].sum(), 1)
+
+    def test_batch_writes_into_preallocated_rows(self):
+        """Test a batch fills the given array in place with one full encoding per game"""
+        out = np.full((2, self.encoder.size), -1, dtype=np.float32)
+        result = self.encoder.encode_batch([self.game, self.game], out=out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out[0], self.encoder.encode(self.game))
+        np.testing.assert_array_equal(out[0], out[1])
+        self.assertEqual(self.encoder.planes(out[0])["hex_resource"].sum(), 19)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+from collections import Counter
+
+from src.player import Action
+from src.map import CatanMap
+from src.policy import AliasTable, WeightedPolicy, WEIGHTS_BY_ACTION_TYPE, pip_settlement_weights
+
+class TestPolicy(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mix of weighted and unweighted actions"""
+        self.actions = [
+            Action("END_TURN", None),
+            Action("BUILD_CITY", (1, 2)),
+            Action("BUILD_SETTLEMENT", (3, 4)),
+            Action("BUY_DEVCARD", None),
+        ] + [Action("BUILD_ROAD", edge_id) for edge_id in range(5)]
+
+    def test_choose_matches_list_of_copies(self):
+        """Test integer weights draw exactly as choosing from weight copies of each action did"""
+        def bloated_choice(possible_actions):
+            bloated_actions = []
+            for action in possible_actions:
+                bloated_actions.extend([action] * WEIGHTS_BY_ACTION_TYPE.get(action.type, 1))
+            return random.choice(bloated_actions)
+
+        random.seed(7)
+        expected = [bloated_choice(self.actions) for _ in range(500)]
+        random.seed(7)
+        policy = WeightedPolicy()
+        self.assertEqual([policy.choose(self.actions) for _ in range(500)], expected)
+
+    def test_value_weights_and_weight_function(self):
+        """Test weights by type and value override the type and are scaled by the weight function"""
+        policy = WeightedPolicy(
+            value_weights={("BUILD_ROAD", 3): 50}, weight_function=lambda action: 2 if action.type == "BUY_DEVCARD" else 1)
+        self.assertEqual(policy.weight(Action("BUILD_ROAD", 3)), 50)
+        self.assertEqual(policy.weight(Action("BUILD_ROAD", 4)), 1)
+        self.assertEqual(policy.weight(Action("BUY_DEVCARD", None)), 200)
+        self.assertEqual(policy.get_weights(self.actions[:4]), [1, 10000, 1000, 200])
+
+    def test_float_weights(self):
+        """Test fractional weights are drawn in proportion and zero weights never"""
+        policy = WeightedPolicy(weights={"BUILD_CITY": 0.5, "BUILD_SETTLEMENT": 0}, default=0.25)
+        random.seed(0)
+        counts = Counter(policy.choose(self.actions[:3]) for _ in range(30000))
+        self.assertNotIn(self.actions[2], counts)
+        self.assertAlmostEqual(counts[self.actions[1]] / counts[self.actions[0]], 2, delta=0.15)
+
+    def test_alias_table(self):
+        """Test alias table draws follow the weights"""
+        random.seed(0)
+        table = AliasTable([1, 0, 3, 6])
+        counts = Counter(table.sample() for _ in range(50000))
+        self.assertNotIn(1, counts)
+        for outcome, weight in ((0, 0.1), (2, 0.3), (3, 0.6)):
+            self.assertAlmostEqual(counts[outcome] / 50000, weight, delta=0.01)
+        with self.assertRaises(ValueError):
+            AliasTable([0, 0])
+
+        policy = WeightedPolicy()
+        self.assertEqual(len(policy.choose_many(self.actions, 20)), 20)
+
+    def test_pip_settlement_weights(self):
+        """Test settlements are weighted by the pips around their vertex"""
+        catan_map = CatanMap((750, 910))
+        pips = catan_map.analytics.pips
+        vertices = list(catan_map.vertices)
+        best, worst = vertices[pips.argmax()], vertices[pips.argmin()]
+        policy = WeightedPolicy(weight_function=pip_settlement_weights(catan_map))
+        self.assertGreater(policy.weight(Action("BUILD_SETTLEMENT", best)), policy.weight(Action("BUILD_SETTLEMENT", worst)))
+        self.assertEqual(policy.weight(Action("BUILD_CITY", best)), WEIGHTS_BY_ACTION_TYPE["BUILD_CITY"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from src.game import Game
+from src.player import RandomPlayer
+from src.profiling import Profiler, ProfileReport
+from ml.mcts import MCTSPlayer
+
+def play_profiled_game(seed: int):
+    """Plays a game with one MCTS player under the profiler"""
+    profiler = Profiler(interval=0.001)
+    profiler.start()
+    players = [MCTSPlayer(Colour="RED", Iterations=30, RolloutDepth=10)] + [
+        RandomPlayer(Colour=colour) for colour in ["WHITE", "ORANGE", "BLUE"]]
+    Game((750, 910), players, gamelog=False, debug=False, savegame=False, seed=seed).play()
+    profiler.stop()
+    return profiler.results()
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory for the report"""
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_merged_report(self):
+        """Test profiles of separate games merge into one pstats file, collapsed stacks and an MCTS breakdown"""
+        report = ProfileReport()
+        first, second = play_profiled_game(0), play_profiled_game(1)
+        report.add(first)
+        report.add(second)
+
+        search, total = report.mcts_breakdown()
+        self.assertEqual(total, sum(first[1].values()) + sum(second[1].values()))
+        self.assertTrue(0 < search < total)
+
+        summary = report.write(self.directory.name)
+        self.assertIn("MCTS decisions", summary)
+        stats = pstats.Stats(os.path.join(self.directory.name, "simulator.pstats"))
+        plays = [value for key, value in stats.stats.items() if key[2] == "play" and key[0].endswith("game.py")]
+        self.assertEqual(plays[0][1], 2)
+
+        with open(os.path.join(self.directory.name, "simulator.collapsed")) as file:
+            lines = file.read().splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertTrue(stack.startswith("test_profiling.play_profiled_game;"))
+        self.assertGreater(int(count), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from src.game import Game
+from src.player import RandomPlayer
+from src.renderer import Renderer
+
+class TestRenderer(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a renderer on the dummy video driver for a seeded game"""
+        pygame.init()
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False, seed=3)
+        self.renderer = Renderer(windowSize=(750, 910), game=self.game)
+
+    def test_dirty_regions_match_a_full_redraw(self):
+        """Test redrawing only changed pieces leaves the same pixels as drawing the frame from scratch"""
+        self.renderer.display()
+        frames = 0
+        while not self.game.game_over() and frames < 400:
+            colour = self.game.player_order[self.game.current_player]
+            self.game.step(colour, self.game.players[colour].choose_action(self.game.get_possible_actions(colour)))
+            self.renderer.display()
+            frames += 1
+
+        incremental = pygame.surfarray.array3d(self.renderer.window)
+        self.renderer.board_key = None
+        self.renderer.display()
+        self.assertTrue((incremental == pygame.surfarray.array3d(self.renderer.window)).all())
+
+    def tearDown(self):
+        pygame.quit()
+
+if __name__ == '__main__':
+    unittest.main()
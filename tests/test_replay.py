@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from src.game import Game
+from src.player import RandomPlayer
+from src.replay import ReplayWriter, Replay, ReplayPrefetcher
+from src.batch_render import render_replay, write_contact_sheet, get_renderer, pygame
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a seeded game of random players recorded to a temporary replay file"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.directory.name, "game.replay")
+        players = [RandomPlayer(Colour=colour) for colour in ["RED", "WHITE", "ORANGE", "BLUE"]]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False, seed=1234)
+        self.game.replay_writer = ReplayWriter(self.game, self.filepath)
+        self.game.play()
+
+    def test_replay_reaches_the_recorded_final_position(self):
+        """Test stepping through every recorded action rebuilds the finished game exactly"""
+        replay = Replay(self.filepath)
+        game = replay.game_at_turn(self.game.turn + 1)
+        self.assertEqual(game.tracker.ticks, self.game.tracker.ticks)
+        self.assertEqual(game.zobrist_hash, self.game.zobrist_hash)
+        self.assertEqual(game.turn, self.game.turn)
+        for colour, player in self.game.players.items():
+            self.assertEqual(game.players[colour].victory_points, player.victory_points)
+            self.assertEqual(game.players[colour].owned_vertices, player.owned_vertices)
+
+    def test_game_at_turn_starts_that_turn(self):
+        """Test a position part way through is the start of the requested turn"""
+        replay = Replay(self.filepath)
+        for turn in [1, 17, self.game.turn // 2]:
+            self.assertEqual(replay.game_at_turn(turn).turn, turn)
+
+    def test_keyframes_are_indexed_and_reused(self):
+        """Test seeking from a saved keyframe gives the same position as stepping from the start"""
+        replay = Replay(self.filepath, keyframe_interval=5)
+        self.assertTrue(os.path.exists(replay.get_keyframe_path()))
+        self.assertEqual(replay.last_turn, self.game.turn)
+
+        reloaded = Replay(self.filepath, keyframe_interval=5)
+        self.assertEqual(reloaded.keyframes, replay.keyframes)
+        turn = max(reloaded.keyframes) + 2
+        game = reloaded.game_at_turn(turn)
+        reloaded.keyframes.clear()
+        self.assertEqual(game.zobrist_hash, reloaded.game_at_turn(turn).zobrist_hash)
+
+    def test_prefetcher_builds_neighbouring_turns(self):
+        """Test the prefetcher serves the requested turn and queues the turns either side"""
+        prefetcher = ReplayPrefetcher(Replay(self.filepath), radius=1)
+        self.assertEqual(prefetcher.get(20).turn, 20)
+        self.assertEqual(sorted(prefetcher.games), [19, 20, 21])
+        self.assertEqual(prefetcher.games[21].result().turn, 21)
+        prefetcher.close()
+
+    def test_headless_render_of_selected_turns(self):
+        """Test the chosen turns, and the final position for turns past the end, are written as PNGs"""
+        output = os.path.join(self.directory.name, "renders")
+        frames = render_replay(self.filepath, output, turns=[1, 17, self.game.turn + 50])
+        self.assertEqual([os.path.basename(frame) for frame in frames], [
+            "turn_0001.png", "turn_0017.png", "final.png"])
+
+        sheet = os.path.join(output, "contact_sheet.png")
+        write_contact_sheet(frames, sheet, columns=2)
+        self.assertTrue(os.path.getsize(sheet) > 0)
+
+    def test_every_turn_render_ends_on_the_final_position(self):
+        """Test rendering every turn ends with the finished game, not the start of the winner's last turn"""
+        output = os.path.join(self.directory.name, "renders")
+        frames = render_replay(self.filepath, output)
+        self.assertEqual(len(frames), self.game.turn + 1)
+        self.assertEqual(os.path.basename(frames[-2]), f"turn_{self.game.turn:04d}.png")
+        self.assertEqual(os.path.basename(frames[-1]), "final.png")
+
+        replay = Replay(self.filepath)
+        game = replay.game_at_turn(self.game.turn + 1)
+        self.assertEqual(game.zobrist_hash, self.game.zobrist_hash)
+        renderer = get_renderer(tuple(replay.header["window_size"]), game)
+        renderer.display()
+        expected = pygame.image.tostring(renderer.window, "RGB")
+        self.assertEqual(pygame.image.tostring(pygame.image.load(frames[-1]), "RGB"), expected)
+        self.assertNotEqual(pygame.image.tostring(pygame.image.load(frames[-2]), "RGB"), expected)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
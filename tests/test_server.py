@@ -0,0 +1,99 @@
+import os
+import asyncio
+import tempfile
+import unittest
+
+from src.player import RandomPlayer
+from src.replay import ReplayWriter, Replay
+from src.server import (
+    Agent, PlayerAgent, BatchEvaluator, BatchedAgent, GameServer, new_game, random_evaluator, run_remote_agent,
+    COLOURS)
+
+class SlowAgent(Agent):
+    "Never answers in time"
+    async def choose_action(self, game, colour, possible_actions, nested):
+        await asyncio.sleep(10)
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory for replays and sockets"""
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_concurrent_games_replay_exactly(self):
+        """Test games played side by side, trades and road building included, rebuild exactly from their replays"""
+        server = GameServer()
+        games = []
+
+        async def make_game(i):
+            agents = {colour: PlayerAgent(RandomPlayer(Colour=colour)) for colour in COLOURS}
+            game = new_game(agents, seed=i)
+            game.replay_writer = ReplayWriter(game, os.path.join(self.directory.name, f"{i}.replay"))
+            games.append(game)
+            return game, agents
+
+        trackers = asyncio.run(server.play_many(make_game, games=6))
+        self.assertEqual(len(trackers), 6)
+        for i, game in enumerate(games):
+            replayed = Replay(os.path.join(self.directory.name, f"{i}.replay"), keyframe_interval=0).game_at_turn(10**6)
+            self.assertEqual(replayed.zobrist_hash, game.zobrist_hash)
+            self.assertEqual(replayed.tracker.ticks, game.tracker.ticks)
+
+    def test_batched_decisions(self):
+        """Test one evaluator answers the decisions of many games in shared batches"""
+        evaluator = BatchEvaluator(random_evaluator)
+
+        async def make_game(i):
+            agents = {colour: BatchedAgent(evaluator) for colour in COLOURS}
+            return new_game(agents, seed=i), agents
+
+        trackers = asyncio.run(GameServer().play_many(make_game, games=8))
+        self.assertEqual(len(trackers), 8)
+        self.assertGreater(max(evaluator.batch_sizes), 1)
+
+    def test_move_timeout_falls_back(self):
+        """Test an agent that does not answer in time has its move made by the fallback policy"""
+        server = GameServer(move_timeout=0.001)
+
+        async def play():
+            agents = {colour: PlayerAgent(RandomPlayer(Colour=colour)) for colour in COLOURS}
+            agents["RED"] = SlowAgent()
+            game = new_game(agents, seed=0)
+            game.turn_limit = 10
+            return await server.play(game, agents)
+
+        asyncio.run(play())
+        self.assertGreater(server.timeouts, 0)
+
+    def test_remote_agent_over_socket(self):
+        """Test a remote agent connected over a unix socket plays several games at once"""
+        address = os.path.join(self.directory.name, "server.sock")
+        server = GameServer()
+
+        async def play():
+            listener = await server.listen(address)
+            client = asyncio.create_task(run_remote_agent(address))
+            remote = await server.lobby.get()
+
+            async def make_game(i):
+                agents = {colour: PlayerAgent(RandomPlayer(Colour=colour)) for colour in COLOURS}
+                agents["RED"] = remote
+                game = new_game(agents, seed=i)
+                game.turn_limit = 30
+                return game, agents
+
+            trackers = await server.play_many(make_game, games=3)
+            remote.close()
+            listener.close()
+            return trackers, await client
+
+        trackers, games_seen = asyncio.run(play())
+        self.assertEqual(len(trackers), 3)
+        self.assertEqual(games_seen, 3)
+        self.assertEqual(server.timeouts, 0)
+
+if __name__ == "__main__":
+    unittest.main()
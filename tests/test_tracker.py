@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.game import Game
+from src.player import RandomPlayer
+from src.tracker import TurnSeries, TelemetryWriter, TURN_COLUMNS, load_telemetry
+
+COLOURS = ["RED", "WHITE", "ORANGE", "BLUE"]
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a finished game of random players with telemetry on"""
+        players = [RandomPlayer(Colour=colour) for colour in COLOURS]
+        self.game = Game((750, 910), players, gamelog=False, debug=False, savegame=False, seed=3, telemetry=True)
+        self.tracker = self.game.play()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_one_row_per_turn(self):
+        """Test a row is added at every turn and the last row holds the final position"""
+        columns = self.tracker.series.to_columns()
+        self.assertEqual(list(columns["turn"]), list(range(1, self.game.turn + 1)) + [self.game.turn])
+        self.assertTrue((columns["dice"][:16] == 0).all())
+        self.assertTrue(((columns["dice"][16:-1] >= 2) & (columns["dice"][16:-1] <= 12)).all())
+        self.assertEqual(columns["victory_points"].shape, (len(columns["turn"]), 4))
+
+        final = {colour: columns["victory_points"][-1, i] for i, colour in enumerate(self.tracker.series.colours)}
+        self.assertEqual(final, {colour: player.victory_points for colour, player in self.game.players.items()})
+        winner = self.tracker.series.colours.index(self.tracker.winner)
+        self.assertGreaterEqual(columns["victory_points"][-1, winner], 10)
+        self.assertEqual(columns["settlements"][-1, winner], 5 - self.game.players[self.tracker.winner].settlements_left)
+
+    def test_columns_grow(self):
+        """Test the columns double past their capacity and keep earlier rows"""
+        series = TurnSeries(COLOURS, capacity=2)
+        for _ in range(5):
+            series.append(self.game, dice=8)
+        columns = series.to_columns()
+        self.assertEqual(len(columns["turn"]), 5)
+        self.assertTrue((columns["dice"] == 8).all())
+        self.assertEqual({name: column.dtype.name for name, column in columns.items()},
+                         {name: dtype for name, (dtype, _) in TURN_COLUMNS.items()})
+
+    def test_telemetry_is_optional(self):
+        """Test games without telemetry keep only the totals"""
+        players = [RandomPlayer(Colour=colour) for colour in COLOURS]
+        game = Game((750, 910), players, gamelog=False, debug=False, savegame=False, seed=3)
+        self.assertIsNone(game.play().series)
+
+    def test_writer_batches_games(self):
+        """Test each batch of games is written as one compressed file of concatenated columns"""
+        writer = TelemetryWriter(self.directory.name, games_per_file=2)
+        columns = self.tracker.series.to_columns()
+        for game_id in range(3):
+            writer.add(game_id, self.tracker.series.colours, columns)
+        writer.close()
+        self.assertEqual(len(writer.files), 2)
+
+        first = load_telemetry(writer.files[0])
+        self.assertEqual(list(first["game_ids"]), [0, 1])
+        self.assertEqual(len(first["turn"]), 2 * len(columns["turn"]))
+        self.assertTrue((first["game"][len(columns["turn"]):] == 1).all())
+        np.testing.assert_array_equal(first["victory_points"][:len(columns["turn"])], columns["victory_points"])
+        self.assertEqual(list(first["colours"][1]), self.tracker.series.colours)
+        self.assertEqual(os.path.basename(writer.files[1]), "telemetry-00001.npz")
+
+if __name__ == "__main__":
+    unittest.main()
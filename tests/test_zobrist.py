@@ -0,0 +1,55 @@
+import unittest
+from copy import deepcopy
+
+from src.game import Game
+from src.player import RandomPlayer, Action
+
+class TestZobristHash(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a game of random players"""
+        self.window_size = (750, 910)
+        players = [
+            RandomPlayer(Colour="RED"),
+            RandomPlayer(Colour="WHITE"),
+            RandomPlayer(Colour="ORANGE"),
+            RandomPlayer(Colour="BLUE"),
+        ]
+        self.game = Game(self.window_size, players, gamelog=False, debug=False, savegame=False)
+
+    def play_ticks(self, ticks: int):
+        for _ in range(ticks):
+            if self.game.game_over():
+                break
+            colour = self.game.player_order[self.game.current_player]
+            actions = self.game.get_possible_actions(colour)
+            self.game.step(colour, self.game.players[colour].choose_action(actions))
+
+    def test_incremental_hash_matches_full_hash(self):
+        """Test the hash updated in step equals the hash computed from scratch"""
+        for _ in range(20):
+            self.play_ticks(25)
+            expected = deepcopy(self.game).compute_zobrist_hash()
+            self.assertEqual(self.game.zobrist_hash, expected)
+
+    def test_transposed_positions_hash_equal(self):
+        """Test two bank trades played in either order reach the same hash"""
+        self.play_ticks(200)
+        colour = self.game.player_order[self.game.current_player]
+        self.game.robber_active = False
+        self.game.players[colour].resources.update({"WOOD": 4, "BRICK": 4})
+        self.game.update_zobrist_hash()
+
+        first = deepcopy(self.game)
+        first.step(colour, Action("TRADE_WITH_BANK", ("WOOD", 4, "ORE")))
+        first.step(colour, Action("TRADE_WITH_BANK", ("BRICK", 4, "SHEEP")))
+
+        second = deepcopy(self.game)
+        second.step(colour, Action("TRADE_WITH_BANK", ("BRICK", 4, "SHEEP")))
+        second.step(colour, Action("TRADE_WITH_BANK", ("WOOD", 4, "ORE")))
+
+        self.assertEqual(first.zobrist_hash, second.zobrist_hash)
+        self.assertNotEqual(first.zobrist_hash, self.game.zobrist_hash)
+
+if __name__ == '__main__':
+    unittest.main()